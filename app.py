@@ -1,24 +1,83 @@
 import streamlit as st
-import asyncio
-from main import main  # Import your async main function
+from datetime import datetime
+from src.pipeline import PIPELINE_MODES
+from src.db import BASELINE_TYPES
+from src.jobs import JobRunner
+from src.limits import ServiceLimiter
+from src.telemetry import configure_from_env
+
+# Seconds between refreshes of the analyses view while any of them is still running
+POLL_SECONDS = 1.0
+
+@st.cache_resource
+def get_runner():
+    # One runner per server process, shared by every session, so the service limits
+    # hold across all users' analyses
+    configure_from_env()
+    return JobRunner(max_concurrent=4, limits={
+        "notion": ServiceLimiter("notion", 3, 3.0),
+        "youtube": ServiceLimiter("youtube", 8, 10.0),
+        "openai": ServiceLimiter("openai", 4, 2.0),
+    })
+
+runner = get_runner()
+job_ids = st.session_state.setdefault("job_ids", [])
 
 st.title("YouTube Experiment Agent")
 
 notion_id = st.text_input("Enter Notion Page ID", "")
 period = st.selectbox("Select Analysis Period", ["24hr", "48hr", "7d"])
+baseline_type = st.selectbox("Select Baseline Statistic", BASELINE_TYPES)
+pipeline_mode = st.selectbox("Select Pipeline Mode", PIPELINE_MODES, help="fast builds the report without the report writer and text-to-JSON agents, stream appends the report to Notion as it is written")
 
 if st.button("Run Analysis"):
     if notion_id and period:
-        with st.spinner("Running analysis..."):
-            # Run the async main function and display results
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(main(notion_id, period))
-                st.success("Analysis complete! Check your Notion page for results.")
-            except Exception as e:
-                st.error(f"Error: {e}")
-            finally:
-                loop.close()
+        # Runs in the background; the page stays responsive and more analyses can be queued
+        job_ids.append(runner.submit(notion_id, period, baseline_type=baseline_type, pipeline_mode=pipeline_mode))
     else:
-        st.warning("Please enter a Notion ID and select a period.")
\ No newline at end of file
+        st.warning("Please enter a Notion ID and select a period.")
+
+show_all = st.checkbox("Show recent analyses from all sessions")
+
+STATUS_ICONS = {"queued": "⏳", "running": "🔄", "done": "✅", "failed": "❌"}
+STAGE_ICONS = {"pending": "·", "started": "🔄", "finished": "✅", "failed": "❌"}
+
+def show_job(job):
+    params = job["params"]
+    submitted = datetime.fromtimestamp(job["submitted_at"]).strftime("%H:%M:%S")
+    label = f"{STATUS_ICONS[job['status']]} {params['notion_id']} · {params['period']} · {params['pipeline_mode']} · {submitted}"
+
+    with st.expander(label, expanded=job["status"] in ("queued", "running")):
+        stages = job["stages"]
+        if stages:
+            finished = sum(status == "finished" for status in stages.values())
+            st.progress(finished / len(stages), text=f"{finished}/{len(stages)} stages")
+            st.caption("  ".join(f"{STAGE_ICONS[status]} {name}" for name, status in stages.items()))
+
+        if job["first_content"] is not None:
+            st.caption(f"First report content visible after {job['first_content']:.1f}s")
+        # Mirrors the report content as it is added to the Notion page
+        for block in job["blocks"]:
+            if block["type"].startswith("heading"):
+                st.subheader(block["text"])
+            else:
+                st.write(block["text"])
+
+        if job["status"] == "done":
+            st.success(f"Analysis complete ({job['result']['hypothesis_result']})! Check your Notion page for results.")
+        elif job["status"] == "failed":
+            st.error(f"Error: {job['error']}")
+
+def show_jobs():
+    jobs = runner.jobs() if show_all else runner.jobs(job_ids)
+    if jobs:
+        st.subheader("Analyses")
+    for job in jobs:
+        show_job(job)
+    if active and not any(job["status"] in ("queued", "running") for job in runner.jobs(job_ids)):
+        # Everything finished: rerun the whole page once to stop polling
+        st.rerun()
+
+# Only this fragment reruns while polling, so inputs are not reset between refreshes
+active = any(job["status"] in ("queued", "running") for job in runner.jobs(job_ids))
+st.fragment(show_jobs, run_every=POLL_SECONDS if active else None)()
@@ -0,0 +1,128 @@
+from main import main as run_analysis, PIPELINE_MODES
+from src.notion import notion_sync_database
+from src.limits import ServiceLimiter
+from src.baseline import COHORT_FILTERS
+from src.telemetry import configure_from_env
+from src.openai import track_llm_usage, current_llm_usage
+import argparse
+import asyncio
+import time
+
+# Page properties validated by a database sync this recently are used without refetching
+PROPERTIES_MAX_AGE = 600
+
+def percentile(values: list[float], q: float):
+  """Returns the q-th percentile (0-100) of values using linear interpolation."""
+  if not values:
+    return None
+  ordered = sorted(values)
+  rank = (len(ordered) - 1) * q / 100
+  low = int(rank)
+  high = min(low + 1, len(ordered) - 1)
+  return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+async def run_batch(page_ids: list[str], periods: list[str], limits: dict, max_concurrent: int = 8, use_cache: bool = True, pipeline_mode: str = "full",
+                    cohort: list = None, lookback_days: int = None):
+  """
+  Runs the analysis pipeline for every (page, period) pair concurrently, with at most
+  max_concurrent analyses in flight. Per-service limits are shared by all analyses.
+  cohort and lookback_days select cohort baselines (see main.main).
+  Returns a summary of successes, failures, latency percentiles and LLM token usage.
+  """
+  jobs = [(page_id, period) for page_id in page_ids for period in periods]
+  slots = asyncio.Semaphore(max_concurrent)
+  results = []
+
+  async def run_job(page_id, period):
+    async with slots:
+      started = time.perf_counter()
+      result = {"page_id": page_id, "period": period, "ok": False}
+      # Each job runs in its own task, so the usage run_analysis tracks stays readable
+      # here even when it fails after some agents have run
+      track_llm_usage()
+      try:
+        result["result"] = await run_analysis(page_id, period, limits=limits, use_cache=use_cache, pipeline_mode=pipeline_mode, properties_max_age=PROPERTIES_MAX_AGE,
+                                              cohort=cohort, lookback_days=lookback_days)
+        result["ok"] = True
+      except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+      finally:
+        result["seconds"] = time.perf_counter() - started
+        result["llm_usage"] = dict(current_llm_usage())
+        results.append(result)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(run_job(page_id, period) for page_id, period in jobs))
+  elapsed = time.perf_counter() - started
+
+  successes = [r for r in results if r["ok"]]
+  failures = [r for r in results if not r["ok"]]
+  latencies = [r["seconds"] for r in successes]
+
+  tokens = {"requests": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+  # Failed analyses spent tokens too
+  for r in results:
+    for key, value in r["llm_usage"].items():
+      tokens[key] = tokens.get(key, 0) + value
+
+  return {
+    "jobs": len(jobs),
+    "successes": len(successes),
+    "failures": [{"page_id": r["page_id"], "period": r["period"], "error": r["error"]} for r in failures],
+    "elapsed_seconds": elapsed,
+    "latency_seconds": {
+      "p50": percentile(latencies, 50),
+      "p90": percentile(latencies, 90),
+      "p99": percentile(latencies, 99),
+      "max": max(latencies, default=None),
+    },
+    "llm_usage": tokens,
+  }
+
+def print_summary(summary: dict):
+  print("\nBatch Summary:")
+  print(f"  analyses: {summary['jobs']} in {summary['elapsed_seconds']:.1f}s")
+  print(f"  successes: {summary['successes']}")
+  print(f"  failures: {len(summary['failures'])}")
+  for failure in summary["failures"]:
+    print(f"    - {failure['page_id']} ({failure['period']}): {failure['error']}")
+  for key, value in summary["latency_seconds"].items():
+    print(f"  latency {key}: {value:.2f}s" if value is not None else f"  latency {key}: -")
+  for key, value in summary["llm_usage"].items():
+    print(f"  {key}: {value}")
+
+def main():
+  parser = argparse.ArgumentParser(description="Analyze many Notion experiments concurrently.")
+  source = parser.add_mutually_exclusive_group(required=True)
+  source.add_argument("--database-id", type=str, help="Notion database ID; every page in it is analyzed")
+  source.add_argument("--page-ids", type=str, nargs="+", help="Notion page IDs")
+  parser.add_argument("--periods", type=str, nargs="+", default=["24hr"], choices=["24hr", "48hr", "7d"], help="Analysis periods")
+  parser.add_argument("--max-concurrent", type=int, default=8, help="Analyses in flight at once")
+  parser.add_argument("--notion-concurrency", type=int, default=3, help="Concurrent Notion requests")
+  parser.add_argument("--notion-rate", type=float, default=3.0, help="Notion requests per second")
+  parser.add_argument("--youtube-concurrency", type=int, default=8, help="Concurrent YouTube requests")
+  parser.add_argument("--youtube-rate", type=float, default=10.0, help="YouTube requests per second")
+  parser.add_argument("--openai-concurrency", type=int, default=4, help="Concurrent LLM agent runs")
+  parser.add_argument("--openai-rate", type=float, default=2.0, help="LLM agent runs started per second")
+  parser.add_argument("--no-llm-cache", action="store_true", help="Always call the models instead of reusing cached responses")
+  parser.add_argument("--pipeline-mode", type=str, default="full", choices=PIPELINE_MODES, help="\"fast\" builds reports without the report writer and text-to-JSON agents, \"stream\" appends them as they are written")
+  parser.add_argument("--cohort", type=str, nargs="+", choices=COHORT_FILTERS, help="Compare each video against past videos sharing these traits instead of the latest five")
+  parser.add_argument("--lookback-days", type=int, help="Only compare against videos published in this many days")
+  parser.add_argument("--full-sync", action="store_true", help="List every database page instead of only those edited since the last sync")
+  args = parser.parse_args()
+  configure_from_env()
+
+  page_ids = args.page_ids or notion_sync_database(args.database_id, full=args.full_sync)
+
+  limits = {
+    "notion": ServiceLimiter("notion", args.notion_concurrency, args.notion_rate),
+    "youtube": ServiceLimiter("youtube", args.youtube_concurrency, args.youtube_rate),
+    "openai": ServiceLimiter("openai", args.openai_concurrency, args.openai_rate),
+  }
+
+  summary = asyncio.run(run_batch(page_ids, args.periods, limits, args.max_concurrent, use_cache=not args.no_llm_cache, pipeline_mode=args.pipeline_mode,
+                                cohort=args.cohort, lookback_days=args.lookback_days))
+  print_summary(summary)
+
+if __name__ == "__main__":
+  main()
\ No newline at end of file
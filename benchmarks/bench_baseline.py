@@ -0,0 +1,71 @@
+"""
+Baseline latency at 10k and 100k videos: the original unindexed fetch-and-average in
+Python, the indexed SQL AVG, and the materialized baselines lookup.
+
+    python benchmarks/bench_baseline.py --sizes 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db
+
+def populate(n):
+    random.seed(n)
+    rows = []
+    for i in range(n):
+        publish_date = f"20{random.randint(10, 24)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}T12:00:00Z"
+        rows.append([f"video{i:07d}", publish_date] + [random.choice([None, random.randint(0, 100000)]) for _ in db.BASELINE_KEYS])
+    conn = db.get_connection()
+    with conn:
+        conn.executemany(
+            f"INSERT INTO video_stats (video_id, publish_date, {', '.join(db.BASELINE_KEYS)}) VALUES (?, ?{', ?' * len(db.BASELINE_KEYS)})",
+            rows,
+        )
+
+def legacy_baseline(conn, n):
+    # The original implementation: fetch N rows, transpose and average in Python
+    rows = conn.execute(
+        f"SELECT {', '.join(db.BASELINE_KEYS)} FROM video_stats NOT INDEXED ORDER BY publish_date DESC LIMIT ?", (n,)
+    ).fetchall()
+    cols = list(zip(*rows))
+    def safe_avg(col):
+        filtered = [v for v in col if v is not None]
+        return float(sum(filtered) / len(filtered)) if filtered else 0
+    return {k: safe_avg(col) for k, col in zip(db.BASELINE_KEYS, cols)}
+
+def timed(label, fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - started) / repeat
+    print(f"  {label:<28} {per_call * 1000:>9.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--n", type=int, default=5, help="Baseline size")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db.DB_PATH = os.path.join(tmp, f"baseline_{size}.db")
+            db.init_db()
+            populate(size)
+            db.refresh_baselines()
+            conn = db.get_connection()
+
+            print(f"{size} videos, baseline of {args.n}:")
+            timed("before: Python average", lambda: legacy_baseline(conn, args.n), args.repeat)
+            timed("after: SQL AVG (indexed)", lambda: db._compute_baseline(conn, args.n), args.repeat)
+            timed("after: materialized lookup", lambda: db.get_video_baseline(args.n), args.repeat)
+            db.close_connection()
+
+if __name__ == "__main__":
+    main()
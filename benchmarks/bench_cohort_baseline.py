@@ -0,0 +1,111 @@
+"""
+Cohort baseline latency over synthetic videos with Notion experiment pages: each cohort
+(shared descriptors, length bucket, weekday and publish hour) is timed uncached (computed
+in SQLite) and cached, for cohorts built from randomly picked videos. Cohorts of the five
+most recent matches, as the pipeline uses, are timed alongside whole cohorts. Then one
+video's stats are rewritten, as a refresh would, to show how many cached cohorts that
+drops and what the invalidation costs the write.
+
+    python benchmarks/bench_cohort_baseline.py --rows 1k 100k --queries 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db
+from src.baseline import cohort_filters
+from synthetic_db import generate_notion_pages, generate_video_stats, parse_size
+
+PERIOD = "24hr"
+
+# name: (filters, lookback_days, n)
+COHORTS = {
+    "descriptors": (["descriptors"], None, 5),
+    "duration": (["duration"], None, 5),
+    "weekday+hour": (["weekday", "hour"], None, 5),
+    "all": (["descriptors", "duration", "weekday", "hour"], None, 5),
+    "descriptors, all videos": (["descriptors"], None, None),
+    "duration, all videos": (["duration"], None, None),
+    "all, 365 days": (["descriptors", "duration", "weekday", "hour"], 365, None),
+}
+
+def sample_videos(count, seed=0):
+    # (descriptors, publish_date, duration_seconds) of randomly picked stored videos
+    conn = db.get_connection()
+    total = conn.execute("SELECT COUNT(*) FROM video_stats").fetchone()[0]
+    rng = np.random.default_rng(seed)
+    videos = []
+    for i in rng.integers(0, total, count):
+        video_id = f"hist{i:07d}"
+        publish_date, duration_seconds = conn.execute("SELECT publish_date, duration_seconds FROM video_stats WHERE video_id = ?", (video_id,)).fetchone()
+        descriptors = [row[0] for row in conn.execute("SELECT descriptor FROM video_descriptors WHERE video_id = ?", (video_id,))]
+        videos.append((video_id, descriptors, publish_date, duration_seconds))
+    return videos
+
+def timed(filters):
+    started = time.perf_counter()
+    baseline = db.get_cohort_baseline(**filters)
+    return (time.perf_counter() - started) * 1000, baseline.videos
+
+def bench(rows, count):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        generate_video_stats(rows)
+        generate_notion_pages(rows)
+        videos = sample_videos(count)
+
+        results = {}
+        for name, (cohort, lookback_days, n) in COHORTS.items():
+            uncached, cached, sizes = [], [], []
+            for _, descriptors, publish_date, duration_seconds in videos:
+                filters = cohort_filters(cohort, descriptors, publish_date, duration_seconds, lookback_days, n)
+                with db.get_connection() as conn:
+                    conn.execute("DELETE FROM cohort_baselines")
+                ms, size = timed(filters)
+                uncached.append(ms)
+                sizes.append(size)
+                cached.append(timed(filters)[0])
+            results[name] = (statistics.median(uncached), max(uncached), statistics.median(cached), statistics.median(sizes))
+
+        # Cache every sampled cohort, then refresh one video's stats
+        for cohort, lookback_days, n in COHORTS.values():
+            for _, descriptors, publish_date, duration_seconds in videos:
+                db.get_cohort_baseline(**cohort_filters(cohort, descriptors, publish_date, duration_seconds, lookback_days, n))
+        conn = db.get_connection()
+        cached_before = conn.execute("SELECT COUNT(*) FROM cohort_baselines").fetchone()[0]
+        video_id, _, publish_date, _ = videos[0]
+        started = time.perf_counter()
+        db.store_video_stats(video_id, publish_date, PERIOD, {f"views_{PERIOD}": 1234})
+        write_ms = (time.perf_counter() - started) * 1000
+        cached_after = conn.execute("SELECT COUNT(*) FROM cohort_baselines").fetchone()[0]
+
+        started = time.perf_counter()
+        db.store_video_stats(video_id, publish_date, PERIOD, {f"views_{PERIOD}": 1235})
+        empty_write_ms = (time.perf_counter() - started) * 1000
+        db.close_connection()
+    return results, (cached_before, cached_before - cached_after, write_ms, empty_write_ms)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_size, nargs="+", default=[1000, 100000], help="1k, 100k, 1m or row counts")
+    parser.add_argument("--queries", type=int, default=50, help="Cohorts timed per filter set")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        results, (cached, dropped, write_ms, empty_write_ms) = bench(rows, args.queries)
+        print(f"\n{rows} videos")
+        print(f"{'cohort':<24} {'videos p50':>11} {'uncached p50 ms':>16} {'max ms':>7} {'cached p50 ms':>14}")
+        for name, (uncached_p50, uncached_max, cached_p50, size) in results.items():
+            print(f"{name:<24} {size:>11.0f} {uncached_p50:>16.2f} {uncached_max:>7.2f} {cached_p50:>14.3f}")
+        print(f"stats write dropped {dropped} of {cached} cached cohorts in {write_ms:.2f} ms "
+              f"({empty_write_ms:.2f} ms for a second write)")
+
+if __name__ == "__main__":
+    main()
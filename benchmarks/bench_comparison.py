@@ -0,0 +1,73 @@
+"""
+Channel-wide comparison latency at 10k and 100k videos: the per-video compare_to_baseline
+loop versus one batched compare_matrix call, plus a 7d views leaderboard.
+
+    python benchmarks/bench_comparison.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db
+from src.baseline import get_baseline_history, load_baseline_matrix
+from src.comparison import percentile_rank, compare_matrix, load_video_matrix, compare_videos, leaderboard
+from bench_baseline import populate
+
+def timed(label, fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    per_call = (time.perf_counter() - started) / repeat
+    print(f"  {label:<36} {per_call * 1000:>9.3f} ms")
+    return result
+
+def legacy_compare(video_metrics, baseline_metrics, checkpoint, history):
+    # The original implementation: one Python loop per video over its metrics
+    results = {}
+    for metric, value in video_metrics.items():
+        if checkpoint in metric:
+            base_value = baseline_metrics.get(metric, 0)
+            if base_value > 0 and value is not None:
+                delta = ((value - base_value) / base_value) * 100
+            else:
+                delta = None
+            results[metric] = {"value": value, "baseline": base_value, "delta": round(delta, 1) if delta is not None else None}
+            results[metric]["percentile_rank"] = percentile_rank(value, history.get(metric, []))
+    return results
+
+def per_video_loop(n):
+    history = get_baseline_history(n)
+    baseline = db.get_video_baseline(n)
+    conn = db.get_connection()
+    rows = conn.execute(f"SELECT video_id, {', '.join(db.BASELINE_KEYS)} FROM video_stats").fetchall()
+    return [legacy_compare(dict(zip(db.BASELINE_KEYS, row[1:])), baseline, "7d", history) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--n", type=int, default=30, help="Baseline size")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            db.DB_PATH = os.path.join(tmp, f"comparison_{size}.db")
+            db.init_db()
+            populate(size)
+
+            print(f"{size} videos x {len(db.BASELINE_KEYS)} metrics, baseline of {args.n}:")
+            timed("before: per-video loop (7d only)", lambda: per_video_loop(args.n), 1)
+            video_ids, values = load_video_matrix()
+            history = load_baseline_matrix(args.n)
+            timed("load_video_matrix (all keys)", load_video_matrix, args.repeat)
+            comparison = timed("compare_matrix (all keys)", lambda: compare_matrix(values, history, video_ids=video_ids), args.repeat)
+            timed("leaderboard (views_7d delta)", lambda: leaderboard(comparison, "views_7d"), args.repeat)
+            timed("compare_videos + leaderboard (7d)", lambda: leaderboard(compare_videos(["views_7d"], args.n), "views_7d"), args.repeat)
+            db.close_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Rows/sec for writing video stats: the original connect-per-call SELECT-then-INSERT/UPDATE
+path against the pooled WAL connection, with per-row upserts and the bulk executemany path.
+
+    python benchmarks/bench_db_writes.py --rows 5000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db
+
+PERIODS = ["24hr", "48hr", "7d"]
+
+def make_records(n):
+    records = []
+    for i in range(n):
+        period = PERIODS[i % 3]
+        video_id = f"video{i // 3:07d}"
+        records.append((video_id, f"2024-01-{i % 28 + 1:02d}", period, {
+            f"views_{period}": i * 10,
+            f"likes_{period}": i,
+            f"comments_{period}": i // 2,
+            f"average_view_duration_{period}": 31.5,
+            f"average_percentage_viewed_{period}": 72.0,
+            f"subs_gained_{period}": i % 7,
+        }))
+    return records
+
+def legacy_store(path, video_id, publish_date, period, stats):
+    # The pre-pooling implementation: new connection, rollback journal, SELECT then write
+    filtered = {k: v for k, v in stats.items() if k.endswith(f"_{period}")}
+    filtered["publish_date"] = publish_date
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("SELECT video_id FROM video_stats WHERE video_id = ?", (video_id,))
+    if c.fetchone():
+        sets = ", ".join(f"{k} = ?" for k in filtered)
+        c.execute(f"UPDATE video_stats SET {sets} WHERE video_id = ?", list(filtered.values()) + [video_id])
+    else:
+        cols = ["video_id"] + list(filtered)
+        c.execute(f"INSERT INTO video_stats ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})", [video_id] + list(filtered.values()))
+    conn.commit()
+    conn.close()
+
+def fresh_db(tmp, name, wal):
+    path = os.path.join(tmp, name)
+    db.DB_PATH = path
+    db.init_db()
+    if not wal:
+        db.close_connection()
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+    return path
+
+def timed(label, n, fn):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} {n / elapsed:>10.0f} rows/sec ({elapsed:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=3000)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = fresh_db(tmp, "legacy.db", wal=False)
+        timed("before: connect per call", args.rows, lambda: [legacy_store(path, *r) for r in records])
+
+        fresh_db(tmp, "pooled.db", wal=True)
+        timed("after: pooled upsert per call", args.rows, lambda: [db.store_video_stats(*r) for r in records])
+
+        fresh_db(tmp, "bulk.db", wal=True)
+        timed("after: store_video_stats_bulk", args.rows, lambda: db.store_video_stats_bulk(records))
+
+        db.close_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+End-to-end throughput and per-stage latency without live services. YouTube, Notion and
+the agents Runner are replaced by local stand-ins (stub_youtube, stub_notion,
+stub_agents) with configurable latency and error injection, over a synthetic
+video_stats database. Scenarios:
+
+    single    analyses run one after another through main.main
+    batch     batch.run_batch over many pages, sharing the per-service limits
+    backfill  pull.refresh_many_video_stats over the stub channel, in chunks
+
+For each scenario, prints throughput and p50/p95/p99 latency per stage. --json writes
+the same numbers to a file, to compare before and after a change.
+
+    python benchmarks/bench_end_to_end.py --db-rows 100k --scenarios single batch backfill
+    python benchmarks/bench_end_to_end.py --pipeline-mode stream --llm-latency 2 --youtube-error-rate 0.01
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.llm_cache as llm_cache
+import src.notion as notion
+import batch
+import pull
+from batch import percentile
+from main import main as run_analysis, PIPELINE_MODES
+from src import db
+from src.limits import ServiceLimiter
+from src.yt import get_client_stats
+from stub_agents import StubRunner
+from stub_notion import StubNotion
+from stub_youtube import StubYouTube
+from synthetic_db import generate_video_stats, parse_size
+
+SCENARIOS = ["single", "batch", "backfill"]
+
+def add_experiment_pages(stub, count):
+    """Adds `count` experiment pages, each pointing at a different stub video. Returns their IDs."""
+    page_ids = []
+    for i in range(count):
+        page_id = str(uuid.UUID(int=i + 1))
+        stub.add_page(page_id, {
+            "Video Title": {"title": [{"plain_text": f"Stub video {i}"}]},
+            "YouTube ID": {"rich_text": [{"plain_text": f"vid{i:07d}"}]},
+            "Hypothesis": {"rich_text": [{"plain_text": "Opening with a direct question increases average percentage viewed."}]},
+            "Descriptors": {"multi_select": [{"name": "talking head"}, {"name": "question hook"}]},
+            "Script": {"rich_text": [{"plain_text": "Did you know most people get this wrong?"}]},
+        })
+        page_ids.append(page_id)
+    return page_ids
+
+def stage_durations(timings):
+    return {name: end - start for name, (start, end) in timings.items()}
+
+def summarize(name, elapsed, units, unit, samples, failures):
+    """Returns a scenario summary: throughput plus percentiles of every {stage: [seconds]}."""
+    return {
+        "scenario": name,
+        "elapsed_seconds": elapsed,
+        "throughput": units / elapsed if elapsed > 0 else 0.0,
+        "unit": unit,
+        "failures": failures,
+        "stages": {
+            stage: {"count": len(values), **{f"p{q}": percentile(values, q) for q in (50, 95, 99)}, "max": max(values)}
+            for stage, values in samples.items() if values
+        },
+    }
+
+async def bench_single(page_ids, runs, pipeline_mode):
+    samples, failures = {"total": []}, []
+    started = time.perf_counter()
+    for i in range(runs):
+        page_id = page_ids[i % len(page_ids)]
+        run_started = time.perf_counter()
+        try:
+            result = await run_analysis(page_id, "24hr", use_cache=False, pipeline_mode=pipeline_mode)
+        except Exception as e:
+            failures.append(f"{type(e).__name__}: {e}")
+            continue
+        samples["total"].append(time.perf_counter() - run_started)
+        for stage, seconds in stage_durations(result["timings"]).items():
+            samples.setdefault(stage, []).append(seconds)
+    return summarize("single", time.perf_counter() - started, runs, "analyses", samples, failures)
+
+async def bench_batch(page_ids, max_concurrent, pipeline_mode, limits):
+    samples = {"total": []}
+
+    async def recorded(*args, **kwargs):
+        started = time.perf_counter()
+        result = await run_analysis(*args, **kwargs)
+        samples["total"].append(time.perf_counter() - started)
+        for stage, seconds in stage_durations(result["timings"]).items():
+            samples.setdefault(stage, []).append(seconds)
+        return result
+
+    batch.run_analysis = recorded
+    try:
+        summary = await batch.run_batch(page_ids, ["24hr"], limits, max_concurrent, use_cache=False, pipeline_mode=pipeline_mode)
+    finally:
+        batch.run_analysis = run_analysis
+    failures = [failure["error"] for failure in summary["failures"]]
+    return summarize("batch", summary["elapsed_seconds"], summary["jobs"], "analyses", samples, failures)
+
+def bench_backfill(video_ids, chunk_size):
+    samples = {"metadata": [], "stats": [], "store": [], "total": []}
+
+    def timed(stage, fn):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples[stage].append(time.perf_counter() - started)
+        return wrapper
+
+    originals = pull.get_videos_metadata, pull.get_stats_for_videos, pull.store_video_stats_bulk
+    pull.get_videos_metadata = timed("metadata", originals[0])
+    pull.get_stats_for_videos = timed("stats", originals[1])
+    pull.store_video_stats_bulk = timed("store", originals[2])
+
+    failures = []
+    started = time.perf_counter()
+    try:
+        for start in range(0, len(video_ids), chunk_size):
+            chunk_started = time.perf_counter()
+            try:
+                pull.refresh_many_video_stats(video_ids[start:start + chunk_size])
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+                continue
+            samples["total"].append(time.perf_counter() - chunk_started)
+    finally:
+        pull.get_videos_metadata, pull.get_stats_for_videos, pull.store_video_stats_bulk = originals
+    return summarize("backfill", time.perf_counter() - started, len(video_ids), "videos", samples, failures)
+
+def print_summary(summary):
+    print(f"\n{summary['scenario']}: {summary['throughput']:.2f} {summary['unit']}/s over {summary['elapsed_seconds']:.1f}s, {len(summary['failures'])} failed")
+    for failure in sorted(set(summary["failures"]))[:5]:
+        print(f"  failure: {failure}")
+    print(f"  {'stage':<20} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage, stats in summary["stages"].items():
+        print(f"  {stage:<20} {stats['count']:>6} {stats['p50'] * 1000:>9.1f} {stats['p95'] * 1000:>9.1f} {stats['p99'] * 1000:>9.1f} {stats['max'] * 1000:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--db-rows", type=parse_size, default="1k", help="Synthetic video_stats size: 1k, 100k, 1m or a row count")
+    parser.add_argument("--pipeline-mode", choices=PIPELINE_MODES, default="full")
+    parser.add_argument("--runs", type=int, default=20, help="Analyses in the single scenario")
+    parser.add_argument("--pages", type=int, default=50, help="Analyses in the batch scenario")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="Analyses in flight in the batch scenario")
+    parser.add_argument("--videos", type=int, default=500, help="Videos in the backfill scenario")
+    parser.add_argument("--backfill-chunk", type=int, default=100, help="Videos per refresh_many_video_stats call")
+    parser.add_argument("--youtube-latency", type=float, default=0.05, help="Seconds per YouTube request")
+    parser.add_argument("--youtube-jitter", type=float, default=0.02, help="Extra random seconds per YouTube request, up to this")
+    parser.add_argument("--youtube-error-rate", type=float, default=0.0, help="Share of YouTube requests answered with a 503")
+    parser.add_argument("--notion-latency", type=float, default=0.1, help="Seconds per Notion request")
+    parser.add_argument("--notion-error-rate", type=float, default=0.0, help="Share of Notion requests answered with a 503 (retried by the client)")
+    parser.add_argument("--notion-rate", type=float, default=notion.NOTION_RATE_LIMIT, help="Notion client pacing, requests per second")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds per agent run")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="Extra random seconds per agent run, up to this")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Share of agent runs that raise")
+    parser.add_argument("--json", type=str, help="Also write the summaries to this file")
+    args = parser.parse_args()
+
+    youtube = StubYouTube(videos=max(args.videos, args.pages, args.runs), latency=args.youtube_latency, jitter=args.youtube_jitter, error_rate=args.youtube_error_rate).start()
+    youtube.install()
+    notion_stub = StubNotion(latency=args.notion_latency, error_rate=args.notion_error_rate).start()
+    notion.NOTION_API_BASE = notion_stub.base_url
+    notion._client = notion.NotionClient(rate=args.notion_rate)
+    StubRunner(latency=args.llm_latency, jitter=args.llm_jitter, error_rate=args.llm_error_rate).install()
+    page_ids = add_experiment_pages(notion_stub, max(args.pages, args.runs))
+
+    summaries = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "video_stats.db")
+        llm_cache._cache = llm_cache.LLMCache(os.path.join(tmp, "llm_cache.db"))
+        started = time.perf_counter()
+        generate_video_stats(args.db_rows)
+        print(f"synthetic database: {args.db_rows} videos in {time.perf_counter() - started:.1f}s")
+
+        # The pipeline prints its progress; keep the report readable
+        quiet = contextlib.redirect_stdout(io.StringIO())
+
+        if "single" in args.scenarios:
+            with quiet:
+                summaries.append(asyncio.run(bench_single(page_ids, args.runs, args.pipeline_mode)))
+            print_summary(summaries[-1])
+
+        if "batch" in args.scenarios:
+            limits = {
+                "notion": ServiceLimiter("notion", 3, args.notion_rate),
+                "youtube": ServiceLimiter("youtube", 8, 10.0),
+                "openai": ServiceLimiter("openai", 4, 2.0),
+            }
+            with quiet:
+                summaries.append(asyncio.run(bench_batch(page_ids[:args.pages], args.max_concurrent, args.pipeline_mode, limits)))
+            print_summary(summaries[-1])
+
+        if "backfill" in args.scenarios:
+            with quiet:
+                summaries.append(bench_backfill(youtube.video_ids[:args.videos], args.backfill_chunk))
+            print_summary(summaries[-1])
+
+        db.close_connection()
+
+    print(f"\nstub requests: youtube {youtube.requests}, notion {notion_stub.requests}")
+    print(f"youtube client: {get_client_stats()}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "scenarios": summaries}, f, indent=2)
+
+    youtube.stop()
+    notion_stub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup regression check: imports pull.py and app.py under `python -X importtime` and
+fails if either exceeds its time budget, loads a module it should load lazily, or
+creates files (e.g. the SQLite database) just by being imported.
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget pull=300 --budget app=900
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds of cumulative import time allowed per entry point
+BUDGETS_MS = {"pull": 400, "app": 900}
+
+# Heavy packages each entry point must not import at startup
+FORBIDDEN = {
+    "pull": ["agents", "openai", "streamlit", "numpy", "google_auth_oauthlib", "google.oauth2.credentials"],
+    "app": ["agents", "openai", "numpy", "google_auth_oauthlib", "google.oauth2.credentials"],
+}
+
+def import_profile(module):
+    """Imports module in a fresh interpreter and returns {imported module: cumulative microseconds}."""
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+        created = os.listdir(cwd)
+
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile, created
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point; the median is checked")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS", help="Override a time budget")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to list per entry point")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for override in args.budget:
+        module, ms = override.split("=")
+        budgets[module] = float(ms)
+
+    failures = []
+    for module, budget in budgets.items():
+        runs = [import_profile(module) for _ in range(args.runs)]
+        median_ms = statistics.median(profile[module] for profile, _ in runs) / 1000
+        profile, created = runs[-1]
+
+        print(f"{module}: {median_ms:.0f} ms (budget {budget:.0f} ms)")
+        slowest = sorted(((us, name) for name, us in profile.items() if name != module), reverse=True)
+        for us, name in slowest[:args.top]:
+            print(f"    {us / 1000:>8.1f} ms  {name}")
+
+        if median_ms > budget:
+            failures.append(f"{module} took {median_ms:.0f} ms, over its {budget:.0f} ms budget")
+        loaded = [name for name in FORBIDDEN.get(module, []) if name in profile]
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)} at startup")
+        if created:
+            failures.append(f"importing {module} created {', '.join(created)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
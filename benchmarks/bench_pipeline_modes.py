@@ -0,0 +1,71 @@
+"""
+End-to-end latency and token cost of the LLM stages in the "full" pipeline
+(evaluation -> report writer -> text-to-JSON) against the "fast" pipeline
+(evaluation -> build_report_blocks). Calls the real models, so OPENAI_API_KEY must be
+set; the response cache is bypassed.
+
+    python benchmarks/bench_pipeline_modes.py --runs 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.openai import run_evaluation_agent, run_report_agent, run_text_to_json_agent, build_report_blocks, track_llm_usage
+
+PERIOD = "24hr"
+
+STATS = {
+    "views_24hr": 5400, "likes_24hr": 310, "comments_24hr": 42,
+    "average_view_duration_24hr": 38.2, "average_percentage_viewed_24hr": 71.5, "subs_gained_24hr": 25,
+}
+
+BASELINE = {
+    "views_24hr": 4100.0, "likes_24hr": 260.0, "comments_24hr": 35.0,
+    "average_view_duration_24hr": 33.9, "average_percentage_viewed_24hr": 64.0, "subs_gained_24hr": 19.0,
+}
+
+DESCRIPTORS = ["talking head", "question hook", "captions"]
+HYPOTHESIS = "Opening with a direct question increases average percentage viewed."
+SCRIPT = "Did you know most people get this wrong? Here's the one setting you need to change..."
+
+async def run_once(mode):
+    usage = track_llm_usage()
+    started = time.perf_counter()
+    evaluation = await run_evaluation_agent(PERIOD, STATS, BASELINE, DESCRIPTORS, HYPOTHESIS, SCRIPT, use_cache=False)
+    if mode == "full":
+        report = await run_report_agent(evaluation.evaluation, use_cache=False)
+        await run_text_to_json_agent(report, use_cache=False)
+    else:
+        build_report_blocks(evaluation)
+    return time.perf_counter() - started, usage
+
+async def bench(runs):
+    results = {}
+    for mode in ("full", "fast"):
+        latencies, tokens, requests = [], [], []
+        for _ in range(runs):
+            seconds, usage = await run_once(mode)
+            latencies.append(seconds)
+            tokens.append(usage["total_tokens"])
+            requests.append(usage["requests"])
+        results[mode] = (latencies, tokens, requests)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    results = asyncio.run(bench(args.runs))
+
+    print(f"\n{'mode':<6} {'median s':>9} {'mean s':>8} {'LLM calls':>10} {'tokens/run':>11}")
+    for mode, (latencies, tokens, requests) in results.items():
+        print(f"{mode:<6} {statistics.median(latencies):>9.2f} {statistics.mean(latencies):>8.2f} {statistics.mean(requests):>10.1f} {statistics.mean(tokens):>11.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Size and build time of the evaluation prompt for long scripts, unbudgeted (the whole
+script, as before src/prompts.py) against the token-budgeted builder with five past
+videos. Builds are timed cold (script ranked), warm (ranking read from the
+script_rankings cache) and warm with a smaller budget, against a temporary database.
+
+    python benchmarks/bench_prompt_builder.py --words 300 1500 6000
+    python benchmarks/bench_prompt_builder.py --live --runs 3    # also times the real evaluation agent
+
+--live calls the real model, so OPENAI_API_KEY must be set; the response cache is bypassed.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.db as db
+from src.prompts import build_evaluation_prompt, count_tokens, EVAL_PROMPT_TOKEN_BUDGET
+from src.similarity import SimilarVideo
+
+PERIOD = "24hr"
+
+STATS = {
+    "views": 5400, "likes": 310, "comments": 42,
+    "average_view_duration": 38.2, "average_percentage_viewed": 71.5, "subs_gained": 25,
+}
+
+BASELINE = {
+    "views": 4100.0, "likes": 260.0, "comments": 35.0,
+    "average_view_duration": 33.9, "average_percentage_viewed": 64.0, "subs_gained": 19.0,
+}
+
+DESCRIPTORS = ["talking head", "question hook", "captions"]
+HYPOTHESIS = "Opening with a direct question increases average percentage viewed."
+
+TOPICS = ["camera settings", "lighting", "audio", "editing", "thumbnails", "hooks", "captions", "pacing", "retention", "lenses"]
+PHRASES = [
+    "Most people get {t} wrong because they copy what they see online.",
+    "Here's the thing about {t} that nobody tells you.",
+    "If you only change one thing today, make it your {t}.",
+    "I tested {t} for thirty days and the numbers surprised me.",
+    "The fix for {t} takes less than a minute.",
+    "Watch what happens to {t} when you slow down.",
+    "Your viewers notice {t} before they notice anything else.",
+    "Comment below if {t} has been holding you back.",
+]
+
+def synthetic_script(words, seed=0):
+    rng = random.Random(seed)
+    sentences = ["Did you know most creators get this completely wrong?"]
+    while sum(len(s.split()) for s in sentences) < words:
+        sentences.append(rng.choice(PHRASES).format(t=rng.choice(TOPICS)))
+    sentences.append("Follow for part two, where I fix my own setup.")
+    return " ".join(sentences)
+
+def synthetic_history(count=5, seed=0):
+    rng = random.Random(seed)
+    return [
+        SimilarVideo(f"past{i}", f"Past video {i} about {rng.choice(TOPICS)}", f"2026-0{i + 1}-01T15:00:00Z", rng.sample(DESCRIPTORS + ["b-roll", "voiceover"], 2),
+                     {key: round(value * rng.uniform(0.6, 1.4), 1) for key, value in BASELINE.items()}, 1.0)
+        for i in range(count)
+    ]
+
+def build(script, video_id, budget):
+    started = time.perf_counter()
+    instructions, input, tokens = build_evaluation_prompt(PERIOD, STATS, BASELINE, DESCRIPTORS, HYPOTHESIS, script, synthetic_history() if budget else None, video_id, budget or 10**9)
+    return (time.perf_counter() - started) * 1000, tokens["total"]
+
+async def live(script, runs, budget):
+    from src.openai import run_evaluation_agent, track_llm_usage
+
+    stats = {f"{key}_{PERIOD}": value for key, value in STATS.items()}
+    baseline = {f"{key}_{PERIOD}": value for key, value in BASELINE.items()}
+    results = {}
+    for name, kwargs in (("unbudgeted", {"token_budget": 10**9}), ("budgeted", {"token_budget": budget, "history": synthetic_history(), "video_id": "bench"})):
+        latencies, tokens = [], []
+        for _ in range(runs):
+            usage = track_llm_usage()
+            started = time.perf_counter()
+            await run_evaluation_agent(PERIOD, stats, baseline, DESCRIPTORS, HYPOTHESIS, script, use_cache=False, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            tokens.append(usage["input_tokens"])
+        results[name] = (latencies, tokens)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[300, 1500, 6000], help="Script lengths in words")
+    parser.add_argument("--budget", type=int, default=EVAL_PROMPT_TOKEN_BUDGET, help="Prompt token budget")
+    parser.add_argument("--live", action="store_true", help="Also time the real evaluation agent on the longest script")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+
+        print(f"budget {args.budget} tokens\n")
+        print(f"{'words':>6} {'script tok':>11} {'unbudgeted tok':>15} {'budgeted tok':>13} {'cold ms':>8} {'warm ms':>8} {'warm -100 ms':>13}")
+        for words in args.words:
+            script = synthetic_script(words)
+            _, full_tokens = build(script, None, None)
+            cold_ms, budgeted_tokens = build(script, f"bench{words}", args.budget)
+            warm_ms = statistics.median(build(script, f"bench{words}", args.budget)[0] for _ in range(5))
+            # A different budget reuses the cached ranking
+            smaller_ms = statistics.median(build(script, f"bench{words}", args.budget - 100)[0] for _ in range(5))
+            print(f"{words:>6} {count_tokens(script):>11} {full_tokens:>15} {budgeted_tokens:>13} {cold_ms:>8.1f} {warm_ms:>8.1f} {smaller_ms:>13.1f}")
+
+        if args.live:
+            results = asyncio.run(live(synthetic_script(max(args.words)), args.runs, args.budget))
+            print(f"\n{'prompt':<11} {'median s':>9} {'mean s':>8} {'input tokens':>13}")
+            for name, (latencies, tokens) in results.items():
+                print(f"{name:<11} {statistics.median(latencies):>9.2f} {statistics.mean(latencies):>8.2f} {statistics.mean(tokens):>13.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Finding the five past experiments most similar to a new one: the similarity index
+(descriptor inverted index + memory-mapped hashed TF-IDF vectors) against scoring every
+cached experiment page in Python, over synthetic videos with Notion experiment pages.
+Reports the index build time and size, the first query after loading it from disk, and
+per-query latency percentiles.
+
+    python benchmarks/bench_similarity.py --rows 1k 100k --queries 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db, similarity
+from src.similarity import find_similar_videos, experiment_text, get_similarity_index, rebuild_similarity_index
+from synthetic_db import DESCRIPTORS, SENTENCES, TOPICS, generate_notion_pages, generate_video_stats, parse_size
+
+PERIOD = "24hr"
+
+def queries(count, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        topic = str(rng.choice(TOPICS))
+        descriptors = rng.choice(DESCRIPTORS, 3, replace=False).tolist()
+        properties = {
+            "hypothesis": f"Using {descriptors[0]} improves retention for {topic} videos.",
+            "script": " ".join(str(rng.choice(SENTENCES)).format(t=topic) for _ in range(8)),
+        }
+        yield descriptors, experiment_text(properties)
+
+def scan_similar(documents, descriptors, text, k=5):
+    # Without the index: Jaccard over descriptors and word overlap over text, for every page
+    wanted = {d.lower() for d in descriptors}
+    words = set(text.lower().split())
+    scored = []
+    for video_id, title, _, properties in documents:
+        theirs = {d.lower() for d in (properties or {}).get("descriptors") or []}
+        their_words = set(experiment_text(properties, title).lower().split())
+        jaccard = len(wanted & theirs) / len(wanted | theirs) if wanted | theirs else 0.0
+        overlap = len(words & their_words) / len(words | their_words) if words | their_words else 0.0
+        scored.append((0.6 * jaccard + 0.35 * overlap, video_id))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    return statistics.median(ordered), ordered[int(len(ordered) * 0.95) - 1]
+
+def index_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def bench(rows, count, scan_queries):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "bench.db")
+        generate_video_stats(rows)
+        generate_notion_pages(rows)
+
+        started = time.perf_counter()
+        rebuild_similarity_index()
+        build_seconds = time.perf_counter() - started
+
+        # A fresh process: the index is loaded (memory-mapped) from disk on first use
+        similarity._index = None
+        descriptors, text = next(queries(1, seed=1))
+        started = time.perf_counter()
+        find_similar_videos(descriptors, text, PERIOD)
+        first_ms = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        for descriptors, text in queries(count):
+            started = time.perf_counter()
+            find_similar_videos(descriptors, text, PERIOD)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        documents = db.get_experiment_documents()
+        scan = []
+        for descriptors, text in queries(scan_queries):
+            started = time.perf_counter()
+            scan_similar(documents, descriptors, text)
+            scan.append((time.perf_counter() - started) * 1000)
+
+        size = index_bytes(similarity.index_path())
+        assert len(get_similarity_index()) == rows
+        db.close_connection()
+        similarity._index = None
+    return build_seconds, size, first_ms, percentiles(latencies), percentiles(scan)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_size, nargs="+", default=[1000, 100000], help="1k, 100k, 1m or row counts")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-queries", type=int, default=5, help="Queries timed for the Python scan, which is slow")
+    args = parser.parse_args()
+
+    print(f"{'videos':>8} {'build s':>8} {'index MB':>9} {'first ms':>9} {'p50 ms':>7} {'p95 ms':>7} {'scan p50 ms':>12}")
+    for rows in args.rows:
+        build_seconds, size, first_ms, (p50, p95), (scan_p50, _) = bench(rows, args.queries, args.scan_queries)
+        print(f"{rows:>8} {build_seconds:>8.2f} {size / 1e6:>9.1f} {first_ms:>9.1f} {p50:>7.2f} {p95:>7.2f} {scan_p50:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Snapshot store latency at 1M and 10M rows: per-video checkpoint stats, single-metric
+interpolation and baselines at arbitrary ages. Each video gets hourly snapshots for its
+first week and daily snapshots for the following 12 weeks.
+
+    python benchmarks/bench_snapshots.py --rows 1000000 10000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db, snapshots
+
+AGES = list(range(1, 169)) + list(range(192, 169 + 84 * 24, 24))
+
+def populate(rows):
+    random.seed(rows)
+    per_video = len(AGES) * len(snapshots.SNAPSHOT_METRICS)
+    videos = max(1, rows // per_video)
+    conn = db.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO video_stats (video_id, publish_date) VALUES (?, ?)",
+            [(f"video{i:07d}", f"20{10 + i % 15}-{1 + i % 12:02d}-{1 + i % 28:02d}T12:00:00Z") for i in range(videos)],
+        )
+        for i in range(videos):
+            scale = random.uniform(0.2, 5)
+            conn.executemany(
+                "INSERT INTO video_metric_snapshots VALUES (?, ?, ?, ?)",
+                ((f"video{i:07d}", metric, age, scale * age * (j + 1)) for j, metric in enumerate(snapshots.SNAPSHOT_METRICS) for age in AGES),
+            )
+    return videos
+
+def timed(label, fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - started) / repeat
+    print(f"  {label:<36} {per_call * 1000:>9.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000000])
+    parser.add_argument("--n", type=int, default=30, help="Baseline size")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            db.DB_PATH = os.path.join(tmp, f"snapshots_{rows}.db")
+            db.init_db()
+            started = time.perf_counter()
+            videos = populate(rows)
+            print(f"{videos * len(AGES) * len(snapshots.SNAPSHOT_METRICS)} snapshot rows ({videos} videos), loaded in {time.perf_counter() - started:.1f}s:")
+
+            video_id = f"video{videos // 2:07d}"
+            timed("db.get_video_stats (wide row)", lambda: db.get_video_stats(video_id), args.repeat)
+            timed("get_snapshot_stats (24hr/48hr/7d)", lambda: snapshots.get_snapshot_stats(video_id), args.repeat)
+            timed("get_metric_at (views, 30.5h)", lambda: snapshots.get_metric_at(video_id, "views", 30.5), args.repeat)
+            for hours in (24, 100.5, 1000):
+                timed(f"get_snapshot_baseline({hours}h, n={args.n})", lambda: snapshots.get_snapshot_baseline(hours, args.n, "median"), args.repeat)
+            db.close_connection()
+
+if __name__ == "__main__":
+    main()
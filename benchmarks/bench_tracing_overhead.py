@@ -0,0 +1,60 @@
+"""
+Cost of the telemetry instrumentation per instrumented call: with tracing disabled
+(the default), and with the JSON lines and Prometheus exporters enabled.
+
+    python benchmarks/bench_tracing_overhead.py --calls 200000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import telemetry
+
+def plain():
+    return 1
+
+@telemetry.traced("bench.traced")
+def traced():
+    return 1
+
+def with_span():
+    with telemetry.span("bench.span", kind="client", endpoint="bench") as s:
+        s.set("status", 200)
+        return 1
+
+def per_call_ns(fn, calls):
+    started = time.perf_counter_ns()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter_ns() - started) / calls
+
+def report(label, calls):
+    base = per_call_ns(plain, calls)
+    print(f"{label}:")
+    for name, fn in (("@traced function", traced), ("with span(...) block", with_span)):
+        cost = per_call_ns(fn, calls)
+        print(f"  {name:<22} {cost:>9.0f} ns/call ({cost - base:>7.0f} ns over a plain call)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    report("tracing disabled", args.calls)
+
+    prometheus = telemetry.add_exporter(telemetry.PrometheusExporter())
+    report("Prometheus exporter", args.calls // 10)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = telemetry.add_exporter(telemetry.JsonLinesExporter(os.path.join(tmp, "spans.jsonl")))
+        telemetry.remove_exporter(prometheus)
+        report("JSON lines exporter", args.calls // 10)
+        telemetry.remove_exporter(jsonl)
+        jsonl.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Reading 100k video_stats rows: latency and retained memory of the original per-video
+SELECT * lookups into dicts, versus get_many_video_stats records and columnar arrays.
+
+    python benchmarks/bench_video_stats_reads.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db
+from bench_baseline import populate
+
+LEGACY_KEYS = ["video_id", "title", "publish_date"] + db.BASELINE_KEYS
+
+def legacy_get_video_stats(video_id):
+    # The original implementation: SELECT * zipped against a hand-maintained key list
+    c = db.get_connection().cursor()
+    c.execute("SELECT * FROM video_stats WHERE video_id = ?", (video_id,))
+    row = c.fetchone()
+    return dict(zip(LEGACY_KEYS, row)) if row else None
+
+def measure(label, fn):
+    # Timed without tracing, which would slow the allocation-heavy reads unevenly
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    result = fn()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    print(f"  {label:<40} {elapsed * 1000:>9.1f} ms {retained / 1e6:>9.1f} MB retained")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "reads.db")
+        db.init_db()
+        populate(args.rows)
+        video_ids = [f"video{i:07d}" for i in range(args.rows)]
+
+        print(f"{args.rows} rows:")
+        measure("before: get_video_stats dicts, N lookups", lambda: [legacy_get_video_stats(v) for v in video_ids])
+        measure("after: get_many_video_stats records", lambda: db.get_many_video_stats(video_ids))
+        measure("after: get_video_stats_columns arrays", db.get_video_stats_columns)
+        db.close_connection()
+
+if __name__ == "__main__":
+    main()
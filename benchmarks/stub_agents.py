@@ -0,0 +1,109 @@
+"""
+Local stand-in for the agents SDK's Runner: answers every agent after a configurable
+delay with canned output of the agent's output type, streams the report writer's text
+in chunks, reports plausible token usage, and can inject errors.
+
+    runner = StubRunner(latency=1.5).install()  # replaces agents.Runner
+"""
+import asyncio
+import random
+from types import SimpleNamespace
+
+REPORT_TEXT = """## Summary
+Views and likes came in above the baseline over the period, while average percentage viewed was close to it.
+
+## What Went Well
+The opening question held viewers through the first minute. Likes per view were the highest of the last five videos.
+
+## What Didn't Go Well
+Comments were below the baseline and subscriber growth was flat.
+
+## Suggestions
+Keep the question hook and test a stronger call to comment in the next video.
+"""
+
+EVALUATION_TEXT = """<report>
+<what_went_well>Views and likes were above the baseline.
+
+Average percentage viewed held steady.</what_went_well>
+<what_didnt_go_well>Comments were below the baseline.</what_didnt_go_well>
+<test_result>The hypothesis is supported by the retention numbers.</test_result>
+<comparative_patterns>Videos with question hooks consistently retain better.</comparative_patterns>
+<suggestions>Keep the hook and add a call to comment.</suggestions>
+</report>"""
+
+class StubRunnerError(Exception):
+    pass
+
+class StubRunner:
+
+    def __init__(self, latency: float = 1.0, jitter: float = 0.0, error_rate: float = 0.0, stream_chunks: int = 40, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.random = random.Random(seed)
+        self.runs = 0
+
+    def install(self):
+        """Replaces agents.Runner, which src.openai looks up on every run."""
+        import agents
+
+        agents.Runner = self
+        return self
+
+    def _delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def _check_error(self, agent):
+        self.runs += 1
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise StubRunnerError(f"Injected failure in {agent.name}")
+
+    def _output(self, agent, input):
+        from agents import AgentOutputSchema
+        from src.openai import EvaluationResult, NotionBlock, NotionBlocks
+
+        output_type = agent.output_type.output_type if isinstance(agent.output_type, AgentOutputSchema) else agent.output_type
+        if output_type is EvaluationResult:
+            return EvaluationResult(evaluation=EVALUATION_TEXT, hypothesis_result="Success")
+        if output_type is NotionBlocks:
+            blocks = [
+                NotionBlock(type="heading_2", text=part.strip("# \n")) if part.startswith("#") else NotionBlock(type="paragraph", text=part.strip())
+                for part in REPORT_TEXT.replace("\n## ", "\n\n## ").split("\n\n") if part.strip()
+            ]
+            return NotionBlocks(blocks=blocks)
+        return REPORT_TEXT
+
+    def _result(self, input, output):
+        text = output if isinstance(output, str) else output.model_dump_json()
+        input_tokens, output_tokens = len(input) // 4, len(text) // 4
+        usage = SimpleNamespace(requests=1, input_tokens=input_tokens, output_tokens=output_tokens, total_tokens=input_tokens + output_tokens)
+        return SimpleNamespace(final_output=output, context_wrapper=SimpleNamespace(usage=usage))
+
+    async def run(self, agent, input):
+        await asyncio.sleep(self._delay())
+        self._check_error(agent)
+        return self._result(input, self._output(agent, input))
+
+    def run_streamed(self, agent, input):
+        runner = self
+        text = self._output(agent, input)
+        streamed = SimpleNamespace(final_output=None, context_wrapper=None)
+
+        async def stream_events():
+            from openai.types.responses import ResponseTextDeltaEvent
+
+            runner._check_error(agent)
+            size = max(1, len(text) // runner.stream_chunks)
+            delay = runner._delay() / max(1, runner.stream_chunks)
+            for start in range(0, len(text), size):
+                await asyncio.sleep(delay)
+                delta = ResponseTextDeltaEvent.model_construct(type="response.output_text.delta", delta=text[start:start + size])
+                yield SimpleNamespace(type="raw_response_event", data=delta)
+            result = runner._result(input, text)
+            streamed.final_output = result.final_output
+            streamed.context_wrapper = result.context_wrapper
+
+        streamed.stream_events = stream_events
+        return streamed
@@ -0,0 +1,152 @@
+"""
+Local stand-in for the parts of the Notion API this project uses: pages, database
+queries and block children. Enforces Notion's append limits (100 children and 500KB per
+request, 2,000 characters and 100 items per rich_text array) and can inject latency and
+errors.
+
+    server = StubNotion(latency=0.05).start()
+    src.notion.NOTION_API_BASE = server.base_url
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_REQUEST_BYTES = 500_000
+
+class StubNotion:
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.children = {}  # parent_id -> appended blocks, in order
+        self.pages = {}  # page_id -> page object
+        self.databases = {}  # database_id -> [page_id]
+        self.requests = 0
+        self.fail_requests = set()  # request numbers (1-based) answered with a 400
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _handle(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                if length > MAX_REQUEST_BYTES:
+                    self._send(413, {"object": "error", "code": "validation_error", "message": "Request body too large"})
+                    return
+                body = json.loads(raw or b"{}")
+                status, response, headers = stub.handle(method, self.path, body)
+                self._send(status, response, headers)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_page(self, page_id: str, properties: dict, database_id: str = None):
+        page = {
+            "object": "page",
+            "id": page_id,
+            "last_edited_time": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime()),
+            "properties": properties,
+        }
+        with self.lock:
+            self.pages[page_id] = page
+            if database_id:
+                self.databases.setdefault(database_id, []).append(page_id)
+        return page
+
+    def handle(self, method, path, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            number = self.requests
+        if number in self.fail_requests:
+            return 400, {"object": "error", "code": "validation_error", "message": "Injected failure"}, None
+        if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+            return 429, {"object": "error", "code": "rate_limited"}, {"Retry-After": "0.05"}
+        if self.error_rate and self.random.random() < self.error_rate:
+            return 503, {"object": "error", "code": "service_unavailable"}, None
+
+        if match := re.fullmatch(r"/v1/blocks/([^/]+)/children", path):
+            return self._append(match.group(1), body)
+        if match := re.fullmatch(r"/v1/pages/([^/]+)", path):
+            return self._page(method, match.group(1), body)
+        if match := re.fullmatch(r"/v1/databases/([^/]+)/query", path):
+            return self._query(match.group(1), body)
+        return 404, {"object": "error", "code": "object_not_found"}, None
+
+    def _append(self, parent_id, body):
+        children = body.get("children", [])
+        if len(children) > 100:
+            return 400, {"object": "error", "code": "validation_error", "message": "body.children.length should be <= 100"}, None
+        for block in children:
+            rich_text = block.get(block.get("type"), {}).get("rich_text", [])
+            if len(rich_text) > 100 or any(len(item["text"]["content"]) > 2000 for item in rich_text):
+                return 400, {"object": "error", "code": "validation_error", "message": "rich_text exceeds Notion limits"}, None
+        with self.lock:
+            stored = self.children.setdefault(parent_id, [])
+            results = [dict(block, id=str(uuid.uuid4())) for block in children]
+            stored.extend(results)
+        return 200, {"object": "list", "results": results}, None
+
+    def _page(self, method, page_id, body):
+        with self.lock:
+            page = self.pages.get(page_id)
+            if page is None:
+                return 404, {"object": "error", "code": "object_not_found"}, None
+            if method == "PATCH":
+                page["properties"].update(body.get("properties", {}))
+                page["last_edited_time"] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+            return 200, page, None
+
+    def _query(self, database_id, body):
+        with self.lock:
+            pages = [self.pages[page_id] for page_id in self.databases.get(database_id, [])]
+        after = (body.get("filter") or {}).get("last_edited_time", {}).get("on_or_after")
+        if after:
+            pages = [page for page in pages if page["last_edited_time"] >= after]
+        start = int(body.get("start_cursor") or 0)
+        size = min(int(body.get("page_size", 100)), 100)
+        chunk = pages[start:start + size]
+        more = start + size < len(pages)
+        return 200, {"object": "list", "results": chunk, "has_more": more, "next_cursor": str(start + size) if more else None}, None
@@ -0,0 +1,164 @@
+"""
+Local stand-in for the parts of the YouTube Data and Analytics APIs this project uses:
+videos.list, channels.list (mine), playlistItems.list for the uploads playlist, and
+Analytics reports by video or by day; other dimensions are rejected with a 400, as the
+real API rejects undocumented ones. Every video ID exists; its publish date and stats
+are derived from the ID, so repeated runs see the same data. Can inject latency and errors.
+
+    server = StubYouTube(videos=1000, latency=0.05).start()
+    server.install()  # points src.yt at the stub and skips the OAuth token refresh
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Same order as src.yt.ANALYTICS_METRICS
+METRICS = [
+    "views", "averageViewDuration", "averageViewPercentage", "estimatedMinutesWatched",
+    "likes", "comments", "subscribersGained", "subscribersLost",
+]
+
+class StubYouTube:
+
+    def __init__(self, videos: int = 1000, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.video_ids = [f"vid{i:07d}" for i in range(videos)]
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = {}  # endpoint -> request count
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {name: values[0] for name, values in parse_qs(url.query).items()}
+                status, body = stub.handle(url.path, params)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def install(self):
+        """Points src.yt at this server and gives its client a token that never expires."""
+        from types import SimpleNamespace
+        import src.yt as yt
+
+        yt.DATA_API_BASE = f"{self.base_url}/youtube/v3"
+        yt.ANALYTICS_API_BASE = f"{self.base_url}/v2"
+        yt.get_client()._creds = SimpleNamespace(token="stub-token", expiry=datetime.utcnow() + timedelta(days=365))
+
+    def published_at(self, video_id: str):
+        # Between 8 and 730 days ago, so every period has elapsed
+        days = 8 + zlib.crc32(video_id.encode()) % 723
+        published = datetime.now(timezone.utc).replace(hour=14, minute=0, second=0, microsecond=0) - timedelta(days=days)
+        return published.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _daily_views(self, video_id: str, day: int):
+        scale = 200 + zlib.crc32(video_id.encode()) % 5000
+        return int(scale / (1 + day) ** 1.2)
+
+    def _row(self, video_id: str, first_day: int, last_day: int):
+        views = sum(self._daily_views(video_id, day) for day in range(first_day, last_day + 1))
+        duration = 30 + zlib.crc32(video_id.encode()) % 240
+        percentage = round(25 + zlib.crc32(video_id[::-1].encode()) % 60 + 0.5, 1)
+        return [
+            views, duration, percentage, views * duration // 60,
+            views // 25, views // 200, views // 150, views // 1000,
+        ]
+
+    def handle(self, path, params):
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        endpoint = path.rsplit("/", 1)[-1]
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            failed = self.error_rate and self.random.random() < self.error_rate
+        if failed:
+            return 503, {"error": {"code": 503, "message": "Injected failure"}}
+
+        if path == "/youtube/v3/videos":
+            return 200, {"items": [self._video(video_id) for video_id in params.get("id", "").split(",")[:50] if video_id]}
+        if path == "/youtube/v3/channels":
+            return 200, {"items": [{"contentDetails": {"relatedPlaylists": {"uploads": "UUstub"}}}]}
+        if path == "/youtube/v3/playlistItems":
+            start = int(params.get("pageToken") or 0)
+            size = min(int(params.get("maxResults", 5)), 50)
+            chunk = self.video_ids[start:start + size]
+            body = {"items": [{"contentDetails": {"videoId": video_id}} for video_id in chunk]}
+            if start + size < len(self.video_ids):
+                body["nextPageToken"] = str(start + size)
+            return 200, body
+        if path == "/v2/reports":
+            report = self._report(params)
+            if report is None:
+                return 400, {"error": {"code": 400, "message": f"Unsupported dimensions {params.get('dimensions')}"}}
+            return 200, report
+        return 404, {"error": {"code": 404, "message": f"Unknown endpoint {path}"}}
+
+    def _video(self, video_id):
+        return {
+            "id": video_id,
+            "snippet": {
+                "title": f"Stub video {video_id}",
+                "description": "Generated by the benchmark stub.",
+                "publishedAt": self.published_at(video_id),
+                "channelTitle": "Stub Channel",
+                "thumbnails": {},
+            },
+            "contentDetails": {"duration": f"PT{1 + zlib.crc32(video_id.encode()) % 20}M{zlib.crc32(video_id.encode()) % 60}S"},
+        }
+
+    def _report(self, params):
+        video_ids = params.get("filters", "").removeprefix("video==").split(",")
+        start, end = date.fromisoformat(params["startDate"]), date.fromisoformat(params["endDate"])
+        today = date.today()
+
+        if params.get("dimensions") not in ("day", "video"):
+            return None
+        if params.get("dimensions") == "day":
+            video_id = video_ids[0]
+            published = datetime.fromisoformat(self.published_at(video_id)).date()
+            rows = []
+            day = max(start, published)
+            # Like YouTube, the most recent days are not reported yet
+            while day <= min(end, today - timedelta(days=2)):
+                offset = (day - published).days
+                rows.append([day.isoformat(), *self._row(video_id, offset, offset)])
+                day += timedelta(days=1)
+            return {"columnHeaders": [{"name": "day"}] + [{"name": name} for name in METRICS], "rows": rows}
+
+        rows = []
+        for video_id in video_ids:
+            published = datetime.fromisoformat(self.published_at(video_id)).date()
+            if end >= published:
+                rows.append([video_id, *self._row(video_id, max(0, (start - published).days), (min(end, today) - published).days)])
+        return {"columnHeaders": [{"name": "video"}] + [{"name": name} for name in METRICS], "rows": rows}
@@ -0,0 +1,154 @@
+"""
+Generates synthetic video_stats databases for benchmarks: one row per video with every
+period filled in, publish dates spread over the past years, long-tailed views and
+metrics that scale with them. Optionally adds the matching checkpoint snapshots, and
+cached Notion experiment pages (descriptors, hypothesis, script) for the videos.
+
+    python benchmarks/synthetic_db.py --rows 1k --out /tmp/video_stats_1k.db
+    python benchmarks/synthetic_db.py --rows 1m --snapshots --out /tmp/video_stats_1m.db
+    python benchmarks/synthetic_db.py --rows 100k --experiments --out /tmp/video_stats_100k.db
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import db
+
+SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+# Share of the 7-day views reached by each checkpoint
+PERIOD_SHARES = {"24hr": 0.45, "48hr": 0.65, "7d": 1.0}
+
+# Rows inserted per transaction
+CHUNK_ROWS = 50000
+
+# Vocabulary of the synthetic Notion experiment pages
+DESCRIPTORS = [
+    "talking head", "voiceover", "b-roll", "screen recording", "captions", "no captions",
+    "question hook", "statement hook", "cold open", "face in first frame", "text overlay",
+    "trending audio", "original audio", "tutorial", "story", "listicle", "reaction",
+    "outdoor", "studio", "fast cuts", "single take", "call to action", "loop ending",
+]
+TOPICS = [
+    "camera settings", "lighting", "audio", "editing", "thumbnails", "pacing", "retention",
+    "lenses", "color grading", "scripting", "gear", "workflow", "storytelling", "analytics",
+]
+SENTENCES = [
+    "Most people get {t} wrong because they copy what they see online.",
+    "Here's the thing about {t} that nobody tells you.",
+    "I tested {t} for thirty days and the numbers surprised me.",
+    "The fix for {t} takes less than a minute.",
+    "Your viewers notice {t} before they notice anything else.",
+    "Comment below if {t} has been holding you back.",
+]
+
+def parse_size(value: str):
+    """Accepts "1k", "100k", "1m" or a plain row count."""
+    return SIZES.get(value.lower()) or int(value)
+
+def _columns(rng, start, count):
+    ids = np.arange(start, start + count)
+    days_ago = rng.integers(8, 8 + 5 * 365, count)
+    published = (np.datetime64("today") - days_ago.astype("timedelta64[D]")).astype(str)
+    hours = rng.integers(0, 24, count)
+    # Mostly shorts, with some mid-length and long videos
+    bucket = rng.choice(3, count, p=[0.7, 0.2, 0.1])
+    length = np.choose(bucket, [rng.integers(15, 61, count), rng.integers(61, 601, count), rng.integers(601, 3600, count)])
+    views_7d = rng.lognormal(8, 1.5, count)
+    columns = {
+        "video_id": [f"hist{i:07d}" for i in ids],
+        "title": [f"Synthetic video {i}" for i in ids],
+        "publish_date": [f"{day}T{hour:02d}:00:00Z" for day, hour in zip(published, hours)],
+        "duration_seconds": length.tolist(),
+    }
+    like_rate = rng.uniform(0.01, 0.08, count)
+    comment_rate = rng.uniform(0.001, 0.01, count)
+    sub_rate = rng.uniform(0.0005, 0.005, count)
+    ctr = rng.uniform(2, 12, count)
+    duration = rng.uniform(30, 300, count)
+    percentage = rng.uniform(20, 80, count)
+    for period, share in PERIOD_SHARES.items():
+        views = views_7d * share * rng.uniform(0.9, 1.1, count)
+        columns[f"views_{period}"] = views.astype(int).tolist()
+        columns[f"likes_{period}"] = (views * like_rate).astype(int).tolist()
+        columns[f"ctr_{period}"] = np.round(ctr, 2).tolist()
+        columns[f"average_view_duration_{period}"] = np.round(duration * (1.05 - 0.05 * share), 1).tolist()
+        columns[f"average_percentage_viewed_{period}"] = np.round(percentage * (1.05 - 0.05 * share), 1).tolist()
+        columns[f"comments_{period}"] = (views * comment_rate).astype(int).tolist()
+        columns[f"subs_gained_{period}"] = (views * sub_rate).astype(int).tolist()
+    return columns
+
+def generate_video_stats(rows: int, seed: int = 0, snapshots: bool = False):
+    """
+    Fills the video_stats table of db.DB_PATH with `rows` synthetic videos (IDs
+    hist0000000 onwards) and refreshes the baselines. With snapshots=True the checkpoint
+    values are also written to video_metric_snapshots, as store_video_stats would.
+    """
+    db.init_db()
+    rng = np.random.default_rng(seed)
+    conn = db.get_connection()
+    insert = f"INSERT OR REPLACE INTO video_stats ({', '.join(db.VIDEO_STATS_FIELDS)}) VALUES ({', '.join('?' * len(db.VIDEO_STATS_FIELDS))})"
+    snapshot_keys = [(key, key.rsplit("_", 1)[0], db.PERIOD_HOURS[key.rsplit("_", 1)[1]]) for key in db.BASELINE_KEYS]
+
+    for start in range(0, rows, CHUNK_ROWS):
+        columns = _columns(rng, start, min(CHUNK_ROWS, rows - start))
+        with conn:
+            conn.executemany(insert, zip(*(columns[field] for field in db.VIDEO_STATS_FIELDS)))
+            if snapshots:
+                conn.executemany(db._SNAPSHOT_UPSERT, (
+                    (video_id, metric, hours, columns[key][i])
+                    for key, metric, hours in snapshot_keys
+                    for i, video_id in enumerate(columns["video_id"])
+                ))
+    db.refresh_baselines()
+
+def generate_notion_pages(rows: int, seed: int = 0, share: float = 1.0):
+    """
+    Caches a synthetic Notion experiment page (2-5 descriptors, a hypothesis and a short
+    script about one or two topics) for a `share` of the first `rows` synthetic videos.
+    """
+    db.init_db()
+    rng = np.random.default_rng(seed + 1)
+    pages = []
+    for i in np.flatnonzero(rng.random(rows) < share):
+        topics = rng.choice(TOPICS, rng.integers(1, 3), replace=False)
+        descriptors = rng.choice(DESCRIPTORS, rng.integers(2, 6), replace=False).tolist()
+        script = " ".join(str(rng.choice(SENTENCES)).format(t=rng.choice(topics)) for _ in range(rng.integers(4, 12)))
+        pages.append((f"page{i:07d}", "2024-01-01T00:00:00.000Z", {
+            "title": f"Synthetic video {i}",
+            "descriptors": descriptors,
+            "hypothesis": f"Using {descriptors[0]} improves retention for {topics[0]} videos.",
+            "video_id": f"hist{i:07d}",
+            "script": script,
+        }))
+        if len(pages) == CHUNK_ROWS:
+            db.store_cached_notion_pages(pages, "synthetic")
+            pages = []
+    db.store_cached_notion_pages(pages, "synthetic")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_size, default="1k", help="1k, 100k, 1m or a row count")
+    parser.add_argument("--out", type=str, required=True, help="Database file to create")
+    parser.add_argument("--snapshots", action="store_true", help="Also write checkpoint snapshots")
+    parser.add_argument("--experiments", action="store_true", help="Also cache a Notion experiment page per video")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.out):
+        parser.error(f"{args.out} already exists")
+    db.DB_PATH = args.out
+    started = time.perf_counter()
+    generate_video_stats(args.rows, args.seed, args.snapshots)
+    if args.experiments:
+        generate_notion_pages(args.rows, args.seed)
+    db.close_connection()
+    print(f"{args.rows} videos written to {args.out} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
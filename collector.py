@@ -0,0 +1,242 @@
+from src.yt import get_videos_metadata, get_videos_statistics, get_stats_for_videos, get_channel_video_ids, get_client_stats
+from src.db import (
+  PERIOD_HOURS, store_video_stats_bulk, store_snapshots, get_stored_periods, get_known_video_ids, enqueue_checkpoints,
+  get_due_checkpoints, next_checkpoint_due, complete_checkpoints, reschedule_checkpoints, retry_checkpoints, add_api_usage, get_api_usage,
+)
+from src.telemetry import configure_from_env, traced
+from src.stats import PERIODS, period_stats, read_video_ids_file
+from datetime import date, datetime, time as dtime, timedelta
+import argparse
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Hours YouTube Analytics takes to report a day's figures in full
+ANALYTICS_LAG_HOURS = 48
+
+# Checkpoints with no Analytics row yet are retried this often, up to MAX_ATTEMPTS times
+RETRY_SECONDS = 6 * 3600
+MAX_ATTEMPTS = 8
+
+# Longest sleep between queue checks, so newly queued videos are noticed
+MAX_SLEEP_SECONDS = 3600
+
+# Wait after a failed cycle (e.g. an API outage) before trying again
+ERROR_BACKOFF_SECONDS = 300
+
+# Due checkpoints collected per cycle
+BATCH_SIZE = 1000
+
+# Queue entry (in place of a period) for a video's recurring snapshots: its lifetime counts
+# are sampled every SNAPSHOT_INTERVAL seconds until it is SNAPSHOT_HOURS hours old
+HOURLY_SNAPSHOTS = "hourly"
+SNAPSHOT_INTERVAL = 3600
+SNAPSHOT_HOURS = PERIOD_HOURS["7d"]
+
+# Default daily budgets: the Data API's default quota and a margin under the Analytics limit
+DAILY_DATA_API_UNITS = 10000
+DAILY_ANALYTICS_QUERIES = 5000
+
+def checkpoint_due_at(published_at: str, period: str, settle_hours: float = ANALYTICS_LAG_HOURS):
+  """
+  Returns the Unix time a period's stats are complete: local midnight after the last
+  day of its Analytics window (see yt._period_window), plus settle_hours for YouTube
+  to finish reporting that day. Stats fetched earlier would be partial, and a stored
+  checkpoint is never fetched again.
+  """
+  end_date = (datetime.fromisoformat(published_at) + timedelta(hours=PERIOD_HOURS[period])).date()
+  return datetime.combine(end_date + timedelta(days=1), dtime.min).timestamp() + settle_hours * 3600
+
+def hours_old(published_at: str, now: float):
+  return (now - datetime.fromisoformat(published_at).timestamp()) / 3600
+
+def schedule_videos(published_dates: dict, settle_hours: float = ANALYTICS_LAG_HOURS, now: float = None):
+  """
+  Queues every checkpoint not yet stored for {video_id: publishedAt}, plus hourly
+  snapshots (due now) for videos in their first week.
+  Returns the number of checkpoints queued.
+  """
+  now = now or time.time()
+  stored = get_stored_periods(list(published_dates))
+  checkpoints = [
+    (video_id, period, published_at, checkpoint_due_at(published_at, period, settle_hours))
+    for video_id, published_at in published_dates.items() if published_at
+    for period in PERIODS if period not in stored.get(video_id, ())
+  ]
+  checkpoints += [
+    (video_id, HOURLY_SNAPSHOTS, published_at, now)
+    for video_id, published_at in published_dates.items()
+    if published_at and hours_old(published_at, now) < SNAPSHOT_HOURS
+  ]
+  enqueue_checkpoints(checkpoints)
+  return len(checkpoints)
+
+@traced("collector.discover_videos")
+def discover_videos(video_ids: list[str], settle_hours: float = ANALYTICS_LAG_HOURS):
+  """
+  Looks up and schedules the videos with periods neither stored nor queued (including
+  videos stored with only some periods). Returns the number of videos scheduled.
+  """
+  known = get_known_video_ids(video_ids)
+  new_ids = [video_id for video_id in video_ids if video_id not in known]
+  if not new_ids:
+    return 0
+  metadata = get_videos_metadata(new_ids)
+  schedule_videos({vid: meta.get("publishedAt") for vid, meta in metadata.items()}, settle_hours)
+  return len(metadata)
+
+@traced("collector.collect_due")
+def collect_due(now: float = None, batch_size: int = BATCH_SIZE):
+  """
+  Fetches and stores every checkpoint due by now (up to batch_size), one batched
+  Analytics report per period and window. Checkpoints stored meanwhile (e.g. by pull.py)
+  are dropped without a fetch, and those with no data yet are retried later. Due hourly
+  snapshots are sampled together (see collect_snapshots).
+  Returns (collected, retried).
+  """
+  now = now or time.time()
+  due = get_due_checkpoints(now, batch_size)
+  if not due:
+    return 0, 0
+
+  stored = get_stored_periods([video_id for video_id, *_ in due])
+  by_period = {}
+  done = []
+  snapshots = {}
+  for video_id, period, published_at, attempts in due:
+    if period == HOURLY_SNAPSHOTS:
+      snapshots[video_id] = published_at
+    elif period in stored.get(video_id, ()):
+      done.append((video_id, period))
+    else:
+      by_period.setdefault(period, {})[video_id] = (published_at, attempts)
+
+  records, retry = [], []
+  for period, videos in by_period.items():
+    published_dates = {vid: published_at for vid, (published_at, _) in videos.items()}
+    stats = get_stats_for_videos(list(videos), period, published_dates)
+    for video_id, (published_at, attempts) in videos.items():
+      if video_id in stats:
+        records.append((video_id, published_at, period, period_stats(stats[video_id], period)))
+        done.append((video_id, period))
+      else:
+        retry.append((now + RETRY_SECONDS if attempts + 1 < MAX_ATTEMPTS else None, video_id, period))
+
+  sampled = 0
+  if snapshots:
+    finished = collect_snapshots(snapshots, now)
+    done += finished
+    sampled = len(snapshots) - len(finished)
+
+  if records:
+    store_video_stats_bulk(records)
+  complete_checkpoints(done)
+  retry_checkpoints(retry)
+  return len(done) + sampled, len(retry)
+
+def collect_snapshots(published_dates: dict, now: float):
+  """
+  Stores the current lifetime counts of {video_id: publishedAt} as snapshots at their
+  age in hours (one Data API call per 50 videos) and schedules the next sample.
+  Returns the (video_id, HOURLY_SNAPSHOTS) entries that are finished: videos past
+  SNAPSHOT_HOURS and videos that no longer exist.
+  """
+  statistics = get_videos_statistics(list(published_dates))
+  rows, reschedule, done = [], [], []
+  for video_id, published_at in published_dates.items():
+    hours = hours_old(published_at, now)
+    counts = statistics.get(video_id)
+    if counts is not None:
+      rows += [(video_id, metric, round(hours, 2), value) for metric, value in counts.items() if value is not None]
+    if counts is None or hours + SNAPSHOT_INTERVAL / 3600 > SNAPSHOT_HOURS:
+      done.append((video_id, HOURLY_SNAPSHOTS))
+    else:
+      reschedule.append((now + SNAPSHOT_INTERVAL, video_id, HOURLY_SNAPSHOTS))
+  store_snapshots(rows)
+  reschedule_checkpoints(reschedule)
+  return done
+
+def _usage_counters():
+  stats = get_client_stats()
+  return {"data_api": stats["data_api_units"], "analytics": stats["analytics_queries"]}
+
+def _record_usage(day: str, before: dict):
+  """Persists the API usage since `before` and returns the current counters."""
+  after = _usage_counters()
+  for api, units in after.items():
+    add_api_usage(day, api, units - before[api])
+  return after
+
+def run_collector(video_ids: list[str] = None, channel: bool = False, settle_hours: float = ANALYTICS_LAG_HOURS, discover_interval: float = 3600,
+                  daily_data_api_units: int = DAILY_DATA_API_UNITS, daily_analytics_queries: int = DAILY_ANALYTICS_QUERIES, once: bool = False):
+  """
+  Keeps stored stats current by collecting each video's checkpoints as they come due.
+  The queue lives in the database, so a restarted collector resumes where it stopped.
+  Sleeps until the next checkpoint is due, and until the next day once a daily quota
+  budget is spent. With once=True, returns after collecting whatever is due now.
+  """
+  counters = _usage_counters()
+  if video_ids:
+    logger.info("Discovered %d new videos", discover_videos(video_ids, settle_hours))
+    counters = _record_usage(date.today().isoformat(), counters)
+  next_discovery = 0.0
+
+  while True:
+    now = time.time()
+    today = date.today().isoformat()
+
+    used = get_api_usage(today)
+    if used.get("data_api", 0) >= daily_data_api_units or used.get("analytics", 0) >= daily_analytics_queries:
+      if once:
+        logger.info("Daily quota budget spent: %s", used)
+        return
+      tomorrow = datetime.combine(date.today() + timedelta(days=1), dtime.min).timestamp()
+      logger.info("Daily quota budget spent (%s); sleeping until tomorrow", used)
+      time.sleep(max(1.0, tomorrow - now))
+      continue
+
+    try:
+      if channel and now >= next_discovery:
+        logger.info("Discovered %d new videos on the channel", discover_videos(get_channel_video_ids(), settle_hours))
+        next_discovery = now + discover_interval
+      collected, retried = collect_due(now)
+    except Exception as e:
+      if once:
+        raise
+      logger.exception("Collection failed, retrying in %ss", ERROR_BACKOFF_SECONDS)
+      time.sleep(ERROR_BACKOFF_SECONDS)
+      continue
+    finally:
+      counters = _record_usage(today, counters)
+
+    if collected or retried:
+      logger.info("Collected %d checkpoints, %d not available yet; usage today: %s", collected, retried, get_api_usage(today))
+      continue
+
+    if once:
+      return
+
+    wake = min(next_checkpoint_due() or float("inf"), next_discovery if channel else float("inf"))
+    time.sleep(min(MAX_SLEEP_SECONDS, max(1.0, wake - time.time())))
+
+def main():
+  parser = argparse.ArgumentParser(description="Collect YouTube video stats as each checkpoint comes due.")
+  parser.add_argument("--video-ids-file", type=str, help="File with one YouTube video ID per line to start tracking")
+  parser.add_argument("--channel", action="store_true", help="Track every video on the authenticated channel, checking for new uploads periodically")
+  parser.add_argument("--discover-interval", type=float, default=3600, help="Seconds between checks for new uploads")
+  parser.add_argument("--settle-hours", type=float, default=ANALYTICS_LAG_HOURS, help="Hours to wait after a checkpoint's last day for YouTube Analytics to report it in full")
+  parser.add_argument("--daily-data-api-units", type=int, default=DAILY_DATA_API_UNITS, help="YouTube Data API quota units to spend per day")
+  parser.add_argument("--daily-analytics-queries", type=int, default=DAILY_ANALYTICS_QUERIES, help="YouTube Analytics queries to spend per day")
+  parser.add_argument("--once", action="store_true", help="Collect what is due now and exit")
+  args = parser.parse_args()
+  configure_from_env()
+
+  video_ids = read_video_ids_file(args.video_ids_file) if args.video_ids_file else None
+  try:
+    run_collector(video_ids, args.channel, args.settle_hours, args.discover_interval, args.daily_data_api_units, args.daily_analytics_queries, args.once)
+  except KeyboardInterrupt:
+    logger.info("Collector stopped; queued checkpoints resume on the next run.")
+
+if __name__ == "__main__":
+  main()
@@ -1,83 +1,269 @@
-from src.yt import get_all_video_stats, get_video_metadata
-from src.notion import notion_get_video_properties, notion_send_report, notion_update_hypothesis_result
-from src.db import store_video_stats, get_video_stats, get_video_baseline
+from src.yt import get_all_video_stats, get_video_metadata, parse_duration
+from src.notion import notion_get_video_properties, notion_send_report, notion_update_hypothesis_result, notion_append_blocks, convert_json_to_notion_blocks, get_notion_client
+from src.db import store_video_stats, store_video_metadata, get_video_stats, get_video_baseline, get_cohort_baseline
 from src.comparison import compare_to_baseline
-from src.openai import run_evaluation_agent, run_report_agent, run_text_to_json_agent
+from src.baseline import get_baseline, get_baseline_history, cohort_filters, MIN_COHORT_VIDEOS
+from src.openai import run_evaluation_agent, run_report_agent, run_text_to_json_agent, build_report_blocks, stream_report_agent, ReportBlockStreamer, NotionBlocks, track_llm_usage
+from src.similarity import find_similar_videos, cohort_history, experiment_text
+from src.prompts import HISTORY_TOP_K
+from src.pipeline import run_stages, format_timings, PIPELINE_MODES
+from src.limits import limiter_for
+from src.llm_cache import get_llm_cache
+from src.telemetry import span
 import asyncio
+import logging
+import time
 
-async def main(notion_id: str, period: str):
-  
-  # get the video (manual for now)
+logger = logging.getLogger(__name__)
 
-  properties = notion_get_video_properties(notion_id)
+# Most blocks appended to Notion in one request while streaming a report
+STREAM_MAX_BATCH = 10
 
-  print('properties:', properties)
+async def main(notion_id: str, period: str, limits: dict = None, baseline_type: str = "mean", use_cache: bool = True, pipeline_mode: str = "full", on_progress=None, properties_max_age: float = 0,
+               cohort: list = None, lookback_days: int = None):
 
-  video_id = properties.get("video_id")
+  # The Notion, YouTube and SQLite calls are blocking, so they run in worker threads
+  # and independent stages overlap instead of blocking the event loop.
+  # `limits` optionally maps "notion", "youtube" and "openai" to a ServiceLimiter
+  # shared between concurrent analyses (see batch.py).
+  # `baseline_type` picks the statistic the baseline is built from (see src.baseline.BASELINE_TYPES).
+  # `use_cache=False` skips the LLM response cache and always calls the models.
+  # `pipeline_mode="fast"` builds the Notion report directly from the evaluation instead of
+  # running the report writer and text-to-JSON agents. `pipeline_mode="stream"` streams the
+  # report writer's output and appends each heading/paragraph to the page as it completes.
+  # `on_progress(event, data)` is called with "report_blocks" ({"blocks": [...]}) as report
+  # content reaches Notion and "first_content" ({"seconds": ...}) for the first of them,
+  # plus "stages" ({"names": [...]}) once the pipeline is planned and "stage"
+  # ({"name", "status", "seconds"}) as each stage starts, finishes or fails.
+  # `properties_max_age` lets a cached copy of the page's properties validated within that
+  # many seconds be used instead of fetching the page (see notion_sync_database).
+  # `cohort` compares the video against past videos like it instead of the latest five:
+  # any of "descriptors", "duration", "weekday" and "hour" (see src.baseline.cohort_filters),
+  # optionally limited to videos published in the last `lookback_days` days.
 
-  print('video_id:', video_id)
+  if pipeline_mode not in PIPELINE_MODES:
+    raise ValueError(f"Invalid pipeline mode. Must be one of: {', '.join(PIPELINE_MODES)}.")
+  if (cohort or lookback_days) and baseline_type != "mean":
+    raise ValueError("Cohort baselines are only available for the mean baseline type.")
 
-  video_metadata = get_video_metadata(video_id)
+  notion = limiter_for(limits, "notion")
+  youtube = limiter_for(limits, "youtube")
+  openai = limiter_for(limits, "openai")
 
-  print("Video Metadata:")
-  for key, value in video_metadata.items():
-    print(f"  {key}: {value}")
+  llm_usage = track_llm_usage()
 
-  video_stats = get_all_video_stats(video_id)
+  started = time.perf_counter()
+  first_content = None
 
-  print("\nVideo Stats:")
-  for key, value in video_stats.items():
-    print(f"  {key}: {value}")
+  def progress(event, **data):
+    if on_progress:
+      on_progress(event, data)
 
-  # Save metrics in database
+  def content_visible(blocks):
+    nonlocal first_content
+    if first_content is None:
+      first_content = time.perf_counter() - started
+      progress("first_content", seconds=first_content)
+    progress("report_blocks", blocks=[block.model_dump() for block in blocks])
 
-  store_video_stats(video_id, video_metadata.get("publishedAt"), period, {
-    f"views_{period}": video_stats.get("views"),
-    f"likes_{period}": video_stats.get("likes"),
-    f"comments_{period}": video_stats.get("comments"),
-    f"average_view_duration_{period}": video_stats.get("averageViewDuration"),
-    f"average_percentage_viewed_{period}": video_stats.get("averageViewPercentage"),
-    f"subs_gained_{period}": video_stats.get("subscribersGained"),
-  })
+  async def get_properties():
+    async with notion:
+      properties = await asyncio.to_thread(notion_get_video_properties, notion_id, properties_max_age)
 
-  video_stats_db = get_video_stats(video_id)
+    logger.debug("Properties: %s", properties)
 
-  print("\nVideo Stats from DB:")
-  for key, value in video_stats_db.items():
-    print(f"  {key}: {value}")
+    return properties
 
-  baseline_metrics = get_video_baseline(5)
+  async def get_metadata(properties):
+    async with youtube:
+      video_metadata = await asyncio.to_thread(get_video_metadata, properties.get("video_id"))
 
-  print("\nBaseline Metrics:")
-  for key, value in baseline_metrics.items():
-    print(f"  {key}: {value}")
+    logger.debug("Video metadata: %s", video_metadata)
 
-  baseline_comparison = compare_to_baseline(video_stats_db, baseline_metrics)
+    return video_metadata
 
-  print("\nBaseline Comparison:")
-  for key, value in baseline_comparison.items():
-    print(f"  {key}: {value}")
+  async def get_stats(properties):
+    async with youtube:
+      video_stats = await asyncio.to_thread(get_all_video_stats, properties.get("video_id"))
 
-  print('Descriptors:')
-  for descriptor in properties.get('descriptors', []):
-    print(f"  - {descriptor}")
+    logger.debug("Video stats: %s", video_stats)
 
-  eval_agent_res = await run_evaluation_agent(period, video_stats_db, baseline_metrics, properties.get('descriptors'), properties.get('hypothesis'), properties.get('script', ''))
+    return video_stats
 
-  eval_res = eval_agent_res.evaluation
+  async def store_stats(properties, metadata, stats):
+    video_id = properties.get("video_id")
 
-  hypothesis_result = eval_agent_res.hypothesis_result
+    # Save metrics in database
 
-  report_res = await run_report_agent(eval_res)
+    await asyncio.to_thread(store_video_metadata, [(video_id, metadata.get("title"), metadata.get("publishedAt"), parse_duration(metadata.get("duration")))])
+    await asyncio.to_thread(store_video_stats, video_id, metadata.get("publishedAt"), period, {
+      f"views_{period}": stats.get("views"),
+      f"likes_{period}": stats.get("likes"),
+      f"comments_{period}": stats.get("comments"),
+      f"average_view_duration_{period}": stats.get("averageViewDuration"),
+      f"average_percentage_viewed_{period}": stats.get("averageViewPercentage"),
+      f"subs_gained_{period}": stats.get("subscribersGained"),
+    })
 
-  # Text to json writer
+    video_stats_db = await asyncio.to_thread(get_video_stats, video_id)
 
-  json_res = await run_text_to_json_agent(report_res)
+    logger.debug("Video stats from DB: %s", video_stats_db)
 
-  # Send the report to notion
+    return video_stats_db
 
-  notion_send_report(notion_id, json_res) 
+  async def load_baseline(properties, metadata, store):
+    if cohort or lookback_days:
+      filters = cohort_filters(cohort or (), properties.get("descriptors"), metadata.get("publishedAt"), parse_duration(metadata.get("duration")), lookback_days)
+      baseline = await asyncio.to_thread(get_cohort_baseline, **filters)
+      if baseline.videos >= MIN_COHORT_VIDEOS:
+        logger.debug("Cohort baseline metrics (%d videos, %s): %s", baseline.videos, filters, baseline.metrics)
+        return baseline.metrics
+      logger.info("Only %d videos match cohort %s, using the regular baseline", baseline.videos, filters)
 
-  # Update the Notion page with the hypothesis result
+    # The video was just stored; it must not be part of its own baseline
+    if baseline_type == "mean":
+      baseline_metrics = await asyncio.to_thread(get_video_baseline, 5, properties.get("video_id"))
+    else:
+      baseline_metrics = await asyncio.to_thread(get_baseline, 5, baseline_type, properties.get("video_id"))
 
-  notion_update_hypothesis_result(notion_id, hypothesis_result)
\ No newline at end of file
+    logger.debug("Baseline metrics (%s): %s", baseline_type, baseline_metrics)
+
+    return baseline_metrics
+
+  async def load_history(properties, store):
+    # Past videos only, so the video is not ranked against itself
+    return await asyncio.to_thread(get_baseline_history, 5, properties.get("video_id"))
+
+  async def compare(store, baseline, history, similar):
+    baseline_comparison = compare_to_baseline(store, baseline, checkpoint=period, history=history, cohort=cohort_history(similar, period))
+
+    logger.debug("Baseline comparison: %s", baseline_comparison)
+
+    return baseline_comparison
+
+  async def similar_videos(properties, store):
+    # Past videos most like this one (descriptors, hypothesis, script), shown to the
+    # evaluation agent and compared against as a cohort
+    similar = await asyncio.to_thread(find_similar_videos, properties.get("descriptors"), experiment_text(properties), period, HISTORY_TOP_K, properties.get("video_id"))
+
+    logger.debug("Similar videos: %s", [(video.video_id, video.score) for video in similar])
+
+    return similar
+
+  async def evaluate(properties, store, baseline, similar):
+    logger.debug("Descriptors: %s", properties.get('descriptors', []))
+
+    async with openai:
+      return await run_evaluation_agent(period, store, baseline, properties.get('descriptors'), properties.get('hypothesis'), properties.get('script', ''), use_cache=use_cache,
+                                        history=similar, video_id=properties.get("video_id"))
+
+  async def write_report(evaluation):
+    async with openai:
+      return await run_report_agent(evaluation.evaluation, use_cache=use_cache)
+
+  async def format_report(report):
+    # Text to json writer
+    async with openai:
+      return await run_text_to_json_agent(report, use_cache=use_cache)
+
+  async def build_blocks(evaluation):
+    blocks = build_report_blocks(evaluation)
+
+    logger.debug("Report blocks: %s", blocks)
+
+    return blocks
+
+  async def send_report(blocks):
+    # Send the report to notion
+    async with notion:
+      sent = await asyncio.to_thread(notion_send_report, notion_id, blocks)
+    if sent:
+      content_visible(blocks.blocks)
+    return sent
+
+  async def stream_report(evaluation):
+    # Blocks are queued as the report streams in; the writer appends whatever has queued up
+    # while its previous request was in flight, so batches grow only when Notion is slower.
+    queue = asyncio.Queue()
+
+    async def append_blocks():
+      while True:
+        batch = [await queue.get()]
+        while not queue.empty() and len(batch) < STREAM_MAX_BATCH:
+          batch.append(queue.get_nowait())
+        done = batch[-1] is None
+        batch = [block for block in batch if block is not None]
+        if batch:
+          async with notion:
+            appended = await asyncio.to_thread(notion_append_blocks, notion_id, convert_json_to_notion_blocks(NotionBlocks(blocks=batch)))
+          if not appended:
+            raise RuntimeError("Failed to append report blocks to Notion.")
+          content_visible(batch)
+        if done:
+          return
+
+    writer = asyncio.ensure_future(append_blocks())
+    streamer = ReportBlockStreamer()
+    try:
+      async with openai:
+        async for delta in stream_report_agent(evaluation.evaluation, use_cache=use_cache):
+          for block in streamer.feed(delta):
+            queue.put_nowait(block)
+          if writer.done():
+            break
+      for block in streamer.flush():
+        queue.put_nowait(block)
+      queue.put_nowait(None)
+      await writer
+    finally:
+      writer.cancel()
+
+    logger.info("Report streamed to Notion successfully.")
+    return True
+
+  async def update_hypothesis(evaluation):
+    # Update the Notion page with the hypothesis result
+    async with notion:
+      return await asyncio.to_thread(notion_update_hypothesis_result, notion_id, evaluation.hypothesis_result)
+
+  stages = {
+    "properties": ([], get_properties),
+    "metadata": (["properties"], get_metadata),
+    "stats": (["properties"], get_stats),
+    "store": (["properties", "metadata", "stats"], store_stats),
+    "baseline": (["properties", "metadata", "store"], load_baseline),
+    "history": (["properties", "store"], load_history),
+    "similar": (["properties", "store"], similar_videos),
+    "comparison": (["store", "baseline", "history", "similar"], compare),
+    "evaluation": (["properties", "store", "baseline", "similar"], evaluate),
+    "report": (["evaluation"], write_report),
+    "blocks": (["report"], format_report),
+    "send_report": (["blocks"], send_report),
+    "update_hypothesis": (["evaluation"], update_hypothesis),
+  }
+
+  if pipeline_mode == "fast":
+    del stages["report"]
+    stages["blocks"] = (["evaluation"], build_blocks)
+  elif pipeline_mode == "stream":
+    del stages["report"], stages["blocks"]
+    stages["send_report"] = (["evaluation"], stream_report)
+
+  progress("stages", names=list(stages))
+  with span("analysis", notion_id=notion_id, period=period, pipeline_mode=pipeline_mode, baseline_type=baseline_type):
+    results, timings = await run_stages(stages, on_stage=lambda name, status, seconds: progress("stage", name=name, status=status, seconds=seconds))
+
+  logger.info("Stage timings:\n%s", format_timings(timings))
+  logger.info("LLM cache: %s", get_llm_cache().stats())
+  logger.info("Notion API: %s", get_notion_client().metrics())
+  if first_content is not None:
+    logger.info("Time to first visible report content: %.2fs", first_content)
+
+  return {
+    "hypothesis_result": results["evaluation"].hypothesis_result,
+    "report_sent": results["send_report"],
+    "hypothesis_updated": results["update_hypothesis"],
+    "timings": timings,
+    "time_to_first_content": first_content,
+    "llm_usage": llm_usage,
+  }
\ No newline at end of file
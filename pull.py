@@ -1,8 +1,19 @@
-from src.yt import get_all_video_stats, get_video_metadata
+from src.yt import get_all_video_stats, get_video_metadata, get_videos_metadata, get_stats_for_videos, get_channel_video_ids, get_client_stats, parse_duration
 import argparse
+import logging
+import time
 
-from src.db import store_video_stats
+from src.db import store_video_stats, store_video_stats_bulk, store_video_metadata
+from src.stats import PERIODS, period_stats, read_video_ids_file
+from src.telemetry import configure_from_env, traced
 
+logger = logging.getLogger(__name__)
+
+def metadata_records(metadata: dict):
+  """(video_id, title, publish_date, duration_seconds) records of {video_id: metadata} for store_video_metadata."""
+  return [(video_id, meta.get("title"), meta.get("publishedAt"), parse_duration(meta.get("duration"))) for video_id, meta in metadata.items()]
+
+@traced("pull.refresh_video_stats")
 def refresh_video_stats(video_id: str):
 
   video_metadata = get_video_metadata(video_id)
@@ -13,41 +24,90 @@ def refresh_video_stats(video_id: str):
 
 
   # Save metrics in database
-  store_video_stats(video_id, video_metadata.get("publishedAt"), "24hr", {
-    f"views_24hr": twenty_four_hour_stats.get("views"),
-    f"likes_24hr": twenty_four_hour_stats.get("likes"),
-    f"comments_24hr": twenty_four_hour_stats.get("comments"),
-    f"average_view_duration_24hr": twenty_four_hour_stats.get("averageViewDuration"),
-    f"average_percentage_viewed_24hr": twenty_four_hour_stats.get("averageViewPercentage"),
-    f"subs_gained_24hr": twenty_four_hour_stats.get("subscribersGained"),
-  })
-
-  store_video_stats(video_id, video_metadata.get("publishedAt"), "48hr", {
-    f"views_48hr": forty_eight_hour_stats.get("views"),
-    f"likes_48hr": forty_eight_hour_stats.get("likes"),
-    f"comments_48hr": forty_eight_hour_stats.get("comments"),
-    f"average_view_duration_48hr": forty_eight_hour_stats.get("averageViewDuration"),
-    f"average_percentage_viewed_48hr": forty_eight_hour_stats.get("averageViewPercentage"),
-    f"subs_gained_48hr": forty_eight_hour_stats.get("subscribersGained"),
-  })
-
-  store_video_stats(video_id, video_metadata.get("publishedAt"), "7d", {
-    f"views_7d": seven_day_stats.get("views"),
-    f"likes_7d": seven_day_stats.get("likes"),
-    f"comments_7d": seven_day_stats.get("comments"),
-    f"average_view_duration_7d": seven_day_stats.get("averageViewDuration"),
-    f"average_percentage_viewed_7d": seven_day_stats.get("averageViewPercentage"),
-    f"subs_gained_7d": seven_day_stats.get("subscribersGained"),
-  })
-
-  print("Stats refreshed: ")
+  store_video_metadata(metadata_records({video_id: video_metadata}))
+  store_video_stats(video_id, video_metadata.get("publishedAt"), "24hr", period_stats(twenty_four_hour_stats, "24hr"))
+  store_video_stats(video_id, video_metadata.get("publishedAt"), "48hr", period_stats(forty_eight_hour_stats, "48hr"))
+  store_video_stats(video_id, video_metadata.get("publishedAt"), "7d", period_stats(seven_day_stats, "7d"))
+
+  logger.info("Stats refreshed for %s", video_id)
+
+@traced("pull.refresh_video_stats_daily")
+def refresh_video_stats_daily(video_ids: list[str]):
+  """
+  Refreshes every period from each video's daily Analytics rows: one report per video
+  fetching only the days not stored yet, with the periods summed locally.
+  """
+  # Imported here so the default modes do not load NumPy
+  from src.daily import PERIOD_DAYS, get_daily_window_stats
+
+  started = time.perf_counter()
+
+  metadata = get_videos_metadata(video_ids)
+
+  records = []
+  for video_id, meta in metadata.items():
+    published_date = meta.get("publishedAt")
+    if not published_date:
+      continue
+    for period, stats in get_daily_window_stats(video_id, published_date, PERIOD_DAYS).items():
+      records.append((video_id, published_date, period, period_stats(stats, period)))
+
+  # Save metrics in database, with the title and length of the videos that have stats
+  store_video_metadata(metadata_records({record[0]: metadata[record[0]] for record in records}))
+  written = store_video_stats_bulk(records)
+
+  logger.info("Stats refreshed from daily rows for %d of %d videos (%d period rows) in %.1fs", len(metadata), len(video_ids), written, time.perf_counter() - started)
+  logger.info("YouTube API calls: %s", get_client_stats())
+
+@traced("pull.refresh_many_video_stats")
+def refresh_many_video_stats(video_ids: list[str]):
+
+  started = time.perf_counter()
+
+  # Look up publish dates 50 videos at a time
+  metadata = get_videos_metadata(video_ids)
+  published_dates = {vid: meta.get("publishedAt") for vid, meta in metadata.items()}
+
+  records = []
+  for period in PERIODS:
+    stats = get_stats_for_videos(list(published_dates), period, published_dates)
+    for video_id, video_stats in stats.items():
+      records.append((video_id, published_dates[video_id], period, period_stats(video_stats, period)))
+
+  # Save metrics in database, with the title and length of the videos that have stats
+  store_video_metadata(metadata_records({record[0]: metadata[record[0]] for record in records}))
+  written = store_video_stats_bulk(records)
+
+  elapsed = time.perf_counter() - started
+  rate = len(metadata) / elapsed if elapsed > 0 else 0.0
+
+  logger.info("Stats refreshed for %d of %d videos (%d period rows) in %.1fs, %.1f videos/sec", len(metadata), len(video_ids), written, elapsed, rate)
+  logger.info("YouTube API calls: %s", get_client_stats())
 
 def main():
   parser = argparse.ArgumentParser(description="Refresh YouTube video stats.")
-  parser.add_argument("--video-id", type=str, required=True, help="YouTube video ID")
+  source = parser.add_mutually_exclusive_group(required=True)
+  source.add_argument("--video-id", type=str, help="YouTube video ID")
+  source.add_argument("--video-ids-file", type=str, help="File with one YouTube video ID per line")
+  source.add_argument("--channel", action="store_true", help="Backfill every video on the authenticated channel")
+  parser.add_argument("--daily", action="store_true", help="Fetch daily rows (only days not stored yet) and compute every period from them")
   args = parser.parse_args()
+  configure_from_env()
 
-  refresh_video_stats(args.video_id)
+  if args.daily:
+    if args.video_id:
+      video_ids = [args.video_id]
+    elif args.video_ids_file:
+      video_ids = read_video_ids_file(args.video_ids_file)
+    else:
+      video_ids = get_channel_video_ids()
+    refresh_video_stats_daily(video_ids)
+  elif args.video_id:
+    refresh_video_stats(args.video_id)
+  elif args.video_ids_file:
+    refresh_many_video_stats(read_video_ids_file(args.video_ids_file))
+  else:
+    refresh_many_video_stats(get_channel_video_ids())
 
 if __name__ == "__main__":
   main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+from datetime import datetime
+import warnings
+import numpy as np
+
+from src.db import BASELINE_KEYS, BASELINE_TYPES, duration_bucket, get_connection
+from src.telemetry import traced
+
+# Fraction cut from each end of a column for the trimmed mean; columns of three or more
+# values always lose at least their highest and lowest, so a last-5 window is robust too
+TRIM_FRACTION = 0.1
+
+# What a cohort baseline can match the current video on (see cohort_filters)
+COHORT_FILTERS = ("descriptors", "duration", "weekday", "hour")
+
+# Hours either side of the current video's publish hour that count as the same time slot
+COHORT_HOUR_WINDOW = 2
+
+# Cohorts with fewer videos than this fall back to the regular baseline
+MIN_COHORT_VIDEOS = 3
+
+@traced("sqlite.load_baseline_matrix")
+def load_baseline_matrix(n=5, exclude_video_id=None):
+  """
+  Returns the stats of the past n videos as an (n, len(BASELINE_KEYS)) float array,
+  one column per metric x period, with NaN for missing values. exclude_video_id (the
+  video being analyzed) is left out, so it is not part of its own baseline.
+  """
+  rows = get_connection().execute(f"""
+    SELECT {', '.join(BASELINE_KEYS)}
+    FROM video_stats
+    WHERE video_id IS NOT ?
+    ORDER BY publish_date DESC
+    LIMIT ?
+  """, (exclude_video_id, n)).fetchall()
+  if not rows:
+    return np.full((0, len(BASELINE_KEYS)), np.nan)
+  return np.array(rows, dtype=float)
+
+def summarize_matrix(matrix, trim=TRIM_FRACTION):
+  """
+  Computes robust statistics for every column of a baseline matrix at once.
+  Returns {stat: array with one value per column}; columns with no data are NaN.
+  """
+  present = ~np.isnan(matrix)
+  counts = present.sum(axis=0)
+
+  with warnings.catch_warnings():
+    # All-NaN columns (no data for a period yet) are expected and come out as NaN
+    warnings.simplefilter("ignore", RuntimeWarning)
+    mean = np.nanmean(matrix, axis=0)
+    std = np.nanstd(matrix, axis=0)
+    p10, p50, p90 = np.nanpercentile(matrix, [10, 50, 90], axis=0)
+    mad = np.nanmedian(np.abs(matrix - p50), axis=0)
+
+    # Trimmed mean: NaNs sort last, so keep ranks [cut, count - cut) of each column
+    ordered = np.sort(matrix, axis=0)
+    cut = np.where(counts >= 3, np.maximum(1, np.round(counts * trim)), 0)
+    ranks = np.arange(matrix.shape[0])[:, None]
+    keep = (ranks >= cut) & (ranks < counts - cut)
+    trimmed_mean = np.where(keep, ordered, 0.0).sum(axis=0) / keep.sum(axis=0)
+
+  return {
+    "count": counts,
+    "mean": mean,
+    "median": p50,
+    "trimmed_mean": trimmed_mean,
+    "std": std,
+    "mad": mad,
+    "p10": p10,
+    "p50": p50,
+    "p90": p90,
+  }
+
+def get_baseline(n=5, baseline_type="mean", exclude_video_id=None):
+  """
+  Returns baseline metrics for the past n videos (other than exclude_video_id) using the
+  given statistic, in the same {metric_period: value} shape as db.get_video_baseline.
+  """
+  if baseline_type not in BASELINE_TYPES:
+    raise ValueError(f"Invalid baseline type. Must be one of: {', '.join(BASELINE_TYPES)}.")
+  values = summarize_matrix(load_baseline_matrix(n, exclude_video_id))[baseline_type]
+  return {key: 0 if np.isnan(value) else float(value) for key, value in zip(BASELINE_KEYS, values)}
+
+def cohort_filters(filters, descriptors=None, published_at=None, duration_seconds=None, lookback_days=None, n=5):
+  """
+  Returns the db.get_cohort_baseline arguments selecting videos like the current one on
+  each of filters (COHORT_FILTERS): sharing a Notion descriptor, in the same length
+  bucket, published on the same weekday or within COHORT_HOUR_WINDOW hours of the same
+  time (UTC). Filters the video has no value for are left out. With lookback_days, every
+  matching video in that window is used instead of the n most recent.
+  """
+  unknown = set(filters) - set(COHORT_FILTERS)
+  if unknown:
+    raise ValueError(f"Invalid cohort filter. Must be one of: {', '.join(COHORT_FILTERS)}.")
+  published = datetime.fromisoformat(published_at.replace("Z", "+00:00")) if published_at else None
+
+  kwargs = {"lookback_days": lookback_days, "n": None if lookback_days else n}
+  if "descriptors" in filters and descriptors:
+    kwargs["descriptors"] = descriptors
+  if "duration" in filters and duration_seconds is not None:
+    kwargs["duration"] = duration_bucket(duration_seconds)
+  if "weekday" in filters and published:
+    kwargs["weekdays"] = [published.isoweekday() % 7]
+  if "hour" in filters and published:
+    kwargs["hours"] = ((published.hour - COHORT_HOUR_WINDOW) % 24, (published.hour + COHORT_HOUR_WINDOW) % 24)
+  return kwargs
+
+def get_baseline_history(n=5, exclude_video_id=None):
+  """
+  Returns {metric_period: [values]} for the past n videos other than exclude_video_id,
+  skipping missing values.
+  """
+  matrix = load_baseline_matrix(n, exclude_video_id)
+  return {key: matrix[:, i][~np.isnan(matrix[:, i])].tolist() for i, key in enumerate(BASELINE_KEYS)}
@@ -1,11 +1,151 @@
-def compare_to_baseline(video_metrics, baseline_metrics, checkpoint="24hr"):
+from typing import NamedTuple
+import warnings
+import numpy as np
+
+from src.db import BASELINE_KEYS, get_video_stats_columns
+from src.baseline import BASELINE_TYPES, load_baseline_matrix, summarize_matrix
+
+class Comparison(NamedTuple):
+  """
+  Videos x metric_period comparison against a baseline. Every array has one row per
+  video and one column per key; entries that cannot be computed are NaN.
+  """
+  video_ids: list
+  keys: list
+  values: np.ndarray
+  baseline: np.ndarray
+  delta: np.ndarray
+  ratio: np.ndarray
+  z: np.ndarray
+  percentile_rank: np.ndarray
+
+  def column(self, key):
+    return self.keys.index(key)
+
+def percentile_rank(value, history):
+  """Returns the percentage of historical values below value (ties count half), or None."""
+  values = [v for v in history if v is not None]
+  if value is None or not values:
+    return None
+  below = sum(1 for v in values if v < value)
+  equal = sum(1 for v in values if v == value)
+  return round((below + 0.5 * equal) / len(values) * 100, 1)
+
+def compare_matrix(values, history, baseline=None, video_ids=None, keys=BASELINE_KEYS):
+  """
+  Compares a (videos, keys) matrix against a (n, keys) history matrix in one pass.
+  `baseline` defaults to the history's column means. Deltas are percentages of the
+  baseline, z-scores use the history's mean and standard deviation, and percentile
+  ranks count ties as half, like percentile_rank.
+  """
+  values = np.atleast_2d(np.asarray(values, dtype=float))
+  history = np.asarray(history, dtype=float).reshape(-1, values.shape[1])
+
+  with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+    # Keys with no history yet are expected and come out as NaN
+    warnings.simplefilter("ignore", RuntimeWarning)
+    mean = np.nanmean(history, axis=0)
+    std = np.nanstd(history, axis=0)
+    baseline = mean if baseline is None else np.asarray(baseline, dtype=float)
+
+    positive = baseline > 0
+    delta = np.where(positive, (values - baseline) / baseline * 100, np.nan)
+    ratio = np.where(positive, values / baseline, np.nan)
+    z = np.where(std > 0, (values - mean) / std, np.nan)
+
+  # NaNs sort last, so each column's history occupies the first `counts` rows
+  ordered = np.sort(history, axis=0)
+  counts = (~np.isnan(history)).sum(axis=0)
+  ranks = np.full(values.shape, np.nan)
+  for j in range(values.shape[1]):
+    if counts[j]:
+      column = ordered[:counts[j], j]
+      below = np.searchsorted(column, values[:, j], side="left")
+      equal = np.searchsorted(column, values[:, j], side="right") - below
+      ranks[:, j] = (below + 0.5 * equal) / counts[j] * 100
+  ranks[np.isnan(values)] = np.nan
+
+  return Comparison(
+    video_ids=list(video_ids) if video_ids is not None else list(range(len(values))),
+    keys=list(keys),
+    values=values,
+    baseline=baseline,
+    delta=delta,
+    ratio=ratio,
+    z=z,
+    percentile_rank=ranks,
+  )
+
+def load_video_matrix(keys=BASELINE_KEYS):
+  """Returns (video_ids, (videos, keys) float array) for every stored video, NaN for missing values."""
+  columns = get_video_stats_columns(["video_id", *keys])
+  matrix = np.column_stack([columns[key] for key in keys]) if len(columns["video_id"]) else np.full((0, len(keys)), np.nan)
+  return columns["video_id"].tolist(), matrix
+
+def compare_videos(keys=BASELINE_KEYS, n=5, baseline_type="mean"):
+  """Compares every stored video against the baseline of the past n videos."""
+  if baseline_type not in BASELINE_TYPES:
+    raise ValueError(f"Invalid baseline type. Must be one of: {', '.join(BASELINE_TYPES)}.")
+  columns = [BASELINE_KEYS.index(key) for key in keys]
+  history = load_baseline_matrix(n)[:, columns]
+  baseline = summarize_matrix(history)[baseline_type]
+  video_ids, values = load_video_matrix(keys)
+  return compare_matrix(values, history, baseline, video_ids, keys)
+
+def leaderboard(comparison, key, by="delta", top=10, ascending=False):
+  """
+  Returns the top (video_id, value, score) rows of a Comparison for one key, ranked by
+  the `by` field ("delta", "ratio", "z", "percentile_rank" or "values"). NaN scores are skipped.
+  """
+  scores = getattr(comparison, by)[:, comparison.column(key)]
+  valid = np.flatnonzero(~np.isnan(scores))
+  ranked = scores[valid] if ascending else -scores[valid]
+  top = min(top, len(valid))
+  if not top:
+    return []
+  best = np.argpartition(ranked, top - 1)[:top]
+  best = valid[best[np.argsort(ranked[best], kind="stable")]]
+  column = comparison.column(key)
+  return [(comparison.video_ids[i], float(comparison.values[i, column]), float(scores[i])) for i in best]
+
+def _history_matrix(history, keys):
+  columns = [history.get(key, []) if history is not None else [] for key in keys]
+  depth = max((len(column) for column in columns), default=0)
+  matrix = np.full((depth, len(keys)), np.nan)
+  for j, column in enumerate(columns):
+    matrix[:len(column), j] = [np.nan if v is None else v for v in column]
+  return matrix
+
+def compare_to_baseline(video_metrics, baseline_metrics, checkpoint="24hr", history=None, cohort=None):
+  """
+  Compares one video's {metric_period: value} stats for a checkpoint against baseline
+  metrics, and against {metric_period: [values]} history of other videos when given
+  (see baseline.get_baseline_history's exclude_video_id). A `cohort` of
+  similar past videos (see similarity.cohort_history), in the same shape, adds the
+  cohort's mean and the video's delta and percentile rank within it.
+  """
+  keys = [key for key in video_metrics if key.endswith(f"_{checkpoint}")]
+  if not keys:
+    return {}
+
+  values = np.array([[video_metrics[key] for key in keys]], dtype=float)
+  baseline = [baseline_metrics.get(key, 0) for key in keys]
+
+  comparison = compare_matrix(values, _history_matrix(history, keys), np.array(baseline, dtype=float), keys=keys)
+  if cohort is not None:
+    within_cohort = compare_matrix(values, _history_matrix(cohort, keys), keys=keys)
+
+  def clean(value, digits):
+    return None if np.isnan(value) else round(float(value), digits)
+
   results = {}
-  for metric, value in video_metrics.items():
-    if checkpoint in metric:
-      base_value = baseline_metrics.get(metric, 0)
-      if base_value > 0:
-        delta = ((value - base_value) / base_value) * 100
-      else:
-        delta = None
-      results[metric] = {"value": value, "baseline": base_value, "delta": round(delta, 1) if delta is not None else None}
-  return results
\ No newline at end of file
+  for j, key in enumerate(keys):
+    results[key] = {"value": video_metrics[key], "baseline": baseline[j], "delta": clean(comparison.delta[0, j], 1)}
+    if history is not None:
+      results[key]["z"] = clean(comparison.z[0, j], 2)
+      results[key]["percentile_rank"] = clean(comparison.percentile_rank[0, j], 1)
+    if cohort is not None:
+      results[key]["cohort_mean"] = clean(within_cohort.baseline[j], 2)
+      results[key]["cohort_delta"] = clean(within_cohort.delta[0, j], 1)
+      results[key]["cohort_percentile_rank"] = clean(within_cohort.percentile_rank[0, j], 1)
+  return results
@@ -0,0 +1,119 @@
+from datetime import date, datetime, timedelta
+import math
+import numpy as np
+
+from src.db import DAILY_STATS_COLUMNS, PERIOD_HOURS, store_daily_stats, get_daily_stats, get_last_daily_stats_day, store_snapshots
+from src.yt import get_daily_video_stats
+
+# Days a period covers, counting the publish day as the first
+PERIOD_DAYS = {period: math.ceil(hours / 24) for period, hours in PERIOD_HOURS.items()}
+
+# Stored days re-fetched on every sync, since YouTube revises its most recent figures
+REFETCH_DAYS = 3
+
+# Column positions in the rows returned by db.get_daily_stats (after the day)
+_COLUMNS = {column: i for i, column in enumerate(DAILY_STATS_COLUMNS)}
+
+# video_metric_snapshots metric names of the window_stats keys saved as daily snapshots
+SNAPSHOT_FIELDS = {
+  "views": "views",
+  "likes": "likes",
+  "comments": "comments",
+  "average_view_duration": "averageViewDuration",
+  "average_percentage_viewed": "averageViewPercentage",
+  "subs_gained": "subscribersGained",
+}
+
+# Metrics summed over a window; the averages are derived from the sums
+_ADDITIVE = ["views", "estimated_minutes_watched", "likes", "comments", "subscribers_gained", "subscribers_lost"]
+
+def _publish_day(published_date: str) -> date:
+  return datetime.fromisoformat(published_date).date()
+
+def sync_daily_stats(video_id: str, published_date: str):
+  """
+  Fetches the days missing from a video's stored daily stats, from its publish date
+  (or a few days before the last stored day) to today, in one Analytics report.
+  Returns the first day fetched, or None if there was nothing to fetch.
+  """
+  start = _publish_day(published_date)
+  last = get_last_daily_stats_day(video_id)
+  if last is not None:
+    start = max(start, date.fromisoformat(last) - timedelta(days=REFETCH_DAYS - 1))
+  today = date.today()
+  if start > today:
+    return None
+  rows = get_daily_video_stats(video_id, start.isoformat(), today.isoformat())
+  store_daily_stats(video_id, rows)
+  return start
+
+def load_daily_matrix(video_id: str, published_date: str):
+  """
+  Returns the stored daily stats as a (days, len(DAILY_STATS_COLUMNS)) array where row i
+  is day i after publishing, up to the last reported day before today (today's figures
+  are still incomplete). Unreported days in between are 0.
+  """
+  rows = get_daily_stats(video_id)
+  publish_day = _publish_day(published_date)
+  offsets = np.array([(date.fromisoformat(row[0]) - publish_day).days for row in rows], dtype=int)
+  values = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), len(DAILY_STATS_COLUMNS))
+  keep = (offsets >= 0) & (offsets < (date.today() - publish_day).days)
+  offsets, values = offsets[keep], values[keep]
+
+  matrix = np.zeros((offsets.max() + 1 if len(offsets) else 0, len(DAILY_STATS_COLUMNS)))
+  matrix[offsets] = np.nan_to_num(values)
+  return matrix
+
+def window_stats(matrix, windows: dict):
+  """
+  Computes stats over the first N days for every {label: N} window at once, from one
+  cumulative sum over the daily matrix. Windows longer than the data are omitted.
+  Returns {label: stats} keyed like get_all_video_stats.
+  """
+  available = {label: days for label, days in windows.items() if 0 < days <= len(matrix)}
+  if not available:
+    return {}
+
+  views = matrix[:, _COLUMNS["views"]]
+  sums = np.column_stack(
+    [matrix[:, _COLUMNS[column]] for column in _ADDITIVE]
+    + [matrix[:, _COLUMNS["average_view_percentage"]] * views]
+  )
+  totals = np.cumsum(sums, axis=0)[[days - 1 for days in available.values()]]
+
+  stats = {}
+  for (label, days), row in zip(available.items(), totals):
+    summed = dict(zip(_ADDITIVE, row))
+    total_views = summed["views"]
+    stats[label] = {
+      **{DAILY_STATS_COLUMNS[column]: int(value) for column, value in summed.items()},
+      "averageViewDuration": float(summed["estimated_minutes_watched"] * 60 / total_views) if total_views else 0,
+      "averageViewPercentage": float(row[-1] / total_views) if total_views else 0,
+    }
+  return stats
+
+def daily_snapshots(video_id: str, matrix, first_day: int = 0):
+  """
+  Returns (video_id, metric, hours_since_publish, value) snapshots of the cumulative
+  stats after each day of the daily matrix, at 24 x days hours, from day first_day on.
+  """
+  stats = window_stats(matrix, {days: days for days in range(first_day + 1, len(matrix) + 1)})
+  return [
+    (video_id, metric, 24 * days, window[field])
+    for days, window in stats.items()
+    for metric, field in SNAPSHOT_FIELDS.items()
+  ]
+
+def get_daily_window_stats(video_id: str, published_date: str, windows: dict = PERIOD_DAYS):
+  """
+  Syncs a video's daily stats and returns {label: stats} for each complete window of
+  {label: days}. Replaces one get_all_video_stats call per period with at most one call.
+  The cumulative stats of every day fetched are saved as daily snapshots, so the
+  video's time series extends past its first week.
+  """
+  first_fetched = sync_daily_stats(video_id, published_date)
+  matrix = load_daily_matrix(video_id, published_date)
+  if first_fetched is not None:
+    # Later days' totals include every refetched day, so they are rewritten too
+    store_snapshots(daily_snapshots(video_id, matrix, max(0, (first_fetched - _publish_day(published_date)).days)))
+  return window_stats(matrix, windows)
@@ -1,148 +1,930 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import json
+import logging
 import sqlite3
+import threading
+import time
+
+from src.telemetry import current_span, traced
+
+logger = logging.getLogger(__name__)
 
 DB_PATH = "video_stats.db"
 
+# Applied to every new connection. WAL lets readers run alongside a writer, and
+# synchronous=NORMAL is durable in WAL mode apart from the last commits on power loss.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 30000,
+    "temp_store": "MEMORY",
+    "cache_size": -64000,  # 64 MB
+    "mmap_size": 268435456,  # 256 MB
+}
+
+_local = threading.local()
+
+# Database paths whose schema has been created or migrated by this process
+_initialized = set()
+_init_lock = threading.Lock()
+
+# Hours after publishing that each fixed video_stats period column represents
+PERIOD_HOURS = {"24hr": 24, "48hr": 48, "7d": 168}
+
+# Metrics stored in video_stats, one column per period, with their SQL types
+VIDEO_STATS_METRICS = [
+    ("views", "INTEGER"),
+    ("likes", "INTEGER"),
+    ("ctr", "REAL"),
+    ("average_view_duration", "REAL"),
+    ("average_percentage_viewed", "REAL"),
+    ("comments", "INTEGER"),
+    ("subs_gained", "INTEGER"),
+]
+
+# The video_stats schema, defined once. The table, its SELECTs and VideoStats records
+# are generated from this list, so adding a metric cannot misalign rows.
+VIDEO_STATS_COLUMNS = [
+    ("video_id", "TEXT PRIMARY KEY"),
+    ("title", "TEXT"),
+    ("publish_date", "TEXT"),
+    ("duration_seconds", "INTEGER"),
+] + [(f"{metric}_{period}", f"{sql_type} DEFAULT NULL") for metric, sql_type in VIDEO_STATS_METRICS for period in PERIOD_HOURS]
+
+VIDEO_STATS_FIELDS = [name for name, _ in VIDEO_STATS_COLUMNS]
+
+# One video_stats row; a tuple with named fields and no per-row __dict__
+VideoStats = namedtuple("VideoStats", VIDEO_STATS_FIELDS)
+
+BASELINE_KEYS = [f"{metric}_{period}" for metric, _ in VIDEO_STATS_METRICS for period in PERIOD_HOURS]
+
+# Baseline sizes kept precomputed in the baselines table
+BASELINE_SIZES = (5, 10, 30)
+
+# Baseline types selectable from main.main (computed in src.baseline)
+BASELINE_TYPES = ("mean", "median", "trimmed_mean", "p10", "p50", "p90")
+
+# IDs bound per IN (...) query, under SQLite's default variable limit
+MAX_QUERY_IDS = 900
+
+# Analytics metrics stored per day in video_daily_stats, as {column: Analytics metric}
+DAILY_STATS_COLUMNS = {
+    "views": "views",
+    "estimated_minutes_watched": "estimatedMinutesWatched",
+    "average_view_duration": "averageViewDuration",
+    "average_view_percentage": "averageViewPercentage",
+    "likes": "likes",
+    "comments": "comments",
+    "subscribers_gained": "subscribersGained",
+    "subscribers_lost": "subscribersLost",
+}
+
+# Video length buckets for cohort baselines, as (exclusive lower, inclusive upper) seconds
+VIDEO_LENGTH_BUCKETS = {"short": (None, 60), "medium": (60, 600), "long": (600, None)}
+
+# A cohort's baseline: how many videos it averaged and {BASELINE_KEYS: mean}
+CohortBaseline = namedtuple("CohortBaseline", ["videos", "metrics"])
+
+# Bumped whenever init_db gains a data migration
+SCHEMA_VERSION = 3
+
+def get_connection():
+    """
+    Returns this thread's connection to DB_PATH, opening and tuning it on first use.
+    Connections are kept open for the life of the thread; use `with conn:` for a transaction.
+    The first connection to a path in this process runs init_db.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        _local.conn = conn
+        _local.path = DB_PATH
+    # init_db itself calls get_connection, so skip the check while this thread runs it;
+    # other threads wait on the lock until the schema is ready
+    if DB_PATH not in _initialized and not getattr(_local, "initializing", False):
+        with _init_lock:
+            if DB_PATH not in _initialized:
+                _local.initializing = True
+                try:
+                    init_db()
+                finally:
+                    _local.initializing = False
+                _initialized.add(DB_PATH)
+    return conn
+
+def close_connection():
+    """Closes this thread's connection, if it has one."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def _add_missing_columns(conn, table, columns):
+    """Adds (name, SQL type) columns that an existing table predates."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, sql_type in columns:
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+
 def init_db():
     """Initializes the SQLite database and creates the video_stats table if it doesn't exist."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     c = conn.cursor()
-    c.execute("""
+    c.execute(f"""
       CREATE TABLE IF NOT EXISTS video_stats (
+        {", ".join(f"{name} {sql_type}" for name, sql_type in VIDEO_STATS_COLUMNS)}
+      )
+    """)
+    _add_missing_columns(conn, "video_stats", VIDEO_STATS_COLUMNS[1:])
+    c.execute("CREATE INDEX IF NOT EXISTS idx_video_stats_publish_date ON video_stats (publish_date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_video_stats_duration ON video_stats (duration_seconds, publish_date)")
+    c.execute(f"""
+      CREATE TABLE IF NOT EXISTS baselines (
+        n INTEGER PRIMARY KEY,
+        {", ".join(f"{key} REAL" for key in BASELINE_KEYS)}
+      )
+    """)
+    _add_missing_columns(conn, "baselines", [(key, "REAL") for key in BASELINE_KEYS])
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS notion_pages (
+        page_id TEXT PRIMARY KEY,
+        database_id TEXT,
+        last_edited_time TEXT,
+        properties TEXT NOT NULL,
+        validated_at REAL NOT NULL
+      )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notion_pages_database ON notion_pages (database_id, last_edited_time)")
+    # Finds the experiment page of a video, e.g. for its descriptors
+    c.execute("CREATE INDEX IF NOT EXISTS idx_notion_pages_video ON notion_pages (json_extract(properties, '$.video_id'))")
+    # Blocks of an interrupted append acknowledged by Notion, per page and block list, so a
+    # later run resumes after them (see notion.NotionBlockWriter)
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS notion_block_writes (
+        parent_id TEXT NOT NULL,
+        blocks_hash TEXT NOT NULL,
+        acknowledged INTEGER NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (parent_id, blocks_hash)
+      )
+    """)
+    # Long-format time series: one row per video, metric and age. The primary key serves
+    # per-video reads; the metric/age index covers cross-video reads at a given age.
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS video_metric_snapshots (
+        video_id TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        hours_since_publish REAL NOT NULL,
+        value REAL,
+        PRIMARY KEY (video_id, metric, hours_since_publish)
+      ) WITHOUT ROWID
+    """)
+    c.execute("""
+      CREATE INDEX IF NOT EXISTS idx_snapshots_metric_age
+      ON video_metric_snapshots (metric, hours_since_publish, video_id, value)
+    """)
+    # Persistent priority queue of checkpoints for collector.py, ordered by due_at.
+    # Checkpoints given up on keep their row with a NULL due_at.
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS collector_queue (
+        video_id TEXT NOT NULL,
+        period TEXT NOT NULL,
+        published_at TEXT NOT NULL,
+        due_at REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (video_id, period)
+      )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_collector_queue_due ON collector_queue (due_at)")
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS api_usage (
+        day TEXT NOT NULL,
+        api TEXT NOT NULL,
+        units INTEGER NOT NULL,
+        PRIMARY KEY (day, api)
+      )
+    """)
+    c.execute(f"""
+      CREATE TABLE IF NOT EXISTS video_daily_stats (
+        video_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        {", ".join(f"{column} REAL" for column in DAILY_STATS_COLUMNS)},
+        PRIMARY KEY (video_id, day)
+      ) WITHOUT ROWID
+    """)
+    # Ranked sentences of each video's latest script, valid while the script is unchanged;
+    # ranking is a JSON list of [sentence index, tokens] (see prompts.rank_sentences)
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS script_rankings (
         video_id TEXT PRIMARY KEY,
-        title TEXT,
-        publish_date TEXT,
-        views_24hr INTEGER DEFAULT NULL,
-        views_48hr INTEGER DEFAULT NULL,
-        views_7d INTEGER DEFAULT NULL,
-        likes_24hr INTEGER DEFAULT NULL,
-        likes_48hr INTEGER DEFAULT NULL,
-        likes_7d INTEGER DEFAULT NULL,
-        ctr_24hr REAL DEFAULT NULL,
-        ctr_48hr REAL DEFAULT NULL,
-        ctr_7d REAL DEFAULT NULL,
-        average_view_duration_24hr REAL DEFAULT NULL,
-        average_view_duration_48hr REAL DEFAULT NULL,
-        average_view_duration_7d REAL DEFAULT NULL,
-        average_percentage_viewed_24hr REAL DEFAULT NULL,
-        average_percentage_viewed_48hr REAL DEFAULT NULL,
-        average_percentage_viewed_7d REAL DEFAULT NULL,
-        comments_24hr INTEGER DEFAULT NULL,
-        comments_48hr INTEGER DEFAULT NULL,
-        comments_7d INTEGER DEFAULT NULL,
-        subs_gained_24hr INTEGER DEFAULT NULL,
-        subs_gained_48hr INTEGER DEFAULT NULL,
-        subs_gained_7d INTEGER DEFAULT NULL
+        script_hash TEXT NOT NULL,
+        ranking TEXT NOT NULL
+      )
+    """)
+    # Lowercased descriptors of each video's Notion experiment page. The primary key is
+    # the descriptor -> videos index used by cohort filters.
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS video_descriptors (
+        descriptor TEXT NOT NULL,
+        video_id TEXT NOT NULL,
+        PRIMARY KEY (descriptor, video_id)
+      ) WITHOUT ROWID
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_video_descriptors_video ON video_descriptors (video_id)")
+    # Cached cohort baselines with their filters, which decide which writes invalidate them
+    c.execute("""
+      CREATE TABLE IF NOT EXISTS cohort_baselines (
+        cohort_key TEXT PRIMARY KEY,
+        descriptors TEXT,
+        min_shared INTEGER,
+        min_duration INTEGER,
+        max_duration INTEGER,
+        weekdays TEXT,
+        hour_from INTEGER,
+        hour_to INTEGER,
+        since TEXT,
+        n INTEGER,
+        videos INTEGER NOT NULL,
+        metrics TEXT NOT NULL,
+        computed_at REAL NOT NULL
       )
     """)
     conn.commit()
-    conn.close()
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1:
+        migrate_video_stats_to_snapshots()
+    if version < 2:
+        migrate_notion_descriptors()
+    if version < 3:
+        # Summaries cached per token limit, replaced by script_rankings
+        conn.execute("DROP TABLE IF EXISTS script_summaries")
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    refresh_baselines()
+
+def migrate_video_stats_to_snapshots():
+    """Copies every non-NULL period column of video_stats into video_metric_snapshots."""
+    selects = []
+    for key in BASELINE_KEYS:
+        metric, period = key.rsplit("_", 1)
+        selects.append(
+            f"SELECT video_id, '{metric}', {PERIOD_HOURS[period]}, {key} FROM video_stats WHERE {key} IS NOT NULL"
+        )
+    conn = get_connection()
+    with conn:
+        conn.execute(f"""
+            INSERT OR IGNORE INTO video_metric_snapshots (video_id, metric, hours_since_publish, value)
+            {" UNION ALL ".join(selects)}
+        """)
+
+def migrate_notion_descriptors():
+    """Fills video_descriptors from the Notion pages cached before it existed."""
+    conn = get_connection()
+    with conn:
+        conn.execute("""
+            INSERT OR IGNORE INTO video_descriptors (descriptor, video_id)
+            SELECT lower(trim(d.value)), json_extract(n.properties, '$.video_id')
+            FROM notion_pages n, json_each(n.properties, '$.descriptors') d
+            WHERE json_extract(n.properties, '$.video_id') != '' AND trim(d.value) != ''
+        """)
 
+_VIDEO_STATS_SELECT = f"SELECT {', '.join(VIDEO_STATS_FIELDS)} FROM video_stats"
+
+def _video_stats_row(cursor, row):
+    return VideoStats._make(row)
+
+@traced("sqlite.get_video_stats_record")
+def get_video_stats_record(video_id):
+    """Returns a video's VideoStats record, or None."""
+    c = get_connection().cursor()
+    c.row_factory = _video_stats_row
+    return c.execute(f"{_VIDEO_STATS_SELECT} WHERE video_id = ?", (video_id,)).fetchone()
+
+@traced("sqlite.get_video_stats")
 def get_video_stats(video_id):
     """Returns stats for a specific video."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM video_stats WHERE video_id = ?", (video_id,))
-    row = c.fetchone()
-    conn.close()
-    if row:
-        keys = [
-            "video_id", "title", "publish_date",
-            "views_24hr", "views_48hr", "views_7d",
-            "likes_24hr", "likes_48hr", "likes_7d",
-            "ctr_24hr", "ctr_48hr", "ctr_7d",
-            "average_view_duration_24hr", "average_view_duration_48hr", "average_view_duration_7d",
-            "average_percentage_viewed_24hr", "average_percentage_viewed_48hr", "average_percentage_viewed_7d",
-            "comments_24hr", "comments_48hr", "comments_7d",
-            "subs_gained_24hr", "subs_gained_48hr", "subs_gained_7d"
-        ]
-        return dict(zip(keys, row))
-    return None
-
-def get_video_baseline(n=5):
-    """Returns baseline metrics for the past n videos."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        SELECT
-            views_24hr, views_48hr, views_7d,
-            likes_24hr, likes_48hr, likes_7d,
-            ctr_24hr, ctr_48hr, ctr_7d,
-            average_view_duration_24hr, average_view_duration_48hr, average_view_duration_7d,
-            average_percentage_viewed_24hr, average_percentage_viewed_48hr, average_percentage_viewed_7d,
-            comments_24hr, comments_48hr, comments_7d,
-            subs_gained_24hr, subs_gained_48hr, subs_gained_7d
-        FROM video_stats
-        ORDER BY publish_date DESC
-        LIMIT ?
-    """, (n,))
-    rows = c.fetchall()
-    conn.close()
-    if not rows:
-        return {k: 0 for k in [
-            "views_24hr", "views_48hr", "views_7d",
-            "likes_24hr", "likes_48hr", "likes_7d",
-            "ctr_24hr", "ctr_48hr", "ctr_7d",
-            "average_view_duration_24hr", "average_view_duration_48hr", "average_view_duration_7d",
-            "average_percentage_viewed_24hr", "average_percentage_viewed_48hr", "average_percentage_viewed_7d",
-            "comments_24hr", "comments_48hr", "comments_7d",
-            "subs_gained_24hr", "subs_gained_48hr", "subs_gained_7d"
-        ]}
-    cols = list(zip(*rows))
-    keys = [
-        "views_24hr", "views_48hr", "views_7d",
-        "likes_24hr", "likes_48hr", "likes_7d",
-        "ctr_24hr", "ctr_48hr", "ctr_7d",
-        "average_view_duration_24hr", "average_view_duration_48hr", "average_view_duration_7d",
-        "average_percentage_viewed_24hr", "average_percentage_viewed_48hr", "average_percentage_viewed_7d",
-        "comments_24hr", "comments_48hr", "comments_7d",
-        "subs_gained_24hr", "subs_gained_48hr", "subs_gained_7d"
-    ]
-    def safe_avg(col):
-        filtered = [v for v in col if v is not None]
-        return float(sum(filtered) / len(filtered)) if filtered else 0
-    return {k: safe_avg(col) for k, col in zip(keys, cols)}
+    record = get_video_stats_record(video_id)
+    return record._asdict() if record else None
 
-def store_video_stats(video_id, publish_date, period, stats):
-    if period not in ["24hr", "48hr", "7d"]:
-        raise ValueError("Invalid period. Must be one of: 24hr, 48hr, 7d.")
+@traced("sqlite.get_many_video_stats")
+def get_many_video_stats(video_ids):
+    """
+    Returns {video_id: VideoStats} for the given videos that are stored, with one
+    IN query per MAX_QUERY_IDS IDs instead of a lookup per video.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    c = get_connection().cursor()
+    c.row_factory = _video_stats_row
+    records = {}
+    for i in range(0, len(video_ids), MAX_QUERY_IDS):
+        chunk = video_ids[i:i + MAX_QUERY_IDS]
+        c.execute(f"{_VIDEO_STATS_SELECT} WHERE video_id IN ({', '.join('?' * len(chunk))})", chunk)
+        records.update((record.video_id, record) for record in c)
+    current_span().set("rows", len(records))
+    return records
+
+@traced("sqlite.get_video_stats_columns")
+def get_video_stats_columns(fields=VIDEO_STATS_FIELDS):
+    """
+    Returns {field: array} for every stored video: float arrays (NaN for NULL) for the
+    metric columns and object arrays for the text columns. Suited to bulk reads, with no
+    per-row objects kept alive.
+    """
+    import numpy as np
+
+    unknown = set(fields) - set(VIDEO_STATS_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown video_stats columns: {', '.join(sorted(unknown))}")
+    rows = get_connection().execute(f"SELECT {', '.join(fields)} FROM video_stats").fetchall()
+    columns = list(zip(*rows)) if rows else [()] * len(fields)
+    return {
+        field: np.array(values, dtype=float if field in BASELINE_KEYS else object)
+        for field, values in zip(fields, columns)
+    }
+
+def _compute_baseline(conn, n, exclude_video_id=None):
+    # AVG skips NULLs, and the publish_date index serves the ORDER BY ... LIMIT
+    averages = ", ".join(f"COALESCE(AVG({key}), 0)" for key in BASELINE_KEYS)
+    row = conn.execute(f"""
+        SELECT {averages}
+        FROM (SELECT * FROM video_stats WHERE video_id IS NOT ? ORDER BY publish_date DESC LIMIT ?)
+    """, (exclude_video_id, n)).fetchone()
+    return dict(zip(BASELINE_KEYS, row))
+
+@traced("sqlite.refresh_baselines")
+def refresh_baselines(publish_date=None):
+    """
+    Recomputes the materialized baselines for BASELINE_SIZES.
+    With a publish_date, nothing is done unless a video published then falls inside the
+    largest baseline window, since older videos cannot change any of them.
+    """
+    conn = get_connection()
+    if publish_date is not None:
+        oldest = conn.execute(
+            "SELECT publish_date FROM video_stats ORDER BY publish_date DESC LIMIT 1 OFFSET ?",
+            (max(BASELINE_SIZES) - 1,),
+        ).fetchone()
+        if oldest is not None and oldest[0] is not None and publish_date < oldest[0]:
+            return
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO baselines (n, {', '.join(BASELINE_KEYS)}) VALUES (?{', ?' * len(BASELINE_KEYS)})",
+            [[n] + list(_compute_baseline(conn, n).values()) for n in BASELINE_SIZES],
+        )
+
+@traced("sqlite.get_video_baseline")
+def get_video_baseline(n=5, exclude_video_id=None):
+    """
+    Returns baseline metrics for the past n videos. exclude_video_id (the video being
+    analyzed) is left out; the materialized baseline is used unless it is among them.
+    """
+    conn = get_connection()
+    if exclude_video_id is not None and conn.execute(
+        "SELECT 1 FROM (SELECT video_id FROM video_stats ORDER BY publish_date DESC LIMIT ?) WHERE video_id = ?",
+        (n, exclude_video_id),
+    ).fetchone():
+        return _compute_baseline(conn, n, exclude_video_id)
+    if n in BASELINE_SIZES:
+        row = conn.execute(f"SELECT {', '.join(BASELINE_KEYS)} FROM baselines WHERE n = ?", (n,)).fetchone()
+        if row is not None:
+            return dict(zip(BASELINE_KEYS, row))
+    return _compute_baseline(conn, n)
+
+def duration_bucket(duration_seconds):
+    """Returns the VIDEO_LENGTH_BUCKETS name a video length falls in, or None if unknown."""
+    if duration_seconds is None:
+        return None
+    for name, (low, high) in VIDEO_LENGTH_BUCKETS.items():
+        if (low is None or duration_seconds > low) and (high is None or duration_seconds <= high):
+            return name
+
+_PUBLISH_HOUR = "CAST(strftime('%H', v.publish_date) AS INTEGER)"
+
+def _hour_condition(hour_from, hour_to):
+    # Hours are inclusive and wrap past midnight when hour_from > hour_to
+    if hour_from <= hour_to:
+        return f"{_PUBLISH_HOUR} BETWEEN {hour_from} AND {hour_to}"
+    return f"({_PUBLISH_HOUR} >= {hour_from} OR {_PUBLISH_HOUR} <= {hour_to})"
+
+# Matches the video_stats row `v` against each cached cohort's filters, mirroring the
+# conditions get_cohort_baseline builds
+_COHORT_MATCH = f"""
+    (c.since IS NULL OR v.publish_date >= c.since)
+    AND (c.min_duration IS NULL OR v.duration_seconds > c.min_duration)
+    AND (c.max_duration IS NULL OR v.duration_seconds <= c.max_duration)
+    AND (c.weekdays IS NULL OR instr(c.weekdays, strftime('%w', v.publish_date)) > 0)
+    AND (c.hour_from IS NULL OR CASE WHEN c.hour_from <= c.hour_to
+        THEN {_PUBLISH_HOUR} BETWEEN c.hour_from AND c.hour_to
+        ELSE {_PUBLISH_HOUR} >= c.hour_from OR {_PUBLISH_HOUR} <= c.hour_to END)
+    AND (c.descriptors IS NULL OR (
+        SELECT COUNT(*) FROM video_descriptors d
+        WHERE d.video_id = v.video_id AND d.descriptor IN (SELECT value FROM json_each(c.descriptors))
+    ) >= c.min_shared)
+"""
+
+def _invalidate_cohort_baselines(conn, video_ids, descriptor_cohorts_only=False):
+    """
+    Drops the cached cohort baselines whose filters match any of the videos as currently
+    stored. Call it after changing a video's stats, and both before and after changing
+    what it is filtered on (publish date, duration, descriptors).
+    """
+    if not conn.execute("SELECT 1 FROM cohort_baselines LIMIT 1").fetchone():
+        return
+    _fill_temp_ids(conn, "cohort_videos", video_ids)
+    conn.execute(f"""
+        DELETE FROM cohort_baselines AS c WHERE {"c.descriptors IS NOT NULL AND" if descriptor_cohorts_only else ""} EXISTS (
+            SELECT 1 FROM video_stats v
+            WHERE v.video_id IN (SELECT id FROM cohort_videos) AND {_COHORT_MATCH}
+        )
+    """)
+
+@traced("sqlite.get_cohort_baseline")
+def get_cohort_baseline(descriptors=(), min_shared=1, duration=None, weekdays=None, hours=None, lookback_days=None, n=None, now=None):
+    """
+    Returns the CohortBaseline of the videos matching every given filter:
+    - descriptors: at least min_shared of these Notion descriptors (case-insensitive)
+    - duration: a VIDEO_LENGTH_BUCKETS name ("short", "medium" or "long")
+    - weekdays: publish weekdays, 0 (Sunday) to 6, in UTC
+    - hours: (from, to) publish hours in UTC, inclusive, wrapping past midnight if from > to
+    - lookback_days: published within this many days before now (default: now, UTC)
+    - n: only the n most recently published of them
+    Results are cached until a video matching the filters is written (see
+    _invalidate_cohort_baselines); the lookback window moves daily.
+    """
+    descriptors = sorted({d.strip().lower() for d in descriptors or () if d and d.strip()})
+    if duration is not None and duration not in VIDEO_LENGTH_BUCKETS:
+        raise ValueError(f"Invalid duration bucket. Must be one of: {', '.join(VIDEO_LENGTH_BUCKETS)}.")
+    weekdays = sorted({int(day) for day in weekdays}) if weekdays else None
+    if weekdays and not all(0 <= day <= 6 for day in weekdays):
+        raise ValueError("Weekdays must be between 0 (Sunday) and 6.")
+    hour_from, hour_to = (int(hours[0]), int(hours[1])) if hours else (None, None)
+    if hours and not (0 <= hour_from <= 23 and 0 <= hour_to <= 23):
+        raise ValueError("Hours must be between 0 and 23.")
+    now = now or datetime.now(timezone.utc)
+    since = (now - timedelta(days=lookback_days)).strftime("%Y-%m-%d") if lookback_days is not None else None
+    low, high = VIDEO_LENGTH_BUCKETS[duration] if duration else (None, None)
+
+    key = json.dumps([descriptors, min_shared if descriptors else None, duration, weekdays, hour_from, hour_to, since, n])
+    conn = get_connection()
+    row = conn.execute("SELECT videos, metrics FROM cohort_baselines WHERE cohort_key = ?", (key,)).fetchone()
+    current_span().set("cache_hit", int(row is not None))
+    if row is not None:
+        return CohortBaseline(row[0], json.loads(row[1]))
+
+    conditions, params = [], []
+    if descriptors and n is not None:
+        # Checked per video while walking the publish_date index, stopping after n matches
+        conditions.append(f"""(
+            SELECT COUNT(*) FROM video_descriptors d
+            WHERE d.video_id = v.video_id AND d.descriptor IN ({', '.join('?' * len(descriptors))})
+        ) >= ?""")
+        params += descriptors + [min_shared]
+    elif descriptors:
+        conditions.append(f"""v.video_id IN (
+            SELECT video_id FROM video_descriptors WHERE descriptor IN ({', '.join('?' * len(descriptors))})
+            GROUP BY video_id HAVING COUNT(*) >= ?
+        )""")
+        params += descriptors + [min_shared]
+    if low is not None:
+        conditions.append("v.duration_seconds > ?")
+        params.append(low)
+    if high is not None:
+        conditions.append("v.duration_seconds <= ?")
+        params.append(high)
+    if weekdays:
+        conditions.append(f"strftime('%w', v.publish_date) IN ({', '.join('?' * len(weekdays))})")
+        params += [str(day) for day in weekdays]
+    if hours:
+        conditions.append(_hour_condition(hour_from, hour_to))
+    if since is not None:
+        conditions.append("v.publish_date >= ?")
+        params.append(since)
+
+    averages = ", ".join(f"COALESCE(AVG({key}), 0)" for key in BASELINE_KEYS)
+    row = conn.execute(f"""
+        SELECT COUNT(*), {averages}
+        FROM (
+            SELECT {', '.join(BASELINE_KEYS)} FROM video_stats v
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            {"ORDER BY v.publish_date DESC LIMIT ?" if n is not None else ""}
+        )
+    """, params + ([n] if n is not None else [])).fetchone()
+    baseline = CohortBaseline(row[0], dict(zip(BASELINE_KEYS, row[1:])))
+
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    with conn:
+        # Lookback cohorts from previous days are keyed by a window start no longer asked for
+        conn.execute("DELETE FROM cohort_baselines WHERE since IS NOT NULL AND computed_at < ?", (today,))
+        conn.execute("""
+            INSERT OR REPLACE INTO cohort_baselines
+            (cohort_key, descriptors, min_shared, min_duration, max_duration, weekdays, hour_from, hour_to, since, n, videos, metrics, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            key, json.dumps(descriptors) if descriptors else None, min_shared, low, high,
+            "".join(map(str, weekdays)) if weekdays else None, hour_from, hour_to, since, n,
+            baseline.videos, json.dumps(baseline.metrics), time.time(),
+        ))
+    return baseline
+
+def _filter_period_stats(publish_date, period, stats):
+    if period not in PERIOD_HOURS:
+        raise ValueError(f"Invalid period. Must be one of: {', '.join(PERIOD_HOURS)}.")
 
     # Filter stats for the correct period
     filtered_stats = {k: v for k, v in stats.items() if k.endswith(f"_{period}")}
     filtered_stats["publish_date"] = publish_date
+    return filtered_stats
+
+def _upsert_sql(columns):
+    """
+    Returns an atomic INSERT ... ON CONFLICT DO UPDATE statement that only touches the
+    given columns, so stats stored for other periods are left in place.
+    """
+    updates = ", ".join(f"{col} = excluded.{col}" for col in columns)
+    return (
+        f"INSERT INTO video_stats (video_id, {', '.join(columns)}) "
+        f"VALUES (?{', ?' * len(columns)}) "
+        f"ON CONFLICT(video_id) DO UPDATE SET {updates}"
+    )
+
+_SNAPSHOT_UPSERT = """
+    INSERT OR REPLACE INTO video_metric_snapshots (video_id, metric, hours_since_publish, value)
+    VALUES (?, ?, ?, ?)
+"""
+
+def _snapshot_rows(video_id, period, filtered_stats):
+    hours = PERIOD_HOURS[period]
+    suffix = f"_{period}"
+    return [
+        (video_id, key[:-len(suffix)], hours, value)
+        for key, value in filtered_stats.items()
+        if key.endswith(suffix) and value is not None
+    ]
+
+@traced("sqlite.store_snapshots")
+def store_snapshots(snapshots):
+    """
+    Stores (video_id, metric, hours_since_publish, value) snapshots, replacing any
+    existing value at the same metric and age. Videos are not added to video_stats, so
+    a video only takes part in baselines once it has checkpoint stats.
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany(_SNAPSHOT_UPSERT, snapshots)
+
+@traced("sqlite.store_video_stats")
+def store_video_stats(video_id, publish_date, period, stats):
+    filtered_stats = _filter_period_stats(publish_date, period, stats)
 
-    print("Filtered Stats:", filtered_stats)
+    logger.debug("Filtered stats for %s (%s): %s", video_id, period, filtered_stats)
 
     if not filtered_stats:
         # Nothing to update/insert
         return
 
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    conn = get_connection()
+    with conn:
+        conn.execute(_upsert_sql(list(filtered_stats)), [video_id] + list(filtered_stats.values()))
+        conn.executemany(_SNAPSHOT_UPSERT, _snapshot_rows(video_id, period, filtered_stats))
+        _invalidate_cohort_baselines(conn, [video_id])
+    # A NULL publish_date sorts after every dated video, like the empty string
+    refresh_baselines(publish_date or "")
 
-    # Check if video exists
-    c.execute("SELECT video_id FROM video_stats WHERE video_id = ?", (video_id,))
-    exists = c.fetchone()
-
-    if exists:
-        # Update only the provided stats
-        set_clauses = []
-        values = []
-        for key, value in filtered_stats.items():
-            set_clauses.append(f"{key} = ?")
-            values.append(value)
-        values.append(video_id)
-        query = f"UPDATE video_stats SET {', '.join(set_clauses)} WHERE video_id = ?"
-        c.execute(query, values)
-    else:
-        # Insert new record with provided stats
-        columns = ["video_id"] + list(filtered_stats.keys())
-        placeholders = "?" + ", ?" * len(filtered_stats)
-        values = [video_id] + list(filtered_stats.values())
-        query = f"INSERT INTO video_stats ({', '.join(columns)}) VALUES ({placeholders})"
-        c.execute(query, values)
+@traced("sqlite.store_video_stats_bulk")
+def store_video_stats_bulk(records):
+    """
+    Stores many (video_id, publish_date, period, stats) records in a single transaction.
+    Records with the same set of columns are written with one executemany upsert.
+    Returns the number of records written.
+    """
+    groups = {}
+    snapshots = []
+    for video_id, publish_date, period, stats in records:
+        filtered_stats = _filter_period_stats(publish_date, period, stats)
+        groups.setdefault(tuple(filtered_stats), []).append([video_id] + list(filtered_stats.values()))
+        snapshots.extend(_snapshot_rows(video_id, period, filtered_stats))
 
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        for columns, rows in groups.items():
+            conn.executemany(_upsert_sql(list(columns)), rows)
+        conn.executemany(_SNAPSHOT_UPSERT, snapshots)
+        _invalidate_cohort_baselines(conn, [record[0] for record in records])
+    refresh_baselines()
+    written = sum(len(rows) for rows in groups.values())
+    current_span().set("rows", written)
+    return written
+
+@traced("sqlite.store_video_metadata")
+def store_video_metadata(records):
+    """
+    Stores (video_id, title, publish_date, duration_seconds) records from the YouTube
+    Data API, creating video_stats rows as needed. None values leave stored ones in place.
+    """
+    video_ids = [record[0] for record in records]
+    conn = get_connection()
+    with conn:
+        _invalidate_cohort_baselines(conn, video_ids)
+        conn.executemany("""
+            INSERT INTO video_stats (video_id, title, publish_date, duration_seconds) VALUES (?, ?, ?, ?)
+            ON CONFLICT(video_id) DO UPDATE SET
+                title = COALESCE(excluded.title, title),
+                publish_date = COALESCE(excluded.publish_date, publish_date),
+                duration_seconds = COALESCE(excluded.duration_seconds, duration_seconds)
+        """, records)
+        _invalidate_cohort_baselines(conn, video_ids)
+
+@traced("sqlite.get_cached_notion_page")
+def get_cached_notion_page(page_id):
+    """Returns (properties, last_edited_time, validated_at) for a cached Notion page, or None."""
+    row = get_connection().execute(
+        "SELECT properties, last_edited_time, validated_at FROM notion_pages WHERE page_id = ?", (page_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    return json.loads(row[0]), row[1], row[2]
+
+@traced("sqlite.store_cached_notion_pages")
+def store_cached_notion_pages(pages, database_id=None):
+    """
+    Caches parsed Notion pages, given as (page_id, last_edited_time, properties) tuples,
+    and marks them validated now.
+    """
+    now = time.time()
+    conn = get_connection()
+    with conn:
+        conn.executemany("""
+            INSERT INTO notion_pages (page_id, database_id, last_edited_time, properties, validated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(page_id) DO UPDATE SET
+                database_id = COALESCE(excluded.database_id, database_id),
+                last_edited_time = excluded.last_edited_time,
+                properties = excluded.properties,
+                validated_at = excluded.validated_at
+        """, [(page_id, database_id, edited, json.dumps(props), now) for page_id, edited, props in pages])
+        _store_video_descriptors(conn, {
+            props["video_id"]: {d.strip().lower() for d in props.get("descriptors") or [] if d and d.strip()}
+            for _, _, props in pages if props.get("video_id")
+        })
+
+def _store_video_descriptors(conn, descriptors):
+    """Replaces the video_descriptors of the {video_id: descriptor set} videos whose set changed."""
+    if not descriptors:
+        return
+    _fill_temp_ids(conn, "descriptor_videos", descriptors)
+    stored = {}
+    for descriptor, video_id in conn.execute(
+        "SELECT descriptor, video_id FROM video_descriptors WHERE video_id IN (SELECT id FROM descriptor_videos)"
+    ):
+        stored.setdefault(video_id, set()).add(descriptor)
+    changed = [video_id for video_id, names in descriptors.items() if stored.get(video_id, set()) != names]
+    if not changed:
+        return
+    _invalidate_cohort_baselines(conn, changed, descriptor_cohorts_only=True)
+    conn.executemany("DELETE FROM video_descriptors WHERE video_id = ?", [(video_id,) for video_id in changed])
+    conn.executemany(
+        "INSERT INTO video_descriptors (descriptor, video_id) VALUES (?, ?)",
+        [(descriptor, video_id) for video_id in changed for descriptor in descriptors[video_id]],
+    )
+    _invalidate_cohort_baselines(conn, changed, descriptor_cohorts_only=True)
+
+@traced("sqlite.get_notion_database_sync_state")
+def get_notion_database_sync_state(database_id):
+    """Returns the latest last_edited_time cached for a database's pages, or None."""
+    row = get_connection().execute(
+        "SELECT MAX(last_edited_time) FROM notion_pages WHERE database_id = ?", (database_id,)
+    ).fetchone()
+    return row[0]
+
+@traced("sqlite.mark_notion_database_validated")
+def mark_notion_database_validated(database_id, page_ids=None):
+    """
+    Marks a database's cached pages as validated now and returns their IDs.
+    With the database's full list of page_ids, cached pages no longer in it are dropped.
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE notion_pages SET validated_at = ? WHERE database_id = ?", (time.time(), database_id))
+        if page_ids is not None:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS current_pages (page_id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM current_pages")
+            conn.executemany("INSERT OR IGNORE INTO current_pages (page_id) VALUES (?)", [(page_id,) for page_id in page_ids])
+            conn.execute(
+                "DELETE FROM notion_pages WHERE database_id = ? AND page_id NOT IN (SELECT page_id FROM current_pages)",
+                (database_id,),
+            )
+    rows = conn.execute("SELECT page_id FROM notion_pages WHERE database_id = ? ORDER BY page_id", (database_id,)).fetchall()
+    return [row[0] for row in rows]
+
+@traced("sqlite.get_notion_write_progress")
+def get_notion_write_progress(parent_id, blocks_hash):
+    """Returns how many blocks of an earlier, unfinished append of the same blocks Notion acknowledged."""
+    row = get_connection().execute(
+        "SELECT acknowledged FROM notion_block_writes WHERE parent_id = ? AND blocks_hash = ?", (parent_id, blocks_hash)
+    ).fetchone()
+    return row[0] if row else 0
+
+@traced("sqlite.store_notion_write_progress")
+def store_notion_write_progress(parent_id, blocks_hash, acknowledged):
+    """Records the blocks acknowledged so far; None clears the record once the append is complete."""
+    conn = get_connection()
+    with conn:
+        if acknowledged is None:
+            conn.execute("DELETE FROM notion_block_writes WHERE parent_id = ? AND blocks_hash = ?", (parent_id, blocks_hash))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO notion_block_writes (parent_id, blocks_hash, acknowledged, updated_at) VALUES (?, ?, ?, ?)",
+                (parent_id, blocks_hash, acknowledged, time.time()),
+            )
+
+@traced("sqlite.store_daily_stats")
+def store_daily_stats(video_id, rows):
+    """
+    Stores Analytics rows with a "day" dimension for a video, replacing days already
+    stored (recent days are revised as YouTube finalizes them).
+    """
+    columns = list(DAILY_STATS_COLUMNS)
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO video_daily_stats (video_id, day, {', '.join(columns)}) VALUES (?, ?{', ?' * len(columns)})",
+            [[video_id, row["day"]] + [row.get(metric) for metric in DAILY_STATS_COLUMNS.values()] for row in rows],
+        )
+
+@traced("sqlite.get_daily_stats")
+def get_daily_stats(video_id):
+    """Returns a video's (day, *DAILY_STATS_COLUMNS) rows, oldest first."""
+    return get_connection().execute(
+        f"SELECT day, {', '.join(DAILY_STATS_COLUMNS)} FROM video_daily_stats WHERE video_id = ? ORDER BY day",
+        (video_id,),
+    ).fetchall()
+
+@traced("sqlite.get_last_daily_stats_day")
+def get_last_daily_stats_day(video_id):
+    """Returns the latest day (YYYY-MM-DD) stored for a video, or None."""
+    return get_connection().execute(
+        "SELECT MAX(day) FROM video_daily_stats WHERE video_id = ?", (video_id,)
+    ).fetchone()[0]
+
+def _fill_temp_ids(conn, name, ids):
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {name} (id TEXT PRIMARY KEY)")
+    conn.execute(f"DELETE FROM {name}")
+    conn.executemany(f"INSERT OR IGNORE INTO {name} (id) VALUES (?)", [(i,) for i in ids])
+
+@traced("sqlite.get_stored_periods")
+def get_stored_periods(video_ids):
+    """Returns {video_id: set of periods with stored views} for the given videos."""
+    conn = get_connection()
+    with conn:
+        _fill_temp_ids(conn, "lookup_videos", video_ids)
+        columns = ", ".join(f"views_{period} IS NOT NULL" for period in PERIOD_HOURS)
+        rows = conn.execute(
+            f"SELECT video_id, {columns} FROM video_stats WHERE video_id IN (SELECT id FROM lookup_videos)"
+        ).fetchall()
+    return {row[0]: {period for period, stored in zip(PERIOD_HOURS, row[1:]) if stored} for row in rows}
+
+@traced("sqlite.get_known_video_ids")
+def get_known_video_ids(video_ids):
+    """
+    Returns the subset of video_ids whose every period is stored or queued for collection.
+    Videos stored with only some periods (e.g. by an analysis) are not known yet.
+    """
+    covered = " AND ".join(
+        f"(s.views_{period} IS NOT NULL OR EXISTS "
+        f"(SELECT 1 FROM collector_queue q WHERE q.video_id = l.id AND q.period = '{period}'))"
+        for period in PERIOD_HOURS
+    )
+    conn = get_connection()
+    with conn:
+        _fill_temp_ids(conn, "lookup_videos", video_ids)
+        rows = conn.execute(f"""
+            SELECT l.id FROM lookup_videos l LEFT JOIN video_stats s ON s.video_id = l.id
+            WHERE {covered}
+        """).fetchall()
+    return {row[0] for row in rows}
+
+@traced("sqlite.enqueue_checkpoints")
+def enqueue_checkpoints(checkpoints):
+    """
+    Queues (video_id, period, published_at, due_at) checkpoints for collection.
+    Checkpoints already queued keep their due time and attempt count.
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO collector_queue (video_id, period, published_at, due_at) VALUES (?, ?, ?, ?)",
+            checkpoints,
+        )
+
+@traced("sqlite.get_due_checkpoints")
+def get_due_checkpoints(now, limit=1000):
+    """Returns up to limit (video_id, period, published_at, attempts) checkpoints due by now, earliest first."""
+    return get_connection().execute("""
+        SELECT video_id, period, published_at, attempts FROM collector_queue
+        WHERE due_at <= ? ORDER BY due_at LIMIT ?
+    """, (now, limit)).fetchall()
+
+@traced("sqlite.next_checkpoint_due")
+def next_checkpoint_due():
+    """Returns the earliest due_at in the collector queue, or None if it is empty."""
+    return get_connection().execute("SELECT MIN(due_at) FROM collector_queue").fetchone()[0]
+
+@traced("sqlite.complete_checkpoints")
+def complete_checkpoints(checkpoints):
+    """Removes collected (video_id, period) checkpoints from the queue."""
+    conn = get_connection()
+    with conn:
+        conn.executemany("DELETE FROM collector_queue WHERE video_id = ? AND period = ?", checkpoints)
+
+@traced("sqlite.reschedule_checkpoints")
+def reschedule_checkpoints(checkpoints):
+    """Moves (due_at, video_id, period) checkpoints to a new due time, e.g. recurring snapshots."""
+    conn = get_connection()
+    with conn:
+        conn.executemany("UPDATE collector_queue SET due_at = ? WHERE video_id = ? AND period = ?", checkpoints)
+
+@traced("sqlite.retry_checkpoints")
+def retry_checkpoints(checkpoints):
+    """
+    Reschedules (due_at, video_id, period) checkpoints and counts the failed attempt.
+    A due_at of None parks the checkpoint without retrying it.
+    """
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "UPDATE collector_queue SET due_at = ?, attempts = attempts + 1 WHERE video_id = ? AND period = ?",
+            checkpoints,
+        )
+
+@traced("sqlite.add_api_usage")
+def add_api_usage(day, api, units):
+    if not units:
+        return
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO api_usage (day, api, units) VALUES (?, ?, ?) "
+            "ON CONFLICT(day, api) DO UPDATE SET units = units + excluded.units",
+            (day, api, units),
+        )
+
+@traced("sqlite.get_api_usage")
+def get_api_usage(day):
+    """Returns {api: units} used on a day (YYYY-MM-DD)."""
+    rows = get_connection().execute("SELECT api, units FROM api_usage WHERE day = ?", (day,)).fetchall()
+    return dict(rows)
+
+
+@traced("sqlite.get_experiment_documents")
+def get_experiment_documents():
+    """
+    Returns (video_id, title, publish_date, properties) for every stored video, oldest
+    first, with the properties of its latest cached Notion experiment page (descriptors,
+    hypothesis, script, ...) or None if it has none.
+    """
+    # The unary + drops video_id's TEXT affinity, which would otherwise be applied to the
+    # json_extract side and keep SQLite from using idx_notion_pages_video
+    rows = get_connection().execute("""
+        SELECT v.video_id, v.title, v.publish_date,
+            (SELECT n.properties FROM notion_pages n
+             WHERE json_extract(n.properties, '$.video_id') = +v.video_id
+             ORDER BY n.last_edited_time DESC LIMIT 1)
+        FROM video_stats v
+        ORDER BY v.publish_date
+    """).fetchall()
+    current_span().set("rows", len(rows))
+    return [(video_id, title, publish_date, json.loads(properties) if properties else None) for video_id, title, publish_date, properties in rows]
+
+@traced("sqlite.get_experiment_documents_state")
+def get_experiment_documents_state():
+    """
+    Returns a cheap fingerprint of what get_experiment_documents would return: video and
+    Notion page counts with the latest publish and edit times.
+    """
+    return list(get_connection().execute("""
+        SELECT (SELECT COUNT(*) FROM video_stats), (SELECT MAX(publish_date) FROM video_stats),
+            (SELECT COUNT(*) FROM notion_pages), (SELECT MAX(last_edited_time) FROM notion_pages)
+    """).fetchone())
+
+@traced("sqlite.get_script_ranking")
+def get_script_ranking(video_id, script_hash):
+    """Returns the cached [sentence index, tokens] ranking of a video's script, or None if the script changed."""
+    row = get_connection().execute(
+        "SELECT ranking FROM script_rankings WHERE video_id = ? AND script_hash = ?",
+        (video_id, script_hash),
+    ).fetchone()
+    return json.loads(row[0]) if row else None
 
-# Initialize the database when the module is imported
-init_db()
+@traced("sqlite.store_script_ranking")
+def store_script_ranking(video_id, script_hash, ranking):
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO script_rankings (video_id, script_hash, ranking) VALUES (?, ?, ?)",
+            (video_id, script_hash, json.dumps(ranking)),
+        )
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+import asyncio
+import threading
+import time
+import uuid
+
+# Finished jobs kept for the history view; the oldest are dropped beyond this
+MAX_JOB_HISTORY = 200
+
+class Job:
+  """
+  One analysis submitted to a JobRunner. Progress events from main.main are folded
+  into stage statuses and report blocks as they arrive; read it through snapshot().
+  """
+
+  def __init__(self, job_id: str, params: dict):
+    self.id = job_id
+    self.params = params
+    self.status = "queued"
+    self.submitted_at = time.time()
+    self.started_at = None
+    self.finished_at = None
+    self.stages = {}
+    self.blocks = []
+    self.first_content = None
+    self.result = None
+    self.error = None
+    self._lock = threading.Lock()
+
+  def on_progress(self, event: str, data: dict):
+    with self._lock:
+      if event == "stages":
+        self.stages = {name: "pending" for name in data["names"]}
+      elif event == "stage":
+        self.stages[data["name"]] = data["status"]
+      elif event == "report_blocks":
+        self.blocks.extend(data["blocks"])
+      elif event == "first_content":
+        self.first_content = data["seconds"]
+
+  def _update(self, **fields):
+    with self._lock:
+      for name, value in fields.items():
+        setattr(self, name, value)
+
+  def snapshot(self):
+    """Returns a consistent copy of the job's state as a dict."""
+    with self._lock:
+      return {
+        "id": self.id,
+        "params": dict(self.params),
+        "status": self.status,
+        "submitted_at": self.submitted_at,
+        "started_at": self.started_at,
+        "finished_at": self.finished_at,
+        "stages": dict(self.stages),
+        "blocks": list(self.blocks),
+        "first_content": self.first_content,
+        "result": self.result,
+        "error": self.error,
+      }
+
+class JobRunner:
+  """
+  Runs analyses in the background so callers (e.g. Streamlit script runs) never block
+  on them. Jobs run as tasks on one event loop in a daemon thread, at most
+  max_concurrent at a time, sharing the per-service `limits` (see batch.py).
+  Safe to share between threads and sessions.
+  """
+
+  def __init__(self, max_concurrent: int = 4, limits: dict = None, max_history: int = MAX_JOB_HISTORY):
+    self.limits = limits
+    self.max_history = max_history
+    self._jobs = OrderedDict()
+    self._lock = threading.Lock()
+    self._loop = asyncio.new_event_loop()
+    self._slots = asyncio.Semaphore(max_concurrent)
+    self._thread = threading.Thread(target=self._loop.run_forever, name="analysis-jobs", daemon=True)
+    self._thread.start()
+
+  def submit(self, notion_id: str, period: str, **options):
+    """Queues an analysis with main.main's options and returns its job ID."""
+    job = Job(uuid.uuid4().hex[:12], {"notion_id": notion_id, "period": period, **options})
+    with self._lock:
+      self._jobs[job.id] = job
+      self._trim()
+    asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+    return job.id
+
+  async def _run(self, job: Job):
+    # Imported here so creating a runner (e.g. when the app starts) stays cheap
+    from main import main
+
+    async with self._slots:
+      job._update(status="running", started_at=time.time())
+      try:
+        result = await main(**job.params, limits=self.limits, on_progress=job.on_progress)
+        job._update(status="done", result=result)
+      except Exception as e:
+        job._update(status="failed", error=f"{type(e).__name__}: {e}")
+      finally:
+        job._update(finished_at=time.time())
+
+  def _trim(self):
+    finished = [job_id for job_id, job in self._jobs.items() if job.status in ("done", "failed")]
+    for job_id in finished[:max(0, len(self._jobs) - self.max_history)]:
+      del self._jobs[job_id]
+
+  def get(self, job_id: str):
+    """Returns a snapshot of a job, or None if it is unknown or was dropped from history."""
+    with self._lock:
+      job = self._jobs.get(job_id)
+    return job.snapshot() if job else None
+
+  def jobs(self, job_ids: list[str] = None):
+    """Returns snapshots of the given jobs (default: all kept jobs), newest first."""
+    with self._lock:
+      selected = [self._jobs[job_id] for job_id in (job_ids if job_ids is not None else self._jobs) if job_id in self._jobs]
+    return sorted((job.snapshot() for job in selected), key=lambda job: job["submitted_at"], reverse=True)
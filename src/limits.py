@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+class TokenBucket:
+  """
+  Token-bucket rate limiter allowing `rate` acquisitions per second with bursts of up
+  to `capacity`. Usable from threads (acquire) and coroutines (acquire_async).
+  """
+
+  def __init__(self, rate: float, capacity: float = None):
+    self.rate = rate
+    self.capacity = capacity or max(1.0, rate)
+    self._tokens = self.capacity
+    self._updated = time.monotonic()
+    self._lock = threading.Lock()
+
+  def _reserve(self):
+    """Takes a token and returns how many seconds the caller must wait before using it."""
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+      self._updated = now
+      self._tokens -= 1
+      return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+  def acquire(self):
+    wait = self._reserve()
+    if wait > 0:
+      time.sleep(wait)
+
+  async def acquire_async(self):
+    wait = self._reserve()
+    if wait > 0:
+      await asyncio.sleep(wait)
+
+class ServiceLimiter:
+  """
+  Async context manager bounding calls to one external service: at most `concurrency`
+  calls in flight and at most `rate` calls started per second (bursts up to `burst`).
+  Either limit can be None to disable it.
+  """
+
+  def __init__(self, name: str, concurrency: int = None, rate: float = None, burst: float = None):
+    self.name = name
+    self._semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    self.bucket = TokenBucket(rate, burst) if rate else None
+
+  async def __aenter__(self):
+    if self._semaphore:
+      await self._semaphore.acquire()
+    try:
+      if self.bucket:
+        await self.bucket.acquire_async()
+    except BaseException:
+      if self._semaphore:
+        self._semaphore.release()
+      raise
+    return self
+
+  async def __aexit__(self, exc_type, exc, tb):
+    if self._semaphore:
+      self._semaphore.release()
+
+_UNLIMITED = ServiceLimiter("unlimited")
+
+def limiter_for(limits: dict, service: str):
+  """Returns the limiter for a service, or a no-op limiter if none is configured."""
+  return (limits or {}).get(service) or _UNLIMITED
\ No newline at end of file
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+
+# Entries older than this are treated as misses and removed
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+# Least recently used entries are evicted beyond this many
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+
+# Set LLM_CACHE_BYPASS=1 to always call the model (results are still stored)
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+def cache_key(model: str, instructions: str, input: str, output_schema) -> str:
+  """Returns the content address of an agent call."""
+  payload = json.dumps({
+    "model": model,
+    "instructions": instructions,
+    "input": input,
+    "output_schema": output_schema,
+  }, sort_keys=True, default=str)
+  return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+  """
+  On-disk, content-addressed cache of agent outputs backed by SQLite, with a TTL and
+  size-bounded LRU eviction. Values are stored as JSON text. Safe to share across threads.
+  """
+
+  def __init__(self, path: str = LLM_CACHE_PATH, ttl: float = LLM_CACHE_TTL_SECONDS, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+    self.path = path
+    self.ttl = ttl
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._conn = None
+    self.metrics = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+  def _connection(self):
+    if self._conn is None:
+      self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+      self._conn.execute("PRAGMA journal_mode = WAL")
+      self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_cache (
+          key TEXT PRIMARY KEY,
+          value TEXT NOT NULL,
+          created_at REAL NOT NULL,
+          last_used REAL NOT NULL
+        )
+      """)
+      self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+      self._conn.commit()
+    return self._conn
+
+  def get(self, key: str):
+    """Returns the cached JSON text for key, or None on a miss."""
+    now = time.time()
+    with self._lock:
+      conn = self._connection()
+      row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+      if row is not None and now - row[1] > self.ttl:
+        conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        conn.commit()
+        row = None
+      if row is None:
+        self.metrics["misses"] += 1
+        return None
+      conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+      conn.commit()
+      self.metrics["hits"] += 1
+      return row[0]
+
+  def put(self, key: str, value: str):
+    now = time.time()
+    with self._lock:
+      conn = self._connection()
+      conn.execute(
+        "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+        (key, value, now, now),
+      )
+      evicted = conn.execute("""
+        DELETE FROM llm_cache WHERE key IN (
+          SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+        )
+      """, (self.max_entries,)).rowcount
+      conn.commit()
+      self.metrics["writes"] += 1
+      self.metrics["evictions"] += evicted
+
+  def clear(self):
+    with self._lock:
+      conn = self._connection()
+      conn.execute("DELETE FROM llm_cache")
+      conn.commit()
+
+  def stats(self):
+    """Returns hit/miss/write/eviction counts and the hit rate for this process."""
+    with self._lock:
+      metrics = dict(self.metrics)
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics["hit_rate"] = round(metrics["hits"] / lookups, 3) if lookups else None
+    return metrics
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache():
+  """Returns the process-wide LLMCache, creating it on first use."""
+  global _cache
+  if _cache is None:
+    with _cache_lock:
+      if _cache is None:
+        _cache = LLMCache()
+  return _cache
\ No newline at end of file
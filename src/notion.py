@@ -1,40 +1,172 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 from typing import Optional, Union
-from agents import AgentOutputSchema
 from pydantic import BaseModel
 import os
 from dotenv import load_dotenv
 from typing import Literal
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
 import json
+import logging
+import random
+import threading
+import time
+import uuid
+
+from src.limits import TokenBucket
+from src.telemetry import span
+from src.db import get_cached_notion_page, store_cached_notion_pages, get_notion_database_sync_state, mark_notion_database_validated, get_notion_write_progress, store_notion_write_progress
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 NOTION_API_KEY = os.getenv("NOTION_API_KEY")
 
-class NotionBlock(BaseModel):
-  type: Literal["paragraph", "heading1", "heading_2", "numbered_list_item"]
-  text: str
+NOTION_API_BASE = "https://api.notion.com/v1"
 
-def notion_get_video_properties(notion_id: str):
+# Notion allows an average of 3 requests per second per integration
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", 3))
 
-  api_url = f"https://api.notion.com/v1/pages/{notion_id}"
+# Statuses worth retrying: rate limited, conflicts and transient server errors
+RETRY_STATUSES = {409, 429, 500, 502, 503, 504}
 
-  request = requests.get(api_url, headers={
-    "Authorization": f"Bearer {NOTION_API_KEY}",
-    "Notion-Version": "2022-02-22"
-  })
+# Statuses retried for requests that are not idempotent, e.g. appending blocks: only
+# rate limiting guarantees Notion rejected the request before applying it
+NON_IDEMPOTENT_RETRY_STATUSES = {429}
 
-  if request.status_code != 200:
-    print("Failed to retrieve video properties.")
-    return {}
+def _never_sent(error: Exception):
+  # Failing to connect means the request never reached Notion; a timeout or reset after
+  # that leaves it unknown whether it was applied
+  if isinstance(error, requests.ConnectTimeout):
+    return True
+  reason = getattr(error.args[0], "reason", None) if error.args else None
+  return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+class NotionClient:
+  """
+  Process-wide Notion API client. Shares one keep-alive session, paces requests with a
+  token bucket, retries rate-limited and transient failures with jittered exponential
+  backoff (honouring Retry-After), and keeps per-endpoint latency/retry metrics.
+  Safe to use from multiple threads; use arequest from async code.
+  """
+
+  def __init__(self, rate: float = NOTION_RATE_LIMIT, max_retries: int = 5, backoff: float = 0.5, max_backoff: float = 30.0, timeout: float = 30.0):
+    self.session = requests.Session()
+    self.session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    self.bucket = TokenBucket(rate, rate)
+    self.max_retries = max_retries
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.timeout = timeout
+    self._lock = threading.Lock()
+    self._metrics = {}
+
+  def _retry_delay(self, attempt: int, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+      try:
+        return float(retry_after)
+      except ValueError:
+        pass
+    # Full jitter: anywhere up to the exponential backoff for this attempt
+    return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+  def _record(self, endpoint: str, seconds: float, retries: int, ok: bool):
+    with self._lock:
+      m = self._metrics.setdefault(endpoint, {"calls": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+      m["calls"] += 1
+      m["retries"] += retries
+      m["total_seconds"] += seconds
+      m["max_seconds"] = max(m["max_seconds"], seconds)
+      if not ok:
+        m["errors"] += 1
+
+  def request(self, method: str, path: str, endpoint: str = None, notion_version: str = "2022-06-28", idempotent: bool = True, **kwargs):
+    """
+    Sends a request to NOTION_API_BASE + path and returns the final response.
+    `endpoint` labels the metrics (e.g. "PATCH /blocks/{id}/children"); defaults to the path.
+    Network errors are retried like 5xx responses and re-raised once retries run out.
+    With idempotent=False (e.g. appending blocks) only requests Notion certainly did not
+    apply are retried: 429 responses and connections that could not be opened.
+    """
+    headers = {
+      "Authorization": f"Bearer {NOTION_API_KEY}",
+      "Notion-Version": notion_version,
+    }
+    if "json" in kwargs:
+      headers["Content-Type"] = "application/json"
+
+    endpoint = endpoint or f"{method} {path}"
+    retry_statuses = RETRY_STATUSES if idempotent else NON_IDEMPOTENT_RETRY_STATUSES
+    with span("notion.request", kind="client", endpoint=endpoint) as s:
+      started = time.perf_counter()
+      attempt = 0
+      while True:
+        self.bucket.acquire()
+        response = None
+        try:
+          response = self.session.request(method, NOTION_API_BASE + path, headers=headers, timeout=self.timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+          if attempt >= self.max_retries or not (idempotent or _never_sent(e)):
+            self._record(endpoint, time.perf_counter() - started, attempt, False)
+            s.set("retries", attempt)
+            raise
+        if response is not None and (response.status_code not in retry_statuses or attempt >= self.max_retries):
+          self._record(endpoint, time.perf_counter() - started, attempt, response.ok)
+          s.set("status", response.status_code)
+          s.set("retries", attempt)
+          s.set("bytes_sent", len(response.request.body or b""))
+          s.set("bytes_received", len(response.content))
+          return response
+        logger.debug("Notion %s returned %s, retrying", endpoint, response.status_code if response is not None else "a network error")
+        time.sleep(self._retry_delay(attempt, response))
+        attempt += 1
+
+  async def arequest(self, method: str, path: str, **kwargs):
+    """Async variant of request; runs in a worker thread so the event loop is never blocked."""
+    return await asyncio.to_thread(self.request, method, path, **kwargs)
+
+  def metrics(self):
+    """Returns {endpoint: {calls, errors, retries, total_seconds, max_seconds, avg_ms}}."""
+    with self._lock:
+      metrics = {endpoint: dict(m) for endpoint, m in self._metrics.items()}
+    for m in metrics.values():
+      m["avg_ms"] = round(m["total_seconds"] / m["calls"] * 1000, 1) if m["calls"] else None
+    return metrics
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_notion_client():
+  """Returns the process-wide NotionClient, creating it on first use."""
+  global _client
+  if _client is None:
+    with _client_lock:
+      if _client is None:
+        _client = NotionClient()
+  return _client
 
-  data = request.json()
+class NotionBlock(BaseModel):
+  type: Literal["paragraph", "heading1", "heading_2", "numbered_list_item"]
+  text: str
 
-  print("Notion API Response:", json.dumps(data, indent=2))
+def _normalize_page_id(page_id: str):
+  # Page IDs may be given with or without hyphens; the API always returns them hyphenated
+  try:
+    return str(uuid.UUID(page_id))
+  except ValueError:
+    return page_id
+
+def _parse_video_properties(data: dict):
 
   props = data.get("properties", {})
 
-  print("Props:", json.dumps(props, indent=2))
+  if logger.isEnabledFor(logging.DEBUG):
+    logger.debug("Props: %s", json.dumps(props, indent=2))
 
   def get_rich_text(prop):
     val = props.get(prop, {}).get("rich_text", [])
@@ -61,19 +193,130 @@ def notion_get_video_properties(notion_id: str):
     "script": get_rich_text("Script"),
   }
 
+def notion_get_video_properties(notion_id: str, max_age: float = 0):
+  """
+  Returns the parsed experiment properties of a Notion page.
+  A cached copy is used if it was validated within the last max_age seconds, e.g. by
+  notion_sync_database; otherwise the page is fetched and the cache updated.
+  """
+
+  page_id = _normalize_page_id(notion_id)
+
+  cached = get_cached_notion_page(page_id)
+  if cached is not None and time.time() - cached[2] <= max_age:
+    return cached[0]
+
+  request = get_notion_client().request("GET", f"/pages/{notion_id}", endpoint="GET /pages/{id}", notion_version="2022-02-22")
+
+  if request.status_code != 200:
+    logger.error("Failed to retrieve video properties of %s (%s): %s", notion_id, request.status_code, request.text)
+    return {}
+
+  data = request.json()
+
+  if logger.isEnabledFor(logging.DEBUG):
+    logger.debug("Notion API Response: %s", json.dumps(data, indent=2))
+
+  properties = _parse_video_properties(data)
+  store_cached_notion_pages([(page_id, data.get("last_edited_time"), properties)])
+
+  return properties
+
+def _query_database_pages(database_id: str, filter: dict = None):
+  """Yields every page object a database query returns, following pagination."""
+
+  client = get_notion_client()
+
+  data = {"page_size": 100}
+  if filter:
+    data["filter"] = filter
+
+  while True:
+    response = client.request("POST", f"/databases/{database_id}/query", endpoint="POST /databases/{id}/query", json=data)
+
+    if response.status_code != 200:
+      raise RuntimeError(f"Failed to query Notion database ({response.status_code}): {response.text}")
+
+    body = response.json()
+    yield from body.get("results", [])
+
+    if not body.get("has_more"):
+      return
+
+    data["start_cursor"] = body.get("next_cursor")
+
+def notion_query_database(database_id: str):
+  """
+  Returns the IDs of every page in a Notion database, following pagination.
+  """
+
+  try:
+    return [page["id"] for page in _query_database_pages(database_id)]
+  except RuntimeError as e:
+    logger.error("Failed to query Notion database: %s", e)
+    return []
+
+def notion_sync_database(database_id: str, full: bool = False):
+  """
+  Brings the page-properties cache up to date for a whole database and returns its page IDs.
+
+  Pages come back from the database query 100 at a time with their properties, so no
+  per-page fetches are needed. Incremental syncs only ask for pages edited since the
+  newest cached last_edited_time; a full sync lists every page and also drops pages
+  that were removed from the database.
+  """
+
+  database_id = _normalize_page_id(database_id)
+  since = None if full else get_notion_database_sync_state(database_id)
+
+  # Notion rounds last_edited_time to the minute, so re-read pages from that minute onwards
+  filter = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": since}} if since else None
+
+  pages = [page for page in _query_database_pages(database_id, filter) if not page.get("archived")]
+  store_cached_notion_pages([(page["id"], page.get("last_edited_time"), _parse_video_properties(page)) for page in pages], database_id)
+
+  logger.info("Synced %d changed Notion pages from database %s.", len(pages), database_id)
+
+  return mark_notion_database_validated(database_id, [page["id"] for page in pages] if full or since is None else None)
+
+# Notion request limits for appending children
+MAX_CHILDREN_PER_REQUEST = 100
+
+# Notion rejects request bodies over 500KB; batches stay under this, leaving room for the wrapper
+MAX_REQUEST_BYTES = 480_000
+MAX_RICH_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+
+# Longer text is spread over several blocks of the same type
+MAX_BLOCK_TEXT_LENGTH = MAX_RICH_TEXT_LENGTH * MAX_RICH_TEXT_ITEMS
+
+def _split_text(text: str, limit: int):
+  """Splits text into pieces of at most limit characters, preferring to break at whitespace."""
+  pieces = []
+  while len(text) > limit:
+    cut = text.rfind(" ", 0, limit + 1)
+    if cut <= 0:
+      cut = limit
+    pieces.append(text[:cut])
+    text = text[cut:]
+  pieces.append(text)
+  return pieces
+
+def _rich_text(text: str):
+  return [{"type": "text", "text": {"content": piece}} for piece in _split_text(text, MAX_RICH_TEXT_LENGTH)]
 
 def convert_json_to_notion_blocks(content_blocks: list[NotionBlock]) -> list[dict]:
 
   notion_blocks = []
 
-  for item in content_blocks.blocks:
+  for item, text in ((item, text) for item in content_blocks.blocks for text in _split_text(item.text, MAX_BLOCK_TEXT_LENGTH)):
 
     if item.type == "paragraph":
       notion_blocks.append({
         "object": "block",
         "type": "paragraph",
         "paragraph": {
-          "rich_text": [{"type": "text", "text": {"content": item.text}}]
+          "rich_text": _rich_text(text)
         }
       })
     elif item.type == "heading_1":
@@ -81,7 +324,7 @@ def convert_json_to_notion_blocks(content_blocks: list[NotionBlock]) -> list[dic
         "object": "block",
         "type": "heading_1",
         "heading_1": {
-          "rich_text": [{"type": "text", "text": {"content": item.text}}]
+          "rich_text": _rich_text(text)
         }
       })
     elif item.type == "heading_2":
@@ -89,7 +332,7 @@ def convert_json_to_notion_blocks(content_blocks: list[NotionBlock]) -> list[dic
         "object": "block",
         "type": "heading_2",
         "heading_2": {
-          "rich_text": [{"type": "text", "text": {"content": item.text}}]
+          "rich_text": _rich_text(text)
         }
       })
     elif item.type == "heading_3":
@@ -97,49 +340,119 @@ def convert_json_to_notion_blocks(content_blocks: list[NotionBlock]) -> list[dic
         "object": "block",
         "type": "heading_3",
         "heading_3": {
-          "rich_text": [{"type": "text", "text": {"content": item.text}}]
+          "rich_text": _rich_text(text)
         }
       })
 
   return notion_blocks
 
-def notion_send_report(parent_id: str, content_blocks: dict):
-
-  notion_blocks = convert_json_to_notion_blocks(content_blocks)
+class NotionWriteError(Exception):
+  """Raised when a batch of blocks could not be appended; `acknowledged` blocks were written."""
+
+  def __init__(self, message: str, acknowledged: int):
+    super().__init__(message)
+    self.acknowledged = acknowledged
+
+class NotionBlockWriter:
+  """
+  Appends any number of blocks to a page in batches of at most MAX_CHILDREN_PER_REQUEST
+  blocks and MAX_REQUEST_BYTES of JSON. Batches for one page are sent in order, since each
+  is appended after the last; writes to different pages are independent and run
+  concurrently in write_many.
+
+  Progress is saved per (page, blocks) in the database as each batch is acknowledged, so
+  writing the same report again after a failure, even from another process, resumes from
+  the last acknowledged block instead of duplicating content.
+  """
+
+  def __init__(self, client: NotionClient = None, batch_size: int = MAX_CHILDREN_PER_REQUEST, max_bytes: int = MAX_REQUEST_BYTES):
+    self.client = client
+    self.batch_size = min(batch_size, MAX_CHILDREN_PER_REQUEST)
+    self.max_bytes = min(max_bytes, MAX_REQUEST_BYTES)
+
+  def _hash(self, notion_blocks: list[dict]):
+    return hashlib.sha256(json.dumps(notion_blocks, sort_keys=True).encode("utf-8")).hexdigest()
+
+  def batches(self, notion_blocks: list[dict], start: int = 0):
+    """Yields (start, batch) for the requests appending notion_blocks[start:]."""
+    batch, size = [], 0
+    for block in notion_blocks[start:]:
+      # Serialized as requests does (ASCII-escaped), plus the separating comma
+      block_size = len(json.dumps(block)) + 1
+      if batch and (len(batch) == self.batch_size or size + block_size > self.max_bytes):
+        yield start, batch
+        start += len(batch)
+        batch, size = [], 0
+      batch.append(block)
+      size += block_size
+    if batch:
+      yield start, batch
+
+  def write(self, parent_id: str, notion_blocks: list[dict], start: int = None):
+    """
+    Appends notion_blocks[start:] to parent_id and returns the number of blocks written.
+    Without `start`, resumes after whatever a previous failed write acknowledged.
+    Raises NotionWriteError if a batch still fails after the client's retries.
+    """
+    client = self.client or get_notion_client()
+    blocks_hash = self._hash(notion_blocks)
+    acknowledged = get_notion_write_progress(parent_id, blocks_hash) if start is None else start
+
+    for acknowledged, batch in self.batches(notion_blocks, acknowledged):
+      try:
+        response = client.request("PATCH", f"/blocks/{parent_id}/children", endpoint="PATCH /blocks/{id}/children", idempotent=False, json={"children": batch})
+      except requests.RequestException as e:
+        raise NotionWriteError(f"Blocks {acknowledged}-{acknowledged + len(batch) - 1} may not have been appended: {e}", acknowledged) from e
+      if response.status_code != 200:
+        raise NotionWriteError(f"Failed to append blocks {acknowledged}-{acknowledged + len(batch) - 1} ({response.status_code}): {response.text}", acknowledged)
+      if acknowledged + len(batch) < len(notion_blocks):
+        store_notion_write_progress(parent_id, blocks_hash, acknowledged + len(batch))
+
+    store_notion_write_progress(parent_id, blocks_hash, None)
+    return len(notion_blocks)
+
+  def write_many(self, reports: dict, max_workers: int = 3):
+    """
+    Writes {parent_id: notion_blocks} concurrently, one worker per page.
+    Returns {parent_id: blocks written or the NotionWriteError raised}.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+      futures = {parent_id: pool.submit(self.write, parent_id, blocks) for parent_id, blocks in reports.items()}
+    results = {}
+    for parent_id, future in futures.items():
+      try:
+        results[parent_id] = future.result()
+      except NotionWriteError as e:
+        results[parent_id] = e
+    return results
+
+_writer = NotionBlockWriter()
+
+def notion_append_blocks(parent_id: str, notion_blocks: list[dict]):
+
+  # Append new blocks to the existing page, in as many requests as Notion's limits require
+  try:
+    _writer.write(parent_id, notion_blocks)
+    return True
+  except NotionWriteError as e:
+    logger.error("Failed to append blocks to Notion: %s", e)
+    return False
 
-  headers = {
-    "Authorization": f"Bearer {NOTION_API_KEY}",
-    "Content-Type": "application/json",
-    "Notion-Version": "2022-06-28"
-  }
 
-  # Get existing blocks from the page
-  page_url = f"https://api.notion.com/v1/blocks/{parent_id}/children"
-  
-  # Append new blocks to the existing page
-  data = {
-    "children": notion_blocks
-  }
+def notion_send_report(parent_id: str, content_blocks: dict):
 
-  response = requests.patch(page_url, headers=headers, json=data)
+  notion_blocks = convert_json_to_notion_blocks(content_blocks)
 
-  if response.status_code == 200:
-    print("Report added to Notion successfully.")
-    return True
-  else:
-    print("Failed to add report to Notion.")
-    print("Response:", response.json())
+  try:
+    written = _writer.write(parent_id, notion_blocks)
+  except NotionWriteError as e:
+    logger.error("Failed to add report to Notion: %s", e)
     return False
+
+  logger.info("Report added to Notion successfully (%d blocks).", written)
+  return True
   
 def notion_update_hypothesis_result(notion_id: str, hypothesis_result: str):
-  api_url = f"https://api.notion.com/v1/pages/{notion_id}"
-
-  headers = {
-    "Authorization": f"Bearer {NOTION_API_KEY}",
-    "Content-Type": "application/json",
-    "Notion-Version": "2022-06-28"
-  }
-
   data = {
     "properties": {
       "Hypothesis Result": {
@@ -150,12 +463,11 @@ def notion_update_hypothesis_result(notion_id: str, hypothesis_result: str):
     }
   }
 
-  response = requests.patch(api_url, headers=headers, json=data)
+  response = get_notion_client().request("PATCH", f"/pages/{notion_id}", endpoint="PATCH /pages/{id}", json=data)
 
   if response.status_code == 200:
-    print("Hypothesis result updated successfully.")
+    logger.info("Hypothesis result updated successfully.")
     return True
   else:
-    print("Failed to update hypothesis result.")
-    print("Response:", response.json())
+    logger.error("Failed to update hypothesis result (%s): %s", response.status_code, response.text)
     return False
\ No newline at end of file
@@ -1,14 +1,127 @@
-from agents import Agent, Runner, AgentOutputSchema
 from pydantic import BaseModel
 from typing import Literal
+from contextvars import ContextVar
+import asyncio
+import json
+import logging
+import re
+
+from src.llm_cache import get_llm_cache, cache_key, LLM_CACHE_BYPASS
+from src.prompts import build_evaluation_prompt
+from src.telemetry import span, current_span
+
+logger = logging.getLogger(__name__)
+
+# The agents SDK takes seconds to import, so it is imported by the functions that run
+# agents rather than here; importing this module stays cheap for the CLIs and the app.
+
+# Token usage accumulator for the current analysis, see track_llm_usage()
+_llm_usage: ContextVar = ContextVar("llm_usage", default=None)
+
+def track_llm_usage():
+  """
+  Starts accumulating LLM usage for the current task and any tasks it spawns.
+  Returns the dict that the agent runners add their usage to.
+  """
+  usage = {"requests": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+  _llm_usage.set(usage)
+  return usage
+
+def current_llm_usage():
+  """Returns the usage dict that track_llm_usage last started in this task, or None."""
+  return _llm_usage.get()
+
+def _record_usage(result, run_span):
+  run_usage = result.context_wrapper.usage
+  for key in ("input_tokens", "output_tokens", "total_tokens"):
+    run_span.set(key, getattr(run_usage, key, 0) or 0)
+  usage = _llm_usage.get()
+  if usage is None:
+    return
+  for key in usage:
+    usage[key] += getattr(run_usage, key, 0) or 0
+
+def _model_name(agent) -> str:
+  """
+  The model an agent actually runs on: its own model, or the SDK default (OPENAI_DEFAULT_MODEL
+  or the SDK's built-in default) when it has none, so cache keys change with the default.
+  """
+  from agents.models import get_default_model
+
+  if agent.model is None:
+    return get_default_model()
+  return agent.model if isinstance(agent.model, str) else getattr(agent.model, "model", type(agent.model).__name__)
+
+async def _run_agent(agent, input: str, use_cache: bool = True):
+  """
+  Runs an agent and returns its final output, going through the on-disk response cache.
+  The cache key covers the model, instructions, input and output schema, so any change
+  to the prompt is a miss. Cache hits spend no tokens.
+  """
+  from agents import Runner, AgentOutputSchema
+
+  schema = agent.output_type.json_schema() if isinstance(agent.output_type, AgentOutputSchema) else None
+  model = _model_name(agent)
+  key = cache_key(model, agent.instructions, input, schema)
+  cache = get_llm_cache()
+
+  with span("llm.run", kind="client", agent=agent.name, model=model) as s:
+    if use_cache and not LLM_CACHE_BYPASS:
+      cached = cache.get(key)
+      if cached is not None:
+        s.set("cache_hit", True)
+        value = json.loads(cached)
+        return agent.output_type.output_type.model_validate(value) if schema is not None else value
+
+    s.set("cache_hit", False)
+    result = await Runner.run(agent, input)
+    _record_usage(result, s)
+
+    output = result.final_output
+    cache.put(key, json.dumps(output.model_dump() if isinstance(output, BaseModel) else output))
+    return output
+
+async def _stream_agent(agent, input: str, use_cache: bool = True):
+  """
+  Runs a plain-text agent with streamed output, yielding text deltas as they arrive.
+  Shares cache entries with _run_agent; a cache hit yields the whole text at once.
+  """
+  from agents import Runner
+  from openai.types.responses import ResponseTextDeltaEvent
+
+  model = _model_name(agent)
+  key = cache_key(model, agent.instructions, input, None)
+  cache = get_llm_cache()
+
+  with span("llm.stream", kind="client", agent=agent.name, model=model) as s:
+    if use_cache and not LLM_CACHE_BYPASS:
+      cached = cache.get(key)
+      if cached is not None:
+        s.set("cache_hit", True)
+        yield json.loads(cached)
+        return
+
+    s.set("cache_hit", False)
+    result = Runner.run_streamed(agent, input)
+    async for event in result.stream_events():
+      if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+        yield event.data.delta
+    _record_usage(result, s)
+
+    cache.put(key, json.dumps(result.final_output))
 
 class EvaluationResult(BaseModel):
   evaluation: str
   hypothesis_result: str
 
-async def run_evaluation_agent(period, stats, baseline, descriptors: list[str], hypothesis: str, video_script: str):
+async def run_evaluation_agent(period, stats, baseline, descriptors: list[str], hypothesis: str, video_script: str, use_cache: bool = True,
+                               history: list = None, video_id: str = None, token_budget: int = None):
+    # The prompt is kept within token_budget (default EVAL_PROMPT_TOKEN_BUDGET) by
+    # src.prompts.build_evaluation_prompt: `history` lists similar past videos
+    # (see similarity.find_similar_videos) and the script is compressed, cached under video_id.
+    from agents import Agent, AgentOutputSchema
 
-    print("Running evaluation agent...")
+    logger.info("Running evaluation agent...")
 
     baseline_metrics = {
       "views": baseline.get(f"views_{period}"),
@@ -28,51 +141,13 @@ async def run_evaluation_agent(period, stats, baseline, descriptors: list[str],
       "subs_gained": stats.get(f"subs_gained_{period}"),
     }
 
-    print("Current Metrics:")
-    for key, value in current_metrics.items():
-      print(f"  {key}: {value}")
+    logger.debug("Current metrics: %s", current_metrics)
 
-    formatted_descriptors = "\n".join(
-      [f"      <descriptor>{value}</descriptor>" for value in descriptors]
+    prompt, input, tokens = await asyncio.to_thread(
+      build_evaluation_prompt, period, current_metrics, baseline_metrics, descriptors, hypothesis, video_script,
+      history=history, video_id=video_id, budget=token_budget,
     )
-
-    prompt = f"""
-    <evaluation>
-      <instructions>
-        You are a creative performance analyst for short-form video content.
-
-        Your goals:
-        1. Compare the current video’s metrics against baseline and past video history.
-        2. Identify patterns across history (e.g., script style, hook type, face presence) that correlate with better or worse outcomes.
-        3. Evaluate whether the hypothesis tested in the current video led to a positive, neutral, or negative outcome.
-        4. Provide actionable recommendations for the next iteration.
-        5. Output a final determination on the success of the Hypothesis ("Success", "Failure", "Neutral")
-
-        Always structure your response strictly inside the <report> XML schema.
-      </instructions>
-
-      <data>
-        <baselines>
-          <views>{baseline_metrics['views']}</views>
-          <likes>{baseline_metrics['likes']}</likes>
-          <comments>{baseline_metrics['comments']}</comments>
-          <average_view_duration>{baseline_metrics['average_view_duration']}</average_view_duration>
-          <average_percentage_viewed>{baseline_metrics['average_percentage_viewed']}</average_percentage_viewed>
-          <subs_gained>{baseline_metrics['subs_gained']}</subs_gained>
-        </baselines>
-      </data>
-
-      <response>
-        <report>
-          <what_went_well></what_went_well>
-          <what_didnt_go_well></what_didnt_go_well>
-          <test_result></test_result>
-          <comparative_patterns></comparative_patterns>
-          <suggestions></suggestions>
-        </report>
-      </response>
-    </evaluation>
-    """
+    current_span().set("prompt_tokens", tokens["total"])
 
     agent = Agent(
       name="Content Analysis Agent",
@@ -80,31 +155,16 @@ async def run_evaluation_agent(period, stats, baseline, descriptors: list[str],
       output_type=AgentOutputSchema(EvaluationResult, strict_json_schema=True),
     )
 
-    input = f"""<current_video>
-      <views>{current_metrics['views']}</views>
-      <likes>{current_metrics['likes']}</likes>
-      <comments>{current_metrics['comments']}</comments>
-      <average_view_duration>{current_metrics['average_view_duration']}</average_view_duration>
-      <average_percentage_viewed>{current_metrics['average_percentage_viewed']}</average_percentage_viewed>
-      <subs_gained>{current_metrics['subs_gained']}</subs_gained>
-    </current_video>
-    <hypothesis>{hypothesis}</hypothesis>
-    <descriptors>
-      {formatted_descriptors}
-    </descriptors>
-    <script>{video_script}</script>
-    """
+    result = await _run_agent(agent, input, use_cache)
 
-    result = await Runner.run(agent, input)
+    logger.debug("Evaluation report: %s", result)
 
-    print("Evaluation Report:")
-    print(result)
+    return result
 
-    return result.final_output
+def _report_agent():
+  from agents import Agent
 
-async def run_report_agent(evaluation: str):
-  
-  report_agent = Agent(
+  return Agent(
     name="Report Writer Agent",
     instructions=f"""
       <background>
@@ -120,12 +180,13 @@ async def run_report_agent(evaluation: str):
     model="gpt-4o-mini",
   )
 
-  result = await Runner.run(report_agent, evaluation)
+async def run_report_agent(evaluation: str, use_cache: bool = True):
+
+  result = await _run_agent(_report_agent(), evaluation, use_cache)
 
-  print("Report Result:")
-  print(result)
+  logger.debug("Report result: %s", result)
 
-  return result.final_output
+  return result
 
 class NotionBlock(BaseModel):
   type: Literal["paragraph", "heading1", "heading_2", "link_preview", "image", "numbered_list_item"]
@@ -134,7 +195,8 @@ class NotionBlock(BaseModel):
 class NotionBlocks(BaseModel):
   blocks: list[NotionBlock]
 
-async def run_text_to_json_agent(text: str) -> dict:
+async def run_text_to_json_agent(text: str, use_cache: bool = True) -> dict:
+  from agents import Agent, AgentOutputSchema
 
   text_to_json_writer = Agent(
     name="Text to JSON Content Formatter",
@@ -150,9 +212,89 @@ async def run_text_to_json_agent(text: str) -> dict:
     model="gpt-4o-mini",
   )
 
-  result = await Runner.run(text_to_json_writer, text)
+  result = await _run_agent(text_to_json_writer, text, use_cache)
+
+  logger.debug("Text to JSON result: %s", result)
+
+  return result
+
+# Sections of the evaluation agent's <report> schema, in report order
+REPORT_SECTIONS = [
+  ("what_went_well", "What Went Well"),
+  ("what_didnt_go_well", "What Didn't Go Well"),
+  ("test_result", "Test Result"),
+  ("comparative_patterns", "Comparative Patterns"),
+  ("suggestions", "Suggestions"),
+]
+
+def _paragraph_blocks(text: str) -> list[NotionBlock]:
+  paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+  return [NotionBlock(type="paragraph", text=p) for p in paragraphs]
+
+def build_report_blocks(evaluation: EvaluationResult) -> NotionBlocks:
+  """
+  Builds the Notion report straight from the evaluation agent's output, without the
+  report writer and text-to-JSON agents. Each <report> section becomes a heading and
+  its paragraphs; an evaluation without those tags is split into paragraphs as-is.
+  """
+  blocks = [NotionBlock(type="heading_2", text=f"Hypothesis Result: {evaluation.hypothesis_result}")]
+
+  found = False
+  for tag, title in REPORT_SECTIONS:
+    match = re.search(rf"<{tag}>(.*?)</{tag}>", evaluation.evaluation, re.DOTALL)
+    if match and match.group(1).strip():
+      found = True
+      blocks.append(NotionBlock(type="heading_2", text=title))
+      blocks.extend(_paragraph_blocks(match.group(1)))
+
+  if not found:
+    blocks.extend(_paragraph_blocks(evaluation.evaluation))
+
+  return NotionBlocks(blocks=blocks)
+
+async def stream_report_agent(evaluation: str, use_cache: bool = True):
+  """Runs the report writer agent, yielding the report text as it is generated."""
+  async for delta in _stream_agent(_report_agent(), evaluation, use_cache):
+    yield delta
+
+class ReportBlockStreamer:
+  """
+  Groups streamed report text into NotionBlocks as each one completes: markdown
+  headings (or lines that are entirely bold) become heading_2 blocks, and paragraphs
+  end at a blank line or the next heading.
+  """
+
+  def __init__(self):
+    self._partial_line = ""
+    self._paragraph = []
+
+  def _end_paragraph(self):
+    blocks = []
+    if self._paragraph:
+      blocks.append(NotionBlock(type="paragraph", text=" ".join(self._paragraph)))
+      self._paragraph = []
+    return blocks
+
+  def _line(self, line: str):
+    line = line.strip()
+    if not line:
+      return self._end_paragraph()
+    heading = re.fullmatch(r"#{1,6}\s+(.*)|\*\*(.+)\*\*:?", line)
+    if heading:
+      return self._end_paragraph() + [NotionBlock(type="heading_2", text=(heading.group(1) or heading.group(2)).strip())]
+    self._paragraph.append(line)
+    return []
 
-  print("Text to JSON Result:")
-  print(result)
+  def feed(self, text: str) -> list[NotionBlock]:
+    """Adds streamed text and returns any blocks it completed."""
+    *lines, self._partial_line = (self._partial_line + text).split("\n")
+    blocks = []
+    for line in lines:
+      blocks.extend(self._line(line))
+    return blocks
 
-  return result.final_output
\ No newline at end of file
+  def flush(self) -> list[NotionBlock]:
+    """Returns the blocks still pending once the stream has ended."""
+    blocks = self._line(self._partial_line)
+    self._partial_line = ""
+    return blocks + self._end_paragraph()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from src.telemetry import span
+
+# Pipeline variants accepted by main.main
+PIPELINE_MODES = ("full", "fast", "stream")
+
+# A stage is (dependency names, async function). The function is called with the
+# results of its dependencies as keyword arguments.
+Stage = tuple[list[str], Callable[..., Awaitable]]
+
+def _check_stages(stages: dict[str, Stage]):
+  """Raises ValueError for unknown dependencies or cycles, which would otherwise deadlock."""
+  visiting, done = set(), set()
+
+  def visit(name, path):
+    if name in done:
+      return
+    if name in visiting:
+      raise ValueError(f"Stage dependency cycle: {' -> '.join(path + [name])}")
+    visiting.add(name)
+    for dep in stages[name][0]:
+      if dep not in stages:
+        raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+      visit(dep, path + [name])
+    visiting.discard(name)
+    done.add(name)
+
+  for name in stages:
+    visit(name, [])
+
+async def run_stages(stages: dict[str, Stage], on_stage=None):
+  """
+  Runs a DAG of async stages, starting each one as soon as its dependencies finish.
+  Returns (results, timings) where timings maps each stage to (start, end) seconds
+  relative to the start of the run. If a stage fails, the remaining stages are
+  cancelled and the exception is raised.
+  `on_stage(name, status, seconds)` is called as each stage is "started", "finished"
+  or "failed", with seconds since the start of the run.
+  """
+  _check_stages(stages)
+
+  started = time.perf_counter()
+  tasks = {}
+  timings = {}
+
+  async def run(name):
+    deps, fn = stages[name]
+    kwargs = {dep: await tasks[dep] for dep in deps}
+    stage_start = time.perf_counter() - started
+    if on_stage:
+      on_stage(name, "started", stage_start)
+    try:
+      with span(f"stage.{name}"):
+        result = await fn(**kwargs)
+    except Exception:
+      if on_stage:
+        on_stage(name, "failed", time.perf_counter() - started)
+      raise
+    timings[name] = (stage_start, time.perf_counter() - started)
+    if on_stage:
+      on_stage(name, "finished", timings[name][1])
+    return result
+
+  for name in stages:
+    tasks[name] = asyncio.ensure_future(run(name))
+
+  try:
+    await asyncio.gather(*tasks.values())
+  except BaseException:
+    for task in tasks.values():
+      task.cancel()
+    await asyncio.gather(*tasks.values(), return_exceptions=True)
+    raise
+
+  results = {name: task.result() for name, task in tasks.items()}
+  return results, timings
+
+def format_timings(timings: dict[str, tuple[float, float]]):
+  """Returns a per-stage timing report, ordered by start time."""
+  lines = [f"  {'stage':<20} {'start':>8} {'end':>8} {'duration':>9}"]
+  for name, (start, end) in sorted(timings.items(), key=lambda item: item[1]):
+    lines.append(f"  {name:<20} {start:>7.2f}s {end:>7.2f}s {end - start:>8.2f}s")
+  total = max((end for _, end in timings.values()), default=0.0)
+  busy = sum(end - start for start, end in timings.values())
+  lines.append(f"  wall clock {total:.2f}s, sum of stages {busy:.2f}s")
+  return "\n".join(lines)
\ No newline at end of file
@@ -0,0 +1,250 @@
+from collections import Counter
+import hashlib
+import logging
+import math
+import os
+import re
+
+from src.db import get_script_ranking, store_script_ranking
+
+logger = logging.getLogger(__name__)
+
+# Most tokens sent to the evaluation agent (instructions plus input). The instructions,
+# metrics, hypothesis and descriptors are always sent; the past videos and the script
+# share whatever remains.
+EVAL_PROMPT_TOKEN_BUDGET = int(os.getenv("EVAL_PROMPT_TOKEN_BUDGET", 1500))
+
+# Past videos offered to the evaluation agent, and the share of the remaining budget they may use
+HISTORY_TOP_K = 5
+HISTORY_MAX_SHARE = 0.4
+
+# Words that carry no topic, skipped when scoring script sentences
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could did do does for from get
+got had has have he her here him his how i if in into is it its just know like me more most my no not
+now of on one or our out so some than that the their them then there these they this to up us was we
+what when which who will with would you your
+""".split())
+
+# Share of a sentence's content words already kept above which it is dropped as a repeat
+REDUNDANT_OVERLAP = 0.6
+
+_encoding = None
+
+def _get_encoding():
+  # tiktoken is optional; without it (or without its cached BPE files) tokens are estimated
+  global _encoding
+  if _encoding is None:
+    try:
+      import tiktoken
+      _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+      _encoding = False
+  return _encoding
+
+_TOKEN_PIECES = re.compile(r"\w{1,4}|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+  """
+  Counts the tokens of text with tiktoken's GPT-4o encoding when it is installed, and
+  otherwise estimates them as 4-character word pieces plus punctuation (within ~10%
+  for English prose).
+  """
+  if not text:
+    return 0
+  encoding = _get_encoding()
+  if encoding:
+    return len(encoding.encode(text))
+  return len(_TOKEN_PIECES.findall(text))
+
+def _truncate(text: str, max_tokens: int):
+  while text and count_tokens(text) > max_tokens:
+    text = text[:max(0, int(len(text) * max_tokens / count_tokens(text)) - 1)]
+  return text.rstrip()
+
+_SENTENCES = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+_WORDS = re.compile(r"[a-z']+")
+
+def _split_sentences(script: str):
+  return [s.strip() for s in _SENTENCES.findall(script) if s.strip()]
+
+def rank_sentences(sentences: list[str]):
+  """
+  Orders a script's sentences by how they should be kept, as [sentence index, tokens]
+  pairs: the hook (first sentence) and the closing sentence first, then the rest by how
+  many of the script's recurring content words they contain. Sentences that mostly
+  repeat the words of sentences ranked above them are left out.
+  """
+  words = [[w for w in _WORDS.findall(s.lower()) if w not in STOPWORDS and len(w) > 2] for s in sentences]
+  frequency = Counter(w for sentence in words for w in set(sentence))
+  scores = [sum(frequency[w] - 1 for w in set(sentence)) / math.sqrt(len(sentence) or 1) for sentence in words]
+
+  last = len(sentences) - 1
+  order = [0, last] + sorted(range(1, last), key=lambda i: scores[i], reverse=True)
+  ranking, covered = [], set()
+  for i in dict.fromkeys(order):
+    content = set(words[i])
+    if i not in (0, last) and content and len(content & covered) > REDUNDANT_OVERLAP * len(content):
+      continue
+    ranking.append([i, count_tokens(sentences[i]) + 2])  # joining space and a possible "…"
+    covered |= content
+  return ranking
+
+def _fit_sentences(sentences: list[str], ranking: list, max_tokens: int):
+  # Keeps ranked sentences while they fit, in their original order with "…" marking cuts
+  chosen, used = set(), 0
+  for i, tokens in ranking:
+    if used + tokens <= max_tokens:
+      chosen.add(i)
+      used += tokens
+  if not chosen:
+    return _truncate(sentences[0], max_tokens)
+
+  pieces, previous = [], None
+  for i in sorted(chosen):
+    if previous is not None and i != previous + 1:
+      pieces.append("…")
+    pieces.append(sentences[i])
+    previous = i
+  return " ".join(pieces)
+
+def compress_script(script: str, max_tokens: int) -> str:
+  """
+  Shortens a script to at most max_tokens by keeping its most informative sentences
+  (see rank_sentences) in their original order, with "…" marking cuts. Scripts within
+  the limit are returned as-is.
+  """
+  if count_tokens(script) <= max_tokens:
+    return script
+  sentences = _split_sentences(script)
+  if not sentences:
+    return _truncate(script, max_tokens)
+  return _fit_sentences(sentences, rank_sentences(sentences), max_tokens)
+
+def summarize_script(script: str, max_tokens: int, video_id: str = None) -> str:
+  """
+  compress_script with the sentence ranking cached per video until the script changes,
+  so any token limit is served from the cache.
+  """
+  if not script or not video_id or count_tokens(script) <= max_tokens:
+    return compress_script(script or "", max_tokens)
+  sentences = _split_sentences(script)
+  if not sentences:
+    return _truncate(script, max_tokens)
+  script_hash = hashlib.sha256(script.encode("utf-8")).hexdigest()
+  ranking = get_script_ranking(video_id, script_hash)
+  if ranking is None:
+    ranking = rank_sentences(sentences)
+    store_script_ranking(video_id, script_hash, ranking)
+  return _fit_sentences(sentences, ranking, max_tokens)
+
+# Compact one-line-per-video table of past videos; a fraction of the tokens of per-field XML
+HISTORY_COLUMNS = ["title", "published", "descriptors", "views", "likes", "comments", "average_view_duration", "average_percentage_viewed", "subs_gained"]
+
+def _format_value(value):
+  if value is None:
+    return "-"
+  if isinstance(value, float):
+    return f"{value:.1f}"
+  return str(value)
+
+def format_history_row(video) -> str:
+  """Formats a similarity.SimilarVideo as one HISTORY_COLUMNS row."""
+  title = (video.title or "").replace("|", "/")
+  if len(title) > 60:
+    title = title[:57] + "..."
+  return "|".join([
+    title, (video.publish_date or "")[:10], ", ".join(video.descriptors),
+    *(_format_value(video.metrics.get(column)) for column in HISTORY_COLUMNS[3:]),
+  ])
+
+def evaluation_instructions(baseline_metrics: dict) -> str:
+  return f"""
+    <evaluation>
+      <instructions>
+        You are a creative performance analyst for short-form video content.
+
+        Your goals:
+        1. Compare the current video’s metrics against baseline and past video history.
+        2. Identify patterns across history (e.g., script style, hook type, face presence) that correlate with better or worse outcomes.
+        3. Evaluate whether the hypothesis tested in the current video led to a positive, neutral, or negative outcome.
+        4. Provide actionable recommendations for the next iteration.
+        5. Output a final determination on the success of the Hypothesis ("Success", "Failure", "Neutral")
+
+        Always structure your response strictly inside the <report> XML schema.
+      </instructions>
+
+      <data>
+        <baselines>
+          <views>{baseline_metrics['views']}</views>
+          <likes>{baseline_metrics['likes']}</likes>
+          <comments>{baseline_metrics['comments']}</comments>
+          <average_view_duration>{baseline_metrics['average_view_duration']}</average_view_duration>
+          <average_percentage_viewed>{baseline_metrics['average_percentage_viewed']}</average_percentage_viewed>
+          <subs_gained>{baseline_metrics['subs_gained']}</subs_gained>
+        </baselines>
+      </data>
+
+      <response>
+        <report>
+          <what_went_well></what_went_well>
+          <what_didnt_go_well></what_didnt_go_well>
+          <test_result></test_result>
+          <comparative_patterns></comparative_patterns>
+          <suggestions></suggestions>
+        </report>
+      </response>
+    </evaluation>
+    """
+
+def build_evaluation_prompt(period: str, current_metrics: dict, baseline_metrics: dict, descriptors: list[str], hypothesis: str,
+                            script: str, history: list = None, video_id: str = None, budget: int = None):
+  """
+  Assembles the evaluation agent's (instructions, input) within a token budget.
+  The instructions, metrics, hypothesis and descriptors are always included. Past
+  videos (most similar first, see similarity.find_similar_videos) are added one line each until they would
+  take more than HISTORY_MAX_SHARE of what remains, and the script is compressed to
+  fit the rest (see summarize_script). Returns (instructions, input, token counts).
+  """
+  budget = budget or EVAL_PROMPT_TOKEN_BUDGET
+  instructions = evaluation_instructions(baseline_metrics)
+  current = "\n".join(f"<{key}>{value}</{key}>" for key, value in current_metrics.items())
+  fixed = "\n".join([
+    f"<current_video>\n{current}\n</current_video>",
+    f"<hypothesis>{hypothesis}</hypothesis>",
+    "<descriptors>" + "".join(f"<descriptor>{d}</descriptor>" for d in descriptors or []) + "</descriptors>",
+  ])
+  used = count_tokens(instructions) + count_tokens(fixed)
+  remaining = max(0, budget - used)
+
+  rows = []
+  header = f'<history period="{period}" columns="{"|".join(HISTORY_COLUMNS)}">\n'
+  history_tokens = count_tokens(header) + count_tokens("</history>") + 1
+  for video in history or []:
+    row = format_history_row(video)
+    tokens = count_tokens(row) + 1
+    if history_tokens + tokens > remaining * HISTORY_MAX_SHARE:
+      break
+    rows.append(row)
+    history_tokens += tokens
+  history_text = header + "\n".join(rows) + "\n</history>" if rows else ""
+  remaining -= history_tokens if rows else 0
+
+  script_limit = max(0, remaining - count_tokens("<script></script>") - 2)
+  summary = summarize_script(script or "", script_limit, video_id)
+
+  input = "\n".join(part for part in [fixed, history_text, f"<script>{summary}</script>"] if part)
+  tokens = {
+    "instructions": count_tokens(instructions),
+    "input": count_tokens(input),
+    "history_videos": len(rows),
+    "script": count_tokens(script or ""),
+    "script_sent": count_tokens(summary),
+  }
+  tokens["total"] = tokens["instructions"] + tokens["input"]
+  if tokens["total"] > budget:
+    logger.warning("Evaluation prompt is %d tokens, over the %d token budget, with %d past videos and %d of %d script tokens",
+                   tokens["total"], budget, tokens["history_videos"], tokens["script_sent"], tokens["script"])
+  else:
+    logger.debug("Evaluation prompt tokens: %s", tokens)
+  return instructions, input, tokens
@@ -0,0 +1,295 @@
+from typing import NamedTuple
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+import numpy as np
+
+from src import db
+from src.db import get_experiment_documents, get_experiment_documents_state, get_many_video_stats, VIDEO_STATS_METRICS
+from src.prompts import STOPWORDS
+from src.telemetry import current_span, traced
+
+logger = logging.getLogger(__name__)
+
+# Hashed TF-IDF vector width; token collisions are rare at a few thousand distinct words
+VECTOR_DIM = 512
+
+# Score weights: shared descriptors (Jaccard), text similarity (cosine) and recency
+DESCRIPTOR_WEIGHT = 0.6
+TEXT_WEIGHT = 0.35
+RECENCY_WEIGHT = 0.05
+
+# Seconds an index is used without checking the database for new videos or pages
+INDEX_MAX_AGE = 300
+
+# Candidates fetched per requested video, since some lack stats for the period
+CANDIDATE_FACTOR = 4
+
+ARRAYS = ("video_ids", "vectors", "idf", "postings_offsets", "postings", "row_offsets", "row_descriptors")
+
+class SimilarVideo(NamedTuple):
+  video_id: str
+  title: str
+  publish_date: str
+  descriptors: list
+  metrics: dict
+  score: float
+
+_TOKENS = re.compile(r"[a-z0-9']+")
+
+def _buckets(text: str):
+  """Returns {bucket: count} of text's content words hashed into VECTOR_DIM buckets."""
+  counts = {}
+  for token in _TOKENS.findall((text or "").lower()):
+    if len(token) > 2 and token not in STOPWORDS:
+      bucket = zlib.crc32(token.encode()) % VECTOR_DIM
+      counts[bucket] = counts.get(bucket, 0) + 1
+  return counts
+
+def experiment_text(properties: dict, title: str = None):
+  """The text a video is matched on: its title, hypothesis and script."""
+  properties = properties or {}
+  return " ".join(filter(None, [title or properties.get("title"), properties.get("hypothesis"), properties.get("script")]))
+
+def _normalize(descriptors):
+  # Descriptors match case-insensitively
+  return list(dict.fromkeys(d.strip().lower() for d in descriptors or [] if d and d.strip()))
+
+class SimilarityIndex:
+  """
+  Past videos indexed by their Notion descriptors (an inverted index from descriptor to
+  rows, and a forward index from row to descriptors) and by hashed TF-IDF vectors of
+  their title, hypothesis and script. Rows are ordered oldest first. The arrays are
+  saved as .npy files and memory-mapped, so processes share one copy in the page cache.
+  """
+
+  def __init__(self, path: str, arrays: dict, meta: dict):
+    self.path = path
+    self.meta = meta
+    self.descriptors = meta["descriptors"]
+    self.descriptor_ids = {d.lower(): i for i, d in enumerate(self.descriptors)}
+    for name in ARRAYS:
+      setattr(self, name, arrays[name])
+    self.checked_at = time.time()
+
+  def __len__(self):
+    return len(self.video_ids)
+
+  def row_of(self, video_id):
+    rows = np.flatnonzero(self.video_ids == video_id)
+    return int(rows[0]) if len(rows) else None
+
+  def row_descriptor_names(self, row):
+    return [self.descriptors[i] for i in self.row_descriptors[self.row_offsets[row]:self.row_offsets[row + 1]]]
+
+  @classmethod
+  def build(cls, path: str, documents: list, state: list):
+    """Indexes (video_id, title, publish_date, properties) documents and saves the index under path."""
+    n = len(documents)
+    descriptors, descriptor_ids = [], {}
+    row_offsets, row_descriptors = [0], []
+    vectors = np.zeros((n, VECTOR_DIM), dtype=np.float32)
+    for row, (_, title, _, properties) in enumerate(documents):
+      names = {d.strip().lower(): d.strip() for d in (properties or {}).get("descriptors") or [] if d and d.strip()}
+      for descriptor, name in names.items():
+        if descriptor not in descriptor_ids:
+          descriptor_ids[descriptor] = len(descriptors)
+          descriptors.append(name)
+        row_descriptors.append(descriptor_ids[descriptor])
+      row_offsets.append(len(row_descriptors))
+      counts = _buckets(experiment_text(properties, title))
+      if counts:
+        vectors[row, list(counts)] = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32))
+
+    document_frequency = np.count_nonzero(vectors, axis=0)
+    idf = (np.log((1 + n) / (1 + document_frequency)) + 1).astype(np.float32)
+    vectors *= idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+    row_offsets = np.array(row_offsets, dtype=np.int32)
+    row_descriptors = np.array(row_descriptors, dtype=np.int32)
+    rows = np.repeat(np.arange(n, dtype=np.int32), np.diff(row_offsets))
+    order = np.argsort(row_descriptors, kind="stable")
+    postings = rows[order]
+    postings_offsets = np.zeros(len(descriptors) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(row_descriptors, minlength=len(descriptors)), out=postings_offsets[1:])
+
+    arrays = {
+      "video_ids": np.array([document[0] for document in documents], dtype=str),
+      "vectors": vectors,
+      "idf": idf,
+      "postings_offsets": postings_offsets,
+      "postings": postings,
+      "row_offsets": row_offsets,
+      "row_descriptors": row_descriptors,
+    }
+    meta = {"descriptors": descriptors, "state": state, "built_at": time.time(), "vector_dim": VECTOR_DIM}
+
+    os.makedirs(path)
+    for name, array in arrays.items():
+      np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+      json.dump(meta, f)
+    return cls.load(path)
+
+  @classmethod
+  def load(cls, path: str):
+    with open(os.path.join(path, "meta.json")) as f:
+      meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+    return cls(path, arrays, meta)
+
+  def query_vector(self, text: str):
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    counts = _buckets(text)
+    if counts:
+      vector[list(counts)] = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32))
+    vector *= self.idf
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+  def scores(self, descriptors: list[str], text: str):
+    """
+    Returns each row's similarity to a video with the given descriptors and text:
+    DESCRIPTOR_WEIGHT x descriptor Jaccard + TEXT_WEIGHT x TF-IDF cosine +
+    RECENCY_WEIGHT x position in publish order.
+    """
+    n = len(self)
+    scores = np.zeros(n, dtype=np.float32)
+    if not n:
+      return scores
+    wanted = _normalize(descriptors)
+    ids = [self.descriptor_ids[d] for d in wanted if d in self.descriptor_ids]
+    if ids:
+      shared = np.bincount(np.concatenate([self.postings[self.postings_offsets[i]:self.postings_offsets[i + 1]] for i in ids]), minlength=n)
+      union = np.diff(self.row_offsets) + len(wanted) - shared
+      scores += DESCRIPTOR_WEIGHT * shared / np.maximum(union, 1)
+    if text:
+      scores += TEXT_WEIGHT * (self.vectors @ self.query_vector(text))
+    scores += RECENCY_WEIGHT * np.arange(n, dtype=np.float32) / n
+    return scores
+
+  def top(self, descriptors: list[str], text: str, k: int, exclude=()):
+    """Returns the k most similar (row, score) pairs, best first."""
+    scores = self.scores(descriptors, text)
+    for video_id in exclude:
+      row = self.row_of(video_id)
+      if row is not None:
+        scores[row] = -np.inf
+    k = min(k, int(np.count_nonzero(np.isfinite(scores))))
+    if k <= 0:
+      return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [(int(row), float(scores[row])) for row in best]
+
+def index_path():
+  """The directory holding the similarity index of db.DB_PATH."""
+  return os.path.splitext(db.DB_PATH)[0] + "_similarity"
+
+_index = None
+_index_lock = threading.RLock()
+
+def _current_version(path):
+  try:
+    with open(os.path.join(path, "current")) as f:
+      return f.read().strip()
+  except FileNotFoundError:
+    return None
+
+@traced("similarity.rebuild_index")
+def rebuild_similarity_index():
+  """
+  Rebuilds the index from video_stats and the cached Notion pages. Each build goes in
+  its own version directory and `current` is switched atomically, so processes with an
+  older version mapped keep reading it until they reload.
+  """
+  global _index
+  path = index_path()
+  started = time.perf_counter()
+  with _index_lock:
+    state = get_experiment_documents_state()
+    documents = get_experiment_documents()
+    version = f"{time.time_ns():x}"
+    os.makedirs(path, exist_ok=True)
+    index = SimilarityIndex.build(os.path.join(path, version), documents, state)
+    with open(os.path.join(path, "current.tmp"), "w") as f:
+      f.write(version)
+    os.replace(os.path.join(path, "current.tmp"), os.path.join(path, "current"))
+    for name in os.listdir(path):
+      if name not in (version, "current") and os.path.isdir(os.path.join(path, name)):
+        shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    _index = index
+  current_span().set("rows", len(index))
+  logger.info("Similarity index rebuilt: %d videos, %d descriptors in %.2fs", len(index), len(index.descriptors), time.perf_counter() - started)
+  return index
+
+def get_similarity_index(max_age: float = INDEX_MAX_AGE):
+  """
+  Returns the similarity index of the current database, loading it from disk or
+  building it as needed. An index older than max_age seconds is checked against the
+  database and rebuilt if videos or Notion pages were added or edited since.
+  """
+  global _index
+  with _index_lock:
+    path = index_path()
+    index = _index
+    if index is None or not index.path.startswith(path + os.sep):
+      version = _current_version(path)
+      index = None
+      if version:
+        try:
+          index = SimilarityIndex.load(os.path.join(path, version))
+        except (OSError, ValueError, KeyError):
+          logger.warning("Similarity index at %s is unreadable, rebuilding it", path, exc_info=True)
+      if index is None:
+        return rebuild_similarity_index()
+      _index = index
+    if time.time() - index.checked_at > max_age:
+      if index.meta["state"] != get_experiment_documents_state() or index.meta.get("vector_dim") != VECTOR_DIM:
+        return rebuild_similarity_index()
+      index.checked_at = time.time()
+    return index
+
+@traced("similarity.find_similar_videos")
+def find_similar_videos(descriptors: list[str], text: str, period: str, k: int = 5, exclude_video_id: str = None):
+  """
+  Returns the k past videos most similar to one with the given descriptors and text
+  (hypothesis, script, title), best first, as SimilarVideo records with their metrics
+  for period. Videos without stats for period are skipped.
+  """
+  index = get_similarity_index()
+  candidates = index.top(descriptors, text, k * CANDIDATE_FACTOR, exclude=[exclude_video_id] if exclude_video_id else ())
+  records = get_many_video_stats([str(index.video_ids[row]) for row, _ in candidates])
+  metrics = [metric for metric, _ in VIDEO_STATS_METRICS]
+
+  similar = []
+  for row, score in candidates:
+    record = records.get(str(index.video_ids[row]))
+    if record is None or getattr(record, f"views_{period}") is None:
+      continue
+    similar.append(SimilarVideo(
+      video_id=record.video_id,
+      title=record.title,
+      publish_date=record.publish_date,
+      descriptors=index.row_descriptor_names(row),
+      metrics={metric: getattr(record, f"{metric}_{period}") for metric in metrics},
+      score=round(score, 3),
+    ))
+    if len(similar) == k:
+      break
+  current_span().set("rows", len(similar))
+  return similar
+
+def cohort_history(similar: list, period: str):
+  """Returns the {metric_period: [values]} of similar videos, as compare_to_baseline takes it."""
+  return {
+    f"{metric}_{period}": [video.metrics.get(metric) for video in similar]
+    for metric, _ in VIDEO_STATS_METRICS
+  }
@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+import numpy as np
+
+from src.db import BASELINE_KEYS, PERIOD_HOURS, get_connection
+from src.baseline import BASELINE_TYPES, summarize_matrix
+from src.telemetry import traced
+
+# Metric names stored in video_metric_snapshots, without a period suffix
+SNAPSHOT_METRICS = list(dict.fromkeys(key.rsplit("_", 1)[0] for key in BASELINE_KEYS))
+
+def hours_since_publish(published_at: str, at: datetime = None) -> float:
+  """Returns the hours between an ISO 8601 publish time and `at` (default: now, UTC)."""
+  published = datetime.fromisoformat(published_at.replace("Z", "+00:00"))
+  if published.tzinfo is None:
+    published = published.replace(tzinfo=timezone.utc)
+  return ((at or datetime.now(timezone.utc)) - published).total_seconds() / 3600
+
+def _interpolate(hours, values, at):
+  # No extrapolation: ages before the first or after the last snapshot are unknown
+  if not len(hours) or at < hours[0] or at > hours[-1]:
+    return None
+  return float(np.interp(at, hours, values))
+
+@traced("sqlite.get_video_snapshots")
+def get_video_snapshots(video_id: str, metrics: list[str] = None):
+  """
+  Returns {metric: (hours, values)} arrays sorted by age for one video.
+  Served by a prefix scan of the primary key.
+  """
+  params = [video_id]
+  where = "video_id = ? AND value IS NOT NULL"
+  if metrics:
+    where += f" AND metric IN ({', '.join('?' * len(metrics))})"
+    params += metrics
+  rows = get_connection().execute(f"""
+    SELECT metric, hours_since_publish, value
+    FROM video_metric_snapshots
+    WHERE {where}
+    ORDER BY metric, hours_since_publish
+  """, params).fetchall()
+
+  series = {}
+  for metric, hours, value in rows:
+    series.setdefault(metric, ([], []))
+    series[metric][0].append(hours)
+    series[metric][1].append(value)
+  return {metric: (np.array(h, dtype=float), np.array(v, dtype=float)) for metric, (h, v) in series.items()}
+
+def get_metric_at(video_id: str, metric: str, hours: float):
+  """Returns a video's metric linearly interpolated at `hours` after publishing, or None."""
+  series = get_video_snapshots(video_id, [metric]).get(metric)
+  return None if series is None else _interpolate(*series, hours)
+
+def get_snapshot_stats(video_id: str, checkpoints: dict = PERIOD_HOURS):
+  """
+  Returns {metric_label: value} for every metric at each checkpoint ({label: hours}),
+  interpolated from the stored snapshots. With the default checkpoints the keys match
+  db.get_video_stats; values outside the recorded range are None.
+  """
+  series = get_video_snapshots(video_id)
+  return {
+    f"{metric}_{label}": _interpolate(*series[metric], hours) if metric in series else None
+    for metric in SNAPSHOT_METRICS
+    for label, hours in checkpoints.items()
+  }
+
+@traced("sqlite.load_snapshot_matrix")
+def load_snapshot_matrix(hours: float, n: int = 5, metrics: list[str] = SNAPSHOT_METRICS):
+  """
+  Returns the past n videos' metrics interpolated at `hours` after publishing as an
+  (n, len(metrics)) float array, NaN where a video has no snapshots on both sides.
+  Only the snapshots bracketing `hours` are read: two index seeks per video and metric.
+  """
+  metric_values = ", ".join("(?)" for _ in metrics)
+  rows = get_connection().execute(f"""
+    WITH recent AS (
+      SELECT video_id FROM video_stats ORDER BY publish_date DESC LIMIT ?
+    ), brackets AS (
+      SELECT
+        recent.video_id,
+        m.column1 AS metric,
+        (SELECT MAX(hours_since_publish) FROM video_metric_snapshots
+         WHERE video_id = recent.video_id AND metric = m.column1 AND hours_since_publish <= ?) AS below,
+        (SELECT MIN(hours_since_publish) FROM video_metric_snapshots
+         WHERE video_id = recent.video_id AND metric = m.column1 AND hours_since_publish >= ?) AS above
+      FROM recent CROSS JOIN (VALUES {metric_values}) AS m
+    )
+    -- CROSS JOIN keeps SQLite from driving the join from the metric index instead
+    SELECT b.video_id, b.metric, s.hours_since_publish, s.value
+    FROM brackets b
+    CROSS JOIN video_metric_snapshots s
+      ON s.video_id = b.video_id AND s.metric = b.metric AND s.hours_since_publish IN (b.below, b.above)
+    ORDER BY b.video_id, b.metric, s.hours_since_publish
+  """, [n, hours, hours, *metrics]).fetchall()
+
+  brackets = {}
+  for video_id, metric, age, value in rows:
+    brackets.setdefault(video_id, {}).setdefault(metric, []).append((age, value))
+
+  matrix = np.full((len(brackets), len(metrics)), np.nan)
+  for i, by_metric in enumerate(brackets.values()):
+    for j, metric in enumerate(metrics):
+      points = by_metric.get(metric)
+      if points and all(value is not None for _, value in points):
+        ages, values = zip(*points)
+        value = _interpolate(np.array(ages), np.array(values, dtype=float), hours)
+        matrix[i, j] = np.nan if value is None else value
+  return matrix
+
+def get_snapshot_baseline(hours: float, n: int = 5, baseline_type: str = "mean"):
+  """
+  Returns {metric: value} baselines for the past n videos at any age in hours, using
+  the same statistics as baseline.get_baseline.
+  """
+  if baseline_type not in BASELINE_TYPES:
+    raise ValueError(f"Invalid baseline type. Must be one of: {', '.join(BASELINE_TYPES)}.")
+  values = summarize_matrix(load_snapshot_matrix(hours, n))[baseline_type]
+  return {metric: 0 if np.isnan(value) else float(value) for metric, value in zip(SNAPSHOT_METRICS, values)}
@@ -0,0 +1,18 @@
+# Analysis periods stored as the _24hr, _48hr and _7d columns of video_stats
+PERIODS = ["24hr", "48hr", "7d"]
+
+def period_stats(stats: dict, period: str):
+  """Maps Analytics report stats to the video_stats columns of a period."""
+  return {
+    f"views_{period}": stats.get("views"),
+    f"likes_{period}": stats.get("likes"),
+    f"comments_{period}": stats.get("comments"),
+    f"average_view_duration_{period}": stats.get("averageViewDuration"),
+    f"average_percentage_viewed_{period}": stats.get("averageViewPercentage"),
+    f"subs_gained_{period}": stats.get("subscribersGained"),
+  }
+
+def read_video_ids_file(path: str):
+  """Returns the video IDs in a file with one per line, skipping blank and # comment lines."""
+  with open(path) as f:
+    return [line.strip() for line in f if line.strip() and not line.startswith("#")]
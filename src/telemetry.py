@@ -0,0 +1,280 @@
+from contextvars import ContextVar
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Numeric span attributes that are summed into Prometheus counters
+COUNTED_ATTRIBUTES = (
+  "bytes_sent", "bytes_received", "retries", "rows", "quota_units",
+  "cache_hit", "input_tokens", "output_tokens", "total_tokens",
+)
+
+# Upper bounds (seconds) of the span duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# OpenTelemetry span kinds and status codes, as numbered in OTLP
+SPAN_KINDS = {"internal": 1, "client": 3}
+STATUS_OK, STATUS_ERROR = 1, 2
+
+_exporters = []
+_current: ContextVar = ContextVar("current_span", default=None)
+
+class _NoopSpan:
+  """Stands in for a span while tracing is disabled; every operation does nothing."""
+
+  def set(self, key, value):
+    pass
+
+  def add(self, key, amount=1):
+    pass
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    return False
+
+_NOOP = _NoopSpan()
+
+class Span:
+  """
+  One timed operation. Spans nest through a context variable, so spans opened in tasks
+  and asyncio.to_thread workers become children of the span that was active there.
+  Attributes describe the operation (endpoint, status, bytes, retries, tokens, ...).
+  """
+
+  __slots__ = ("name", "kind", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "duration", "error", "_started", "_token")
+
+  def __init__(self, name: str, kind: str, attributes: dict):
+    parent = _current.get()
+    self.name = name
+    self.kind = kind
+    self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+    self.span_id = f"{random.getrandbits(64):016x}"
+    self.parent_id = parent.span_id if parent else None
+    self.attributes = attributes
+    self.duration = None
+    self.error = None
+
+  def set(self, key, value):
+    self.attributes[key] = value
+
+  def add(self, key, amount=1):
+    self.attributes[key] = self.attributes.get(key, 0) + amount
+
+  def __enter__(self):
+    self._token = _current.set(self)
+    self.start_ns = time.time_ns()
+    self._started = time.perf_counter()
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    self.duration = time.perf_counter() - self._started
+    if exc is not None:
+      self.error = f"{exc_type.__name__}: {exc}"
+    try:
+      _current.reset(self._token)
+    except ValueError:
+      # Exited in another context, e.g. an abandoned async generator closed by the GC
+      pass
+    for exporter in _exporters:
+      try:
+        exporter.export(self)
+      except Exception:
+        logger.exception("Span exporter %s failed", type(exporter).__name__)
+    return False
+
+  def to_otlp(self):
+    """Returns the span in OpenTelemetry's OTLP/JSON span encoding."""
+    def value(v):
+      if isinstance(v, bool):
+        return {"boolValue": v}
+      if isinstance(v, int):
+        return {"intValue": str(v)}
+      if isinstance(v, float):
+        return {"doubleValue": v}
+      return {"stringValue": str(v)}
+
+    return {
+      "traceId": self.trace_id,
+      "spanId": self.span_id,
+      "parentSpanId": self.parent_id or "",
+      "name": self.name,
+      "kind": SPAN_KINDS.get(self.kind, 1),
+      "startTimeUnixNano": str(self.start_ns),
+      "endTimeUnixNano": str(self.start_ns + int(self.duration * 1e9)),
+      "attributes": [{"key": key, "value": value(v)} for key, v in self.attributes.items() if v is not None],
+      "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+    }
+
+def span(name: str, kind: str = "internal", **attributes):
+  """
+  Returns a context manager timing the enclosed block as a span, e.g.
+  `with span("notion.request", kind="client", endpoint=...) as s: s.set("status", 200)`.
+  With no exporter configured this is a shared no-op object, so instrumentation costs
+  a function call and a list check.
+  """
+  if not _exporters:
+    return _NOOP
+  return Span(name, kind, attributes)
+
+def current_span():
+  """Returns the innermost active span (a no-op one if none), to add attributes to it."""
+  return _current.get() or _NOOP
+
+def traced(name: str):
+  """Decorator that runs every call of the function in a span called `name`."""
+  def decorate(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+      if not _exporters:
+        return fn(*args, **kwargs)
+      with Span(name, "internal", {}):
+        return fn(*args, **kwargs)
+    return wrapper
+  return decorate
+
+class JsonLinesExporter:
+  """Appends every finished span to a file as one OTLP/JSON span per line."""
+
+  def __init__(self, path: str, service_name: str = "content-analysis-agent"):
+    self.path = path
+    self.service_name = service_name
+    self._lock = threading.Lock()
+    self._file = open(path, "a", encoding="utf-8")
+
+  def export(self, span: Span):
+    record = span.to_otlp()
+    record["resource"] = {"service.name": self.service_name}
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with self._lock:
+      self._file.write(line)
+      self._file.flush()
+
+  def close(self):
+    with self._lock:
+      self._file.close()
+
+def _label(value: str):
+  return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class PrometheusExporter:
+  """
+  Aggregates finished spans per name into a duration histogram, an error count and
+  totals of the COUNTED_ATTRIBUTES, rendered in the Prometheus text format by render()
+  or served over HTTP at /metrics by serve().
+  """
+
+  def __init__(self, prefix: str = "content_agent"):
+    self.prefix = prefix
+    self._lock = threading.Lock()
+    self._spans = {}
+    self._server = None
+
+  def export(self, span: Span):
+    with self._lock:
+      m = self._spans.get(span.name)
+      if m is None:
+        m = self._spans[span.name] = {"count": 0, "errors": 0, "sum": 0.0, "buckets": [0] * len(DURATION_BUCKETS), "totals": {}}
+      m["count"] += 1
+      m["sum"] += span.duration
+      if span.error:
+        m["errors"] += 1
+      for i, bound in enumerate(DURATION_BUCKETS):
+        if span.duration <= bound:
+          m["buckets"][i] += 1
+      for key in COUNTED_ATTRIBUTES:
+        value = span.attributes.get(key)
+        if value:
+          m["totals"][key] = m["totals"].get(key, 0) + value
+
+  def render(self):
+    p = self.prefix
+    with self._lock:
+      spans = {name: {**m, "buckets": list(m["buckets"]), "totals": dict(m["totals"])} for name, m in self._spans.items()}
+
+    lines = [
+      f"# HELP {p}_span_duration_seconds Duration of instrumented operations.",
+      f"# TYPE {p}_span_duration_seconds histogram",
+    ]
+    for name, m in spans.items():
+      label = f'span="{_label(name)}"'
+      for bound, count in zip(DURATION_BUCKETS, m["buckets"]):
+        lines.append(f'{p}_span_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+      lines.append(f'{p}_span_duration_seconds_bucket{{{label},le="+Inf"}} {m["count"]}')
+      lines.append(f"{p}_span_duration_seconds_sum{{{label}}} {m['sum']}")
+      lines.append(f"{p}_span_duration_seconds_count{{{label}}} {m['count']}")
+
+    lines += [f"# HELP {p}_span_errors_total Instrumented operations that raised.", f"# TYPE {p}_span_errors_total counter"]
+    lines += [f'{p}_span_errors_total{{span="{_label(name)}"}} {m["errors"]}' for name, m in spans.items()]
+
+    lines += [f"# HELP {p}_span_attribute_total Totals of counted span attributes (bytes, retries, tokens, cache hits, ...).", f"# TYPE {p}_span_attribute_total counter"]
+    lines += [
+      f'{p}_span_attribute_total{{span="{_label(name)}",attribute="{key}"}} {value}'
+      for name, m in spans.items() for key, value in m["totals"].items()
+    ]
+    return "\n".join(lines) + "\n"
+
+  def serve(self, port: int, host: str = "0.0.0.0"):
+    """Serves render() at http://host:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    exporter = self
+
+    class Handler(BaseHTTPRequestHandler):
+      def log_message(self, *args):
+        pass
+
+      def do_GET(self):
+        if self.path != "/metrics":
+          self.send_error(404)
+          return
+        payload = exporter.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    self._server = ThreadingHTTPServer((host, port), Handler)
+    self._server.daemon_threads = True
+    threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+    return self
+
+def add_exporter(exporter):
+  """Enables tracing (if it was off) and sends every finished span to exporter.export."""
+  _exporters.append(exporter)
+  return exporter
+
+def remove_exporter(exporter):
+  _exporters.remove(exporter)
+
+_configured = False
+
+def configure(log_level: str = "INFO", trace_file: str = None, metrics_port: int = None):
+  """
+  Sets up leveled logging for the CLIs and the app, and enables tracing if a JSON lines
+  trace file or a Prometheus metrics port is given. Only the first call has any effect.
+  """
+  global _configured
+  if _configured:
+    return
+  _configured = True
+  logging.basicConfig(level=log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+  if trace_file:
+    add_exporter(JsonLinesExporter(trace_file))
+    logger.info("Writing trace spans to %s", trace_file)
+  if metrics_port:
+    add_exporter(PrometheusExporter()).serve(metrics_port)
+    logger.info("Serving Prometheus metrics on port %s", metrics_port)
+
+def configure_from_env():
+  """configure() from LOG_LEVEL, TRACE_FILE and METRICS_PORT."""
+  port = os.getenv("METRICS_PORT")
+  configure(os.getenv("LOG_LEVEL", "INFO"), os.getenv("TRACE_FILE"), int(port) if port else None)
@@ -1,22 +1,16 @@
 import os
-from datetime import date, timedelta
-from dateutil import tz
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from datetime import date, datetime, timedelta
+from requests.adapters import HTTPAdapter
+import re
 import requests
+import threading
+import time
 
 from dotenv import load_dotenv
 
-load_dotenv()
-
-# get_refresh_token.py
-import json, os, webbrowser
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
+from src.telemetry import span
 
-from datetime import datetime, timedelta
+load_dotenv()
 
 GOOGLE_CLOUD_API_KEY = os.getenv("GOOGLE_CLOUD_API_KEY")
 
@@ -25,84 +19,276 @@ SCOPES = [
     "https://www.googleapis.com/auth/youtube.readonly",
 ]
 
-def auth():
-    # Put your client id/secret here or read from env
-    client_id = os.getenv("GOOGLE_CLIENT_ID") or input("Client ID: ").strip()
-    client_secret = os.getenv("GOOGLE_CLIENT_SECRET") or input("Client Secret: ").strip()
-
-    client_config = {
-        "installed": {
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "redirect_uris": ["http://localhost"]
-        }
-    }
+# videos.list and playlistItems.list accept at most 50 IDs/results per request
+VIDEOS_LIST_MAX_IDS = 50
+
+# Number of videos filtered into a single Analytics report
+ANALYTICS_MAX_VIDEO_IDS = 200
 
-    flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
-    creds = flow.run_local_server(open_browser=True, port=0)  # opens browser, handles redirect to localhost
-    # Force a refresh to guarantee a refresh_token is present
-    creds.refresh(Request())
+# API roots; read on every call, so they can be pointed at a local stand-in
+DATA_API_BASE = "https://www.googleapis.com/youtube/v3"
+ANALYTICS_API_BASE = "https://youtubeanalytics.googleapis.com/v2"
 
-    print("\n✅ Success!")
-    print("Access Token:", creds.token)
-    print("Refresh Token:", creds.refresh_token)
-    print("\nSave these as environment variables:")
-    print("GOOGLE_CLIENT_ID=", client_id)
-    print("GOOGLE_CLIENT_SECRET=", client_secret)
-    print("GOOGLE_REFRESH_TOKEN=", creds.refresh_token)
+# Data API quota units charged per call, by endpoint; the Analytics API has a separate per-query quota
+DATA_API_QUOTA_COSTS = {
+    "videos": 1,
+    "channels": 1,
+    "playlistItems": 1,
+}
 
+ANALYTICS_METRICS = ",".join([
+    "views",
+    "averageViewDuration",
+    "averageViewPercentage",
+    "estimatedMinutesWatched",
+    "likes",
+    "comments",
+    "subscribersGained",
+    "subscribersLost"
+])
 
-def make_credentials():
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+class YouTubeClient:
     """
-    Returns a Credentials object using environment variables.
+    Process-wide YouTube client. Holds one set of OAuth credentials, refreshed only
+    when the access token is missing or close to expiry, and one keep-alive HTTP
+    session shared by the Data API and Analytics API calls. Safe to use from
+    multiple threads.
+
+    Calls that had to refresh the token are counted as "cold", all others as "warm".
+    Data API quota units and Analytics queries are counted as well.
     """
-    client_id = os.getenv("GOOGLE_CLIENT_ID")
-    client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
-    refresh_token = os.getenv("GOOGLE_REFRESH_TOKEN")
-    token_uri = "https://oauth2.googleapis.com/token"
 
-    creds = Credentials(
-        None,
-        refresh_token=refresh_token,
-        token_uri=token_uri,
-        client_id=client_id,
-        client_secret=client_secret,
-        scopes=SCOPES,
-    )
-    creds.refresh(Request())
-    return creds
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._creds = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self._counters = {
+            "token_refreshes": 0,
+            "cold_calls": 0,
+            "cold_seconds": 0.0,
+            "warm_calls": 0,
+            "warm_seconds": 0.0,
+            "data_api_units": 0,
+            "analytics_queries": 0,
+        }
+
+    def _token_expiring(self):
+        creds = self._creds
+        if creds is None or not creds.token or creds.expiry is None:
+            return True
+        # google-auth stores expiry as a naive UTC datetime
+        return creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+
+    def _access_token(self):
+        """Returns (token, refreshed)."""
+        with self._lock:
+            if not self._token_expiring():
+                return self._creds.token, False
+            # google-auth is slow to import and only needed once a token is due
+            from google.oauth2.credentials import Credentials
+            from google.auth.transport.requests import Request
+            if self._creds is None:
+                self._creds = Credentials(
+                    None,
+                    refresh_token=os.getenv("GOOGLE_REFRESH_TOKEN"),
+                    token_uri="https://oauth2.googleapis.com/token",
+                    client_id=os.getenv("GOOGLE_CLIENT_ID"),
+                    client_secret=os.getenv("GOOGLE_CLIENT_SECRET"),
+                    scopes=SCOPES,
+                )
+            self._creds.refresh(Request(self.session))
+            self._counters["token_refreshes"] += 1
+            return self._creds.token, True
+
+    def _record(self, url: str, cold: bool, started: float):
+        kind = "cold" if cold else "warm"
+        with self._lock:
+            self._counters[f"{kind}_calls"] += 1
+            self._counters[f"{kind}_seconds"] += time.perf_counter() - started
+            if url.startswith(ANALYTICS_API_BASE):
+                self._counters["analytics_queries"] += 1
+            else:
+                self._counters["data_api_units"] += DATA_API_QUOTA_COSTS.get(url.rsplit("/", 1)[-1], 1)
+
+    def get(self, url: str, params: dict, authorized: bool = True):
+        """
+        GETs a YouTube API endpoint on the shared session and returns the response.
+        Authorized calls send the OAuth bearer token, others rely on the API key in params.
+        """
+        endpoint = url.rsplit("/", 1)[-1]
+        with span("youtube.request", kind="client", endpoint=endpoint) as s:
+            started = time.perf_counter()
+            cold = False
+            headers = {}
+            if authorized:
+                token, cold = self._access_token()
+                headers["Authorization"] = f"Bearer {token}"
+            try:
+                resp = self.session.get(url, params=params, headers=headers, timeout=20)
+                s.set("status", resp.status_code)
+                s.set("bytes_received", len(resp.content))
+                return resp
+            finally:
+                s.set("token_refreshed", cold)
+                if not url.startswith(ANALYTICS_API_BASE):
+                    s.set("quota_units", DATA_API_QUOTA_COSTS.get(endpoint, 1))
+                self._record(url, cold, started)
+
+    def stats(self):
+        """Returns call counters with average cold and warm latency in milliseconds."""
+        with self._lock:
+            counters = dict(self._counters)
+        for kind in ("cold", "warm"):
+            calls = counters[f"{kind}_calls"]
+            counters[f"{kind}_avg_ms"] = round(counters[f"{kind}_seconds"] / calls * 1000, 1) if calls else None
+        return counters
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the process-wide YouTubeClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = YouTubeClient()
+    return _client
+
+def get_client_stats():
+    """Returns cold/warm latency counters for YouTube API calls made by this process."""
+    return get_client().stats()
+
+_ISO_DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+
+def parse_duration(duration: str):
+    """Returns the seconds in an ISO 8601 video duration such as 'PT5M33S', or None."""
+    match = _ISO_DURATION.fullmatch(duration or "")
+    if not match or not duration.strip("PT"):
+        return None
+    days, hours, minutes, seconds = (int(value or 0) for value in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def _parse_video_item(item: dict):
+    snippet = item.get("snippet", {})
+    content_details = item.get("contentDetails", {})
+    return {
+        "title": snippet.get("title"),
+        "description": snippet.get("description"),
+        "publishedAt": snippet.get("publishedAt"),
+        "duration": content_details.get("duration"),  # ISO 8601 format, e.g. 'PT5M33S'
+        "channelTitle": snippet.get("channelTitle"),
+        "thumbnails": snippet.get("thumbnails"),
+    }
 
 def get_video_metadata(video_id: str):
     """
     Returns metadata for a video: title, length, description, publish date, etc.
     """
-    url = "https://www.googleapis.com/youtube/v3/videos"
+    url = f"{DATA_API_BASE}/videos"
     params = {
         "part": "snippet,contentDetails",
         "id": video_id,
         "key": GOOGLE_CLOUD_API_KEY
     }
-    resp = requests.get(url, params=params, timeout=20)
+    resp = get_client().get(url, params, authorized=False)
     resp.raise_for_status()
     data = resp.json()
     item = (data.get("items") or [None])[0]
     if not item:
         return {}
 
-    snippet = item.get("snippet", {})
-    content_details = item.get("contentDetails", {})
-    return {
-        "title": snippet.get("title"),
-        "description": snippet.get("description"),
-        "publishedAt": snippet.get("publishedAt"),
-        "duration": content_details.get("duration"),  # ISO 8601 format, e.g. 'PT5M33S'
-        "channelTitle": snippet.get("channelTitle"),
-        "thumbnails": snippet.get("thumbnails"),
-    }
+    return _parse_video_item(item)
 
-def get_all_video_stats(video_id: str, published_date: str = None, period: str = None):
+def get_videos_metadata(video_ids: list[str]):
+    """
+    Returns metadata for many videos, keyed by video ID.
+    videos.list accepts up to 50 IDs per request, so IDs are looked up in batches of 50.
+    Videos that do not exist (or are private) are missing from the result.
+    """
+    url = f"{DATA_API_BASE}/videos"
+    metadata = {}
+    for chunk in _chunks(video_ids, VIDEOS_LIST_MAX_IDS):
+        params = {
+            "part": "snippet,contentDetails",
+            "id": ",".join(chunk),
+            "key": GOOGLE_CLOUD_API_KEY,
+            "maxResults": VIDEOS_LIST_MAX_IDS,
+        }
+        resp = get_client().get(url, params, authorized=False)
+        resp.raise_for_status()
+        for item in resp.json().get("items", []):
+            metadata[item["id"]] = _parse_video_item(item)
+    return metadata
+
+def get_videos_statistics(video_ids: list[str]):
+    """
+    Returns the current lifetime {"views", "likes", "comments"} of many videos, keyed by
+    video ID, from videos.list statistics (1 quota unit per 50 videos). Unlike Analytics
+    reports these are near real-time, so they can be sampled hourly. Hidden counts are
+    None; videos that do not exist (or are private) are missing from the result.
+    """
+    url = f"{DATA_API_BASE}/videos"
+    statistics = {}
+    for chunk in _chunks(video_ids, VIDEOS_LIST_MAX_IDS):
+        params = {
+            "part": "statistics",
+            "id": ",".join(chunk),
+            "key": GOOGLE_CLOUD_API_KEY,
+            "maxResults": VIDEOS_LIST_MAX_IDS,
+        }
+        resp = get_client().get(url, params, authorized=False)
+        resp.raise_for_status()
+        for item in resp.json().get("items", []):
+            counts = item.get("statistics", {})
+            statistics[item["id"]] = {
+                metric: int(counts[key]) if counts.get(key) is not None else None
+                for metric, key in (("views", "viewCount"), ("likes", "likeCount"), ("comments", "commentCount"))
+            }
+    return statistics
+
+def get_channel_video_ids():
+    """
+    Returns the IDs of every video uploaded to the authenticated channel, newest first.
+    """
+    client = get_client()
+    resp = client.get(f"{DATA_API_BASE}/channels", {"part": "contentDetails", "mine": "true"})
+    resp.raise_for_status()
+    items = resp.json().get("items", [])
+    if not items:
+        return []
+    uploads = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+
+    video_ids = []
+    page_token = None
+    while True:
+        resp = client.get(f"{DATA_API_BASE}/playlistItems", {
+            "part": "contentDetails",
+            "playlistId": uploads,
+            "maxResults": VIDEOS_LIST_MAX_IDS,
+            "pageToken": page_token,
+        })
+        resp.raise_for_status()
+        data = resp.json()
+        video_ids.extend(item["contentDetails"]["videoId"] for item in data.get("items", []))
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            return video_ids
+
+def _period_window(published_date: str = None, period: str = None):
+    """
+    Returns the (start_date, end_date) Analytics window for a period after publishing,
+    or None if the video is not old enough for the entire period to have elapsed.
+    """
     start_date = "2006-01-01"
     end_date = date.today().isoformat()
 
@@ -123,36 +309,99 @@ def get_all_video_stats(video_id: str, published_date: str = None, period: str =
         # If the video is not old enough for the entire period to have elapsed, then do not return stats
 
         if end_date > date.today().isoformat():
-            return {}
+            return None
 
+    return start_date, end_date
+
+def _query_video_report(video_ids: list[str], start_date: str, end_date: str):
     """
-    Returns all available stats for a video from its publish date to today.
+    Runs a single Analytics report for the given videos and returns one stats dict per video.
     """
-    ya = build("youtubeAnalytics", "v2", credentials=make_credentials(), cache_discovery=False)
-    metrics = ",".join([
-        "views",
-        "averageViewDuration",
-        "averageViewPercentage",
-        "estimatedMinutesWatched",
-        "likes",
-        "comments",
-        "subscribersGained",
-        "subscribersLost"
-    ])
-    try:
-        resp = ya.reports().query(
-            ids="channel==MINE",
-            startDate=start_date,
-            endDate=end_date,
-            metrics=metrics,
-            dimensions="video",
-            filters=f"video=={video_id}",
-        ).execute()
-    except HttpError as e:
-        raise RuntimeError(f"YouTube Analytics API error ({e.resp.status}): {e}") from e
-
-    rows = resp.get("rows", [])
+    resp = get_client().get(f"{ANALYTICS_API_BASE}/reports", {
+        "ids": "channel==MINE",
+        "startDate": start_date,
+        "endDate": end_date,
+        "metrics": ANALYTICS_METRICS,
+        "dimensions": "video",
+        "filters": f"video=={','.join(video_ids)}",
+        "maxResults": len(video_ids),
+        "sort": "-views",
+    })
+    if not resp.ok:
+        raise RuntimeError(f"YouTube Analytics API error ({resp.status_code}): {resp.text}")
+    resp = resp.json()
+
     headers = [h["name"] for h in resp.get("columnHeaders", [])]
-    stats = dict(zip(headers, rows[0])) if rows else {}
+    return [dict(zip(headers, row)) for row in resp.get("rows", [])]
+
+def get_daily_video_stats(video_id: str, start_date: str, end_date: str):
+    """
+    Returns one stats dict per day (with a "day" key, YYYY-MM-DD) for a video between
+    start_date and end_date inclusive, from a single Analytics report with the day dimension.
+    Days YouTube has not reported yet are missing.
+    """
+    resp = get_client().get(f"{ANALYTICS_API_BASE}/reports", {
+        "ids": "channel==MINE",
+        "startDate": start_date,
+        "endDate": end_date,
+        "metrics": ANALYTICS_METRICS,
+        "dimensions": "day",
+        "filters": f"video=={video_id}",
+        "sort": "day",
+    })
+    if not resp.ok:
+        raise RuntimeError(f"YouTube Analytics API error ({resp.status_code}): {resp.text}")
+    resp = resp.json()
+
+    headers = [h["name"] for h in resp.get("columnHeaders", [])]
+    return [dict(zip(headers, row)) for row in resp.get("rows", [])]
+
+def get_all_video_stats(video_id: str, published_date: str = None, period: str = None):
+    """
+    Returns all available stats for a video from its publish date to today.
+    """
+    window = _period_window(published_date, period)
+    if window is None:
+        return {}
+    start_date, end_date = window
+
+    rows = _query_video_report([video_id], start_date, end_date)
+    stats = rows[0] if rows else {}
+
+    return stats
+
+def get_stats_for_videos(video_ids: list[str], period: str = None, published_dates: dict = None):
+    """
+    Returns stats for many videos at once, keyed by video ID.
+
+    Videos whose period windows fall on the same dates (e.g. published on the same day)
+    share a single Analytics report, filtered to up to ANALYTICS_MAX_VIDEO_IDS videos.
+    Without a period every video shares the lifetime window, so the whole list is
+    fetched in len(video_ids) / ANALYTICS_MAX_VIDEO_IDS reports.
+
+    Publish dates are looked up with get_videos_metadata unless passed in as
+    {video_id: publishedAt}. Videos that are too young for the period are omitted.
+    """
+    if period and published_dates is None:
+        metadata = get_videos_metadata(video_ids)
+        published_dates = {vid: meta.get("publishedAt") for vid, meta in metadata.items()}
+
+    windows = {}
+    for video_id in video_ids:
+        published_date = published_dates.get(video_id) if published_dates else None
+        if period and not published_date:
+            continue
+        window = _period_window(published_date, period)
+        if window is not None:
+            windows.setdefault(window, []).append(video_id)
+
+    if not windows:
+        return {}
+
+    stats = {}
+    for (start_date, end_date), ids in windows.items():
+        for chunk in _chunks(ids, ANALYTICS_MAX_VIDEO_IDS):
+            for row in _query_video_report(chunk, start_date, end_date):
+                stats[row["video"]] = row
 
     return stats
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+One-off OAuth bootstrap for the YouTube APIs. Run it once to obtain the refresh token
+that src.yt reads from the environment:
+
+    python -m src.yt_auth
+"""
+import os
+from google_auth_oauthlib.flow import InstalledAppFlow
+from google.auth.transport.requests import Request
+
+from dotenv import load_dotenv
+
+from src.yt import SCOPES
+
+load_dotenv()
+
+def auth():
+    # Put your client id/secret here or read from env
+    client_id = os.getenv("GOOGLE_CLIENT_ID") or input("Client ID: ").strip()
+    client_secret = os.getenv("GOOGLE_CLIENT_SECRET") or input("Client Secret: ").strip()
+
+    client_config = {
+        "installed": {
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "redirect_uris": ["http://localhost"]
+        }
+    }
+
+    flow = InstalledAppFlow.from_client_config(client_config, SCOPES)
+    creds = flow.run_local_server(open_browser=True, port=0)  # opens browser, handles redirect to localhost
+    # Force a refresh to guarantee a refresh_token is present
+    creds.refresh(Request())
+
+    print("\n✅ Success!")
+    print("Access Token:", creds.token)
+    print("Refresh Token:", creds.refresh_token)
+    print("\nSave these as environment variables:")
+    print("GOOGLE_CLIENT_ID=", client_id)
+    print("GOOGLE_CLIENT_SECRET=", client_secret)
+    print("GOOGLE_REFRESH_TOKEN=", creds.refresh_token)
+
+
+if __name__ == "__main__":
+    auth()
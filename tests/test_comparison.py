@@ -0,0 +1,26 @@
+import pytest
+
+from src import db
+from src.baseline import get_baseline_history
+from src.comparison import compare_to_baseline
+
+PAST_VIEWS = [100, 110, 90, 105, 95]
+
+@pytest.fixture
+def video_db(tmp_path, monkeypatch):
+  monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "video_stats.db"))
+  for i, views in enumerate(PAST_VIEWS):
+    db.store_video_stats(f"past{i}", f"2026-01-0{i + 1}T10:00:00Z", "24hr", {"views_24hr": views})
+  yield
+  db.close_connection()
+
+def test_percentile_rank_excludes_the_analyzed_video(video_db):
+  # Stored before the comparison, as main.py's store stage does, and the latest video
+  db.store_video_stats("current", "2026-01-09T10:00:00Z", "24hr", {"views_24hr": 102})
+
+  history = get_baseline_history(5, "current")
+  assert sorted(history["views_24hr"]) == sorted(PAST_VIEWS)
+
+  comparison = compare_to_baseline({"views_24hr": 102}, {"views_24hr": 100}, "24hr", history=history)
+  # 100, 90 and 95 of the five past videos are below 102
+  assert comparison["views_24hr"]["percentile_rank"] == 60.0